@@ -0,0 +1,8 @@
+"""
+Reproducible benchmarks of django-media-trash.
+
+Usage::
+
+    python -m benchmarks run --files 100000 --depth 3 --fanout 10 --output results.json
+    python -m benchmarks compare baseline.json results.json
+"""
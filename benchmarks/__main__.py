@@ -0,0 +1,140 @@
+from __future__ import print_function
+
+import argparse
+import datetime
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+
+
+def get_tmpfs():
+    """/dev/shm keeps the synthetic trees in memory (falls back to the temporary directory)"""
+    if os.path.isdir('/dev/shm') and os.access('/dev/shm', os.W_OK):
+        return '/dev/shm'
+    return tempfile.gettempdir()
+
+
+def setup_django(root):
+    os.environ['MEDIA_TRASH_BENCHMARK_ROOT'] = root
+    os.environ['DJANGO_SETTINGS_MODULE'] = 'benchmarks.settings'
+    import django
+    django.setup()
+    from django.core.management import call_command
+    call_command('migrate', run_syncdb=True, verbosity=0)
+
+
+def run(options):
+    root = tempfile.mkdtemp(prefix='media-trash-benchmark-', dir=options.root or get_tmpfs())
+    try:
+        setup_django(root)
+
+        import django
+        import PIL
+        from django.conf import settings
+        from media_trash.settings import trash_settings
+        from .suite import BENCHMARKS
+        from .tree import create_files, create_images, iter_directories
+
+        files = create_files(settings.MEDIA_TRASH_PATH, options.files, options.depth, options.fanout,
+                             trash_settings.EXTENSION_LIST)
+        images = create_images(settings.MEDIA_TRASH_PATH, options.images)
+        directories = len(list(iter_directories(options.depth, options.fanout)))
+        context = {
+            'options': options,
+            'files': files,
+            'images': images,
+            # files, images, their directory and the tree directories (but the root)
+            'entries': len(files) + len(images) + 1 + directories - 1,
+        }
+
+        results = {}
+        for factory in BENCHMARKS:
+            bench = factory(context)
+            if options.only and bench.name not in options.only:
+                continue
+            print("%s..." % bench.name, file=sys.stderr)
+            results[bench.name] = bench.run(options.repeat)
+
+        report = {
+            'meta': {
+                'date': datetime.datetime.utcnow().isoformat(),
+                'python': platform.python_version(),
+                'django': django.get_version(),
+                'pil': getattr(PIL, '__version__', getattr(PIL, 'PILLOW_VERSION', None)),
+                'platform': platform.platform(),
+                'root': root,
+                'parameters': {
+                    'files': options.files,
+                    'depth': options.depth,
+                    'fanout': options.fanout,
+                    'images': options.images,
+                    'collect_files': options.collect_files,
+                    'restore_files': options.restore_files,
+                    'repeat': options.repeat,
+                },
+            },
+            'results': results,
+        }
+    finally:
+        if not options.keep:
+            shutil.rmtree(root, ignore_errors=True)
+
+    output = json.dumps(report, indent=2, sort_keys=True)
+    if options.output:
+        with open(options.output, 'w') as f:
+            f.write(output)
+    else:
+        print(output)
+
+
+def compare(options):
+    """Compares the medians of two reports. Fails if a benchmark got slower than the threshold."""
+    with open(options.baseline) as f:
+        baseline = json.load(f)['results']
+    with open(options.current) as f:
+        current = json.load(f)['results']
+    regressions = 0
+    for name in sorted(set(baseline) & set(current)):
+        ratio = current[name]['median'] / baseline[name]['median']
+        regression = ratio > 1 + options.threshold
+        regressions += regression
+        print("%-30s %10.4fs %10.4fs %7.2fx%s" % (name, baseline[name]['median'], current[name]['median'],
+                                                  ratio, "  REGRESSION" if regression else ""))
+    return 1 if regressions else 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m benchmarks')
+    subparsers = parser.add_subparsers(dest='command')
+
+    parser_run = subparsers.add_parser('run', help="run the benchmarks and write a JSON report")
+    parser_run.add_argument('--files', type=int, default=10000, help="files of the synthetic trash")
+    parser_run.add_argument('--depth', type=int, default=3, help="depth of the directory tree")
+    parser_run.add_argument('--fanout', type=int, default=10, help="subdirectories per directory")
+    parser_run.add_argument('--images', type=int, default=20, help="images for version generation")
+    parser_run.add_argument('--collect-files', type=int, default=1000, help="files collected per sample")
+    parser_run.add_argument('--restore-files', type=int, default=1000, help="files restored per sample")
+    parser_run.add_argument('--repeat', type=int, default=5, help="samples per benchmark")
+    parser_run.add_argument('--only', action='append', help="run only this benchmark (repeatable)")
+    parser_run.add_argument('--root', help="directory of the synthetic trees (default: tmpfs)")
+    parser_run.add_argument('--keep', action='store_true', help="keep the synthetic trees")
+    parser_run.add_argument('--output', '-o', help="JSON report file (default: stdout)")
+
+    parser_compare = subparsers.add_parser('compare', help="compare two JSON reports")
+    parser_compare.add_argument('baseline')
+    parser_compare.add_argument('current')
+    parser_compare.add_argument('--threshold', type=float, default=0.1,
+                                help="tolerated slowdown (0.1 = 10%%)")
+
+    options = parser.parse_args(argv)
+    if options.command == 'compare':
+        return compare(options)
+    run(options)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
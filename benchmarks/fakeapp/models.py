@@ -0,0 +1,25 @@
+import os
+
+from django.conf import settings
+from django.db import models
+
+
+class MediaQuerySet(models.QuerySet):
+
+    def trash(self):
+        return self
+
+
+class TrashedMedia(models.Model):
+    """Fake trash model: every row is a media file waiting to be collected"""
+    relpath = models.CharField(max_length=255)
+
+    objects = MediaQuerySet.as_manager()
+
+    @property
+    def path(self):
+        return os.path.join(settings.MEDIA_ROOT, self.relpath)
+
+    @property
+    def exists(self):
+        return os.path.exists(self.path)
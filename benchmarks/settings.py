@@ -0,0 +1,41 @@
+# Django settings of the benchmarks (the root directory comes from MEDIA_TRASH_BENCHMARK_ROOT).
+import os
+
+ROOT = os.environ['MEDIA_TRASH_BENCHMARK_ROOT']
+
+SECRET_KEY = 'benchmarks'
+DEBUG = False
+ALLOWED_HOSTS = ['*']
+INSTALLED_APPS = [
+    'django.contrib.auth',
+    'django.contrib.contenttypes',
+    'django.contrib.sessions',
+    'django.contrib.messages',
+    'django.contrib.staticfiles',
+    'media_trash',
+    'benchmarks.fakeapp',
+]
+DATABASES = {
+    'default': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': os.path.join(ROOT, 'db.sqlite3'),
+    }
+}
+TEMPLATES = [{
+    'BACKEND': 'django.template.backends.django.DjangoTemplates',
+    'APP_DIRS': True,
+    'OPTIONS': {
+        'context_processors': ['django.contrib.messages.context_processors.messages'],
+    },
+}]
+ROOT_URLCONF = 'media_trash.urls'
+STATIC_URL = '/static/'
+MEDIA_URL = '/media/'
+MEDIA_ROOT = os.path.join(ROOT, 'media')
+
+MEDIA_TRASH_PATH = os.path.join(ROOT, 'trash')
+MEDIA_TRASH_RECOVER_DIR = os.path.join(ROOT, 'recover')
+MEDIA_TRASH_MODEL = 'fakeapp.TrashedMedia'
+
+FILEBROWSER_VERSION_PROCESSORS = ['media_trash.utils.scale_and_crop']
+FILEBROWSER_VERSION_NAMER = 'media_trash.namers.VersionNamer'
@@ -0,0 +1,263 @@
+"""
+The benchmarks. Each one is a function(context) returning a Benchmark.
+"""
+import math
+import os
+import re
+import shutil
+import subprocess
+import sys
+import timeit
+
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.core.management import call_command
+from django.test import RequestFactory, override_settings
+from django.utils.six import StringIO
+
+from media_trash.settings import trash_settings
+from media_trash.base import FileListing, FileObject
+from media_trash.storage import get_storage
+from media_trash.utils import reduce_and_crop, scale_and_crop
+from media_trash.views import MediaView
+
+from .tree import create_files
+
+BENCHMARKS = []
+
+# the directory of the benchmarks package (and of media_trash)
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# "import time: self [us] | cumulative | imported package" rows of the imports made
+# by the script itself (nested imports are indented)
+IMPORTTIME_RE = re.compile(r'^import time:\s+\d+ \|\s+(\d+) \| (?! )')
+
+
+def benchmark(func):
+    BENCHMARKS.append(func)
+    return func
+
+
+class Benchmark(object):
+    """
+    A timed operation: setup and teardown run around every sample and are not timed.
+    items is the number of items (files, entries, versions) processed by a sample.
+    """
+
+    def __init__(self, name, func, items, setup=None, teardown=None, metrics=None):
+        self.name = name
+        self.func = func
+        self.items = items
+        self.setup = setup
+        self.teardown = teardown
+        self.metrics = metrics
+
+    def sample(self):
+        """Seconds taken by one call of func"""
+        start = timeit.default_timer()
+        self.func()
+        return timeit.default_timer() - start
+
+    def run(self, repeat):
+        samples = []
+        for _ in range(repeat):
+            if self.setup:
+                self.setup()
+            samples.append(self.sample())
+            if self.teardown:
+                self.teardown()
+        samples_sorted = sorted(samples)
+        median = samples_sorted[len(samples) // 2]
+        results = dict(self.metrics()) if self.metrics else {}
+        results.update({
+            'items': self.items,
+            'samples': samples,
+            'min': samples_sorted[0],
+            'max': samples_sorted[-1],
+            'mean': sum(samples) / len(samples),
+            'median': median,
+            'items_per_second': self.items / median if median else None,
+        })
+        return results
+
+
+class ImportBenchmark(Benchmark):
+    """
+    Startup cost: the time a fresh interpreter spends importing modules (after
+    django.setup()). Measured with ``python -X importtime`` where available
+    (Python 3.7+), with a timer around the imports otherwise. Fails if the
+    imports pull in PIL, which must only be imported on first image use.
+    """
+    SCRIPT = '\n'.join([
+        'import sys, timeit',
+        'import django',
+        'django.setup()',
+        'pil = "PIL" in sys.modules',
+        'sys.stderr.write("%s\\n")',
+        'start = timeit.default_timer()',
+        'import %s',
+        'sys.stdout.write("%%r %%d\\n" %% (timeit.default_timer() - start, not pil and "PIL" in sys.modules))',
+    ])
+    MARKER = 'media-trash-benchmark-imports'
+
+    def __init__(self, name, modules):
+        super(ImportBenchmark, self).__init__(name, None, items=len(modules))
+        self.modules = modules
+
+    def sample(self):
+        args = [sys.executable]
+        importtime = sys.version_info >= (3, 7)
+        if importtime:
+            args += ['-X', 'importtime']
+        args += ['-c', self.SCRIPT % (self.MARKER, ', '.join(self.modules))]
+        env = dict(os.environ)
+        env['PYTHONPATH'] = os.pathsep.join([ROOT] + [p for p in [env.get('PYTHONPATH')] if p])
+        process = subprocess.Popen(args, env=env, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                                   universal_newlines=True)
+        stdout, stderr = process.communicate()
+        if process.returncode:
+            raise RuntimeError(stderr)
+        elapsed, pil = stdout.split()
+        assert not int(pil), "importing %s imports PIL" % ', '.join(self.modules)
+        if not importtime:
+            return float(elapsed)
+        lines = stderr.split(self.MARKER, 1)[1].splitlines()
+        return sum(int(match.group(1)) for match in map(IMPORTTIME_RE.match, lines) if match) / 1e6
+
+
+@benchmark
+def import_time(context):
+    return ImportBenchmark('import_time', ['media_trash.urls',
+                                           'media_trash.management.commands.media_trash_collect'])
+
+
+@benchmark
+def walk(context):
+    def func():
+        FileListing(settings.MEDIA_TRASH_PATH, storage=get_storage()).files_walk_filtered()
+    return Benchmark('files_walk_filtered', func, items=context['entries'])
+
+
+def _view(path, cache_rows=False):
+    request = RequestFactory().get('/', {'path': path} if path else {})
+    request.user = AnonymousUser()
+    response = MediaView.as_view(cache_rows=cache_rows)(request)
+    assert response.status_code == 200, response.status_code
+    return response
+
+
+@benchmark
+def view_root(context):
+    return Benchmark('media_view_get_root', lambda: _view(''), items=1)
+
+
+@benchmark
+def view_root_cached(context):
+    return Benchmark('media_view_get_root_cached', lambda: _view('', cache_rows=True), items=1)
+
+
+@benchmark
+def view_directory(context):
+    return Benchmark('media_view_get_directory', lambda: _view('d00'), items=1)
+
+
+@benchmark
+def version_generate(context):
+    storage = get_storage()
+    fileobjects = [FileObject(os.path.join(settings.MEDIA_TRASH_PATH, relpath), storage=storage)
+                   for relpath in context['images']]
+    versions = sorted(trash_settings.VERSIONS)
+
+    def setup():
+        shutil.rmtree(os.path.join(settings.MEDIA_TRASH_PATH, trash_settings.VERSIONS_BASEDIR),
+                      ignore_errors=True)
+
+    def func():
+        for fileobject in fileobjects:
+            for version in versions:
+                fileobject.version_generate(version)
+
+    return Benchmark('version_generate', func, items=len(fileobjects) * len(versions),
+                     setup=setup, teardown=setup)
+
+
+def psnr(im1, im2):
+    """Peak signal-to-noise ratio (dB) of two images of the same size"""
+    from PIL import ImageChops, ImageStat
+    rms = ImageStat.Stat(ImageChops.difference(im1.convert('RGB'), im2.convert('RGB'))).rms
+    mse = sum(band ** 2 for band in rms) / len(rms)
+    return 10 * math.log10(255 ** 2 / mse) if mse else 100.0  # identical
+
+
+@benchmark
+def versions_generate(context):
+    """
+    All the versions of an image at once with reduce_and_crop, against version_generate.
+    The quality is the PSNR of the versions against a one step LANCZOS resize of the full image.
+    """
+    storage = get_storage()
+    fileobjects = [FileObject(os.path.join(settings.MEDIA_TRASH_PATH, relpath), storage=storage)
+                   for relpath in context['images']]
+    versions = sorted(trash_settings.VERSIONS)
+    processors = override_settings(FILEBROWSER_VERSION_PROCESSORS=['media_trash.utils.reduce_and_crop'])
+
+    def setup():
+        shutil.rmtree(os.path.join(settings.MEDIA_TRASH_PATH, trash_settings.VERSIONS_BASEDIR),
+                      ignore_errors=True)
+
+    def func():
+        with processors:
+            for fileobject in fileobjects:
+                fileobject.versions_generate(versions)
+
+    def metrics():
+        values = []
+        with processors:
+            for fileobject in fileobjects:
+                options_list = [fileobject._get_options(version) for version in versions]
+                full = fileobject._open_image()
+                drafted = fileobject._open_image(options_list)
+                for options in options_list:
+                    values.append(psnr(scale_and_crop(full, **options), reduce_and_crop(drafted, **options)))
+        return {'psnr_min': min(values), 'psnr_mean': sum(values) / len(values)}
+
+    return Benchmark('versions_generate', func, items=len(fileobjects) * len(versions),
+                     setup=setup, teardown=setup, metrics=metrics)
+
+
+@benchmark
+def collect(context):
+    from benchmarks.fakeapp.models import TrashedMedia
+    options = context['options']
+    count = options.collect_files
+
+    def setup():
+        files = create_files(os.path.join(settings.MEDIA_ROOT, 'collect'), count, options.depth,
+                             options.fanout, trash_settings.EXTENSION_LIST, prefix='c')
+        TrashedMedia.objects.bulk_create([TrashedMedia(relpath=os.path.join('collect', relpath))
+                                          for relpath in files], batch_size=500)
+
+    def func():
+        call_command('media_trash_collect', stdout=StringIO())
+
+    def teardown():
+        FileObject(os.path.join(settings.MEDIA_TRASH_PATH, 'collect'), storage=get_storage()).delete()
+
+    return Benchmark('media_trash_collect', func, items=count, setup=setup, teardown=teardown)
+
+
+@benchmark
+def restore(context):
+    storage = get_storage()
+    relpaths = context['files'][:context['options'].restore_files]
+
+    def func():
+        for relpath in relpaths:
+            FileObject(os.path.join(settings.MEDIA_TRASH_PATH, relpath), storage=storage).move(
+                os.path.join(trash_settings.MEDIA_TRASH_RECOVER_DIR, relpath))
+
+    def teardown():
+        for relpath in relpaths:
+            os.rename(os.path.join(trash_settings.MEDIA_TRASH_RECOVER_DIR, relpath),
+                      os.path.join(settings.MEDIA_TRASH_PATH, relpath))
+
+    return Benchmark('file_object_move', func, items=len(relpaths), teardown=teardown)
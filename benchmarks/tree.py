@@ -0,0 +1,57 @@
+"""
+Synthetic trash trees.
+"""
+import os
+
+from PIL import Image
+
+
+def iter_directories(depth, fanout):
+    """Relative paths of the directories of the tree ('' is the root)"""
+    level = ['']
+    yield ''
+    for _ in range(depth):
+        level = [os.path.join(parent, 'd%02d' % i) for parent in level for i in range(fanout)]
+        for directory in level:
+            yield directory
+
+
+def create_files(root, count, depth, fanout, extensions, size=64, prefix='f'):
+    """
+    Creates count files of size bytes spread over the directories of the tree,
+    cycling through the extensions. Returns the relative paths of the files.
+    """
+    directories = list(iter_directories(depth, fanout))
+    for directory in directories:
+        path = os.path.join(root, directory)
+        if not os.path.isdir(path):
+            os.makedirs(path)
+    content = b'x' * size
+    files = []
+    for i in range(count):
+        relpath = os.path.join(directories[i % len(directories)],
+                               '%s%07d%s' % (prefix, i, extensions[i % len(extensions)]))
+        with open(os.path.join(root, relpath), 'wb') as f:
+            f.write(content)
+        files.append(relpath)
+    return files
+
+
+def create_images(root, count, size=(1600, 1200), directory='images'):
+    """Creates count gradient images (alternating JPEG and PNG). Returns their relative paths."""
+    path = os.path.join(root, directory)
+    if not os.path.isdir(path):
+        os.makedirs(path)
+    width, height = size
+    gradient = Image.linear_gradient('L') if hasattr(Image, 'linear_gradient') else None
+    images = []
+    for i in range(count):
+        if gradient is not None:
+            band = gradient.resize(size)
+            im = Image.merge('RGB', (band, band.rotate(90, expand=False), band.transpose(Image.FLIP_LEFT_RIGHT)))
+        else:
+            im = Image.new('RGB', size, (i * 37 % 256, i * 71 % 256, i * 13 % 256))
+        relpath = os.path.join(directory, 'image%04d%s' % (i, '.jpg' if i % 2 == 0 else '.png'))
+        im.save(os.path.join(root, relpath))
+        images.append(relpath)
+    return images
@@ -0,0 +1,178 @@
+# coding: utf-8
+"""
+Recursive file count, total bytes and newest modification time of the trash
+directories.
+
+The aggregates are computed in one bottom-up pass (``rebuild``), persisted in
+the TrashDirectory table and updated incrementally (``add``, ``remove``,
+``remove_many``, ``resize``, ``update_directory`` and ``remove_tree``)
+whenever collect, restore, purge or the watcher touches a path. Paths are
+relative to the trash, '' is the trash itself. Requests never scan the trash:
+until the media_trash_aggregates command or a collect built the tree, the
+aggregates are unknown (None). The build runs under the exclusive collect
+lock, the incremental updates of concurrent collectors (shards) do not
+conflict.
+"""
+import os
+import time
+from collections import namedtuple
+
+from django.db import transaction
+from django.db.models import F, Value
+from django.db.models.functions import Coalesce, Greatest
+
+from .models import TrashDirectory, hash_path
+from .settings import trash_settings
+from .utils import get_modified_time
+
+DirectoryAggregate = namedtuple('DirectoryAggregate', ['count', 'size', 'mtime'])
+
+
+def normalize(relpath):
+    relpath = os.path.normpath(relpath or os.curdir)
+    return '' if relpath == os.curdir else relpath.replace(os.sep, '/')
+
+
+def ancestors(relpath):
+    """The trash directories containing relpath, from the root down"""
+    parts = normalize(relpath).split('/')[:-1]
+    return [''] + ['/'.join(parts[:i + 1]) for i in range(len(parts))]
+
+
+def _get_timestamp(storage, name):
+    return time.mktime(get_modified_time(storage, name).timetuple())
+
+
+def _scan(storage, name, relpath, directories):
+    dirs, files = storage.listdir(name)
+    directory = TrashDirectory(path=relpath, path_hash=hash_path(relpath))
+    for f in files:
+        filepath = os.path.join(name, f)
+        directory.count += 1
+        directory.size += storage.size(filepath)
+        directory.mtime = max(directory.mtime or 0, _get_timestamp(storage, filepath))
+    for d in dirs:
+        child = _scan(storage, os.path.join(name, d), normalize(os.path.join(relpath, d)), directories)
+        directory.count += child.count
+        directory.size += child.size
+        if child.mtime is not None:
+            directory.mtime = max(directory.mtime or 0, child.mtime)
+    directories.append(directory)
+    return directory
+
+
+def _subtree(relpath):
+    queryset = TrashDirectory.objects.all()
+    if relpath:
+        queryset = queryset.filter(path_hash=hash_path(relpath)) | queryset.filter(path__startswith=relpath + '/')
+    return queryset
+
+
+def _as_aggregate(directory):
+    return DirectoryAggregate(directory.count, directory.size, directory.mtime)
+
+
+def rebuild(relpath, storage):
+    """Computes the aggregates of relpath and all its subdirectories in one pass"""
+    relpath = normalize(relpath)
+    directories = []
+    root = _scan(storage, os.path.join(storage.root, relpath), relpath, directories)
+    with transaction.atomic():
+        _subtree(relpath).delete()
+        TrashDirectory.objects.bulk_create(directories, batch_size=500)
+    return _as_aggregate(root)
+
+
+def is_built():
+    return TrashDirectory.objects.filter(path_hash=hash_path('')).exists()
+
+
+def get_aggregate(relpath):
+    """Aggregate of the directory, None until the tree is built or if it has no row"""
+    relpath = normalize(relpath)
+    try:
+        return _as_aggregate(TrashDirectory.objects.get(path_hash=hash_path(relpath)))
+    except TrashDirectory.DoesNotExist:
+        return None
+
+
+def _update(relpath, count=0, size=0, mtime=None):
+    # A running media_trash_watch applies the changes itself.
+    if trash_settings.MEDIA_TRASH_WATCHED:
+        return
+    _update_paths(ancestors(relpath), count, size, mtime)
+
+
+def _update_paths(paths, count=0, size=0, mtime=None):
+    # Until the first rebuild there is nothing to keep up to date.
+    if not is_built():
+        return
+    changes = {'count': F('count') + count, 'size': F('size') + size}
+    if mtime is not None:
+        changes['mtime'] = Greatest(Coalesce('mtime', Value(mtime)), Value(mtime))
+    with transaction.atomic():
+        hashes = dict((hash_path(path), path) for path in paths)
+        existing = set(TrashDirectory.objects.filter(path_hash__in=hashes).values_list('path_hash', flat=True))
+        for path_hash, path in hashes.items():
+            if path_hash not in existing:
+                # get_or_create: a concurrent collector (another shard) may create it meanwhile
+                TrashDirectory.objects.get_or_create(path_hash=path_hash, defaults={'path': path, 'mtime': mtime})
+        TrashDirectory.objects.filter(path_hash__in=hashes).update(**changes)
+
+
+def add(relpath, size, mtime):
+    """A file of size bytes was added to the trash"""
+    _update(relpath, count=1, size=size, mtime=mtime)
+
+
+def remove(relpath, size):
+    """A file of size bytes was removed from the trash"""
+    _update(relpath, count=-1, size=-size)
+
+
+def remove_many(files):
+    """Files were removed from the trash: (relpath, size) pairs, one update per directory"""
+    if trash_settings.MEDIA_TRASH_WATCHED:
+        return
+    directories = {}
+    for relpath, size in files:
+        directory = os.path.dirname(normalize(relpath))
+        count, total = directories.get(directory, (0, 0))
+        directories[directory] = (count + 1, total + size)
+    for directory, (count, size) in directories.items():
+        update_directory(directory, count=-count, size=-size)
+
+
+def resize(relpath, delta):
+    """The size of a file in the trash changed by delta bytes"""
+    _update(relpath, size=delta)
+
+
+def update_directory(relpath, count=0, size=0, mtime=None):
+    """
+    The files directly in the directory relpath changed by count files and
+    size bytes: the net change of a batch of watch events (applied even when
+    MEDIA_TRASH_WATCHED)
+    """
+    relpath = normalize(relpath)
+    _update_paths(ancestors(relpath) + ([relpath] if relpath else []), count, size, mtime)
+
+
+def remove_tree(relpath):
+    """A directory and everything it contains was removed from the trash"""
+    if not trash_settings.MEDIA_TRASH_WATCHED:
+        forget_tree(relpath)
+
+
+def forget_tree(relpath):
+    """
+    Subtracts the aggregates of the directory relpath from its ancestors and
+    deletes them (remove_tree, even when MEDIA_TRASH_WATCHED)
+    """
+    relpath = normalize(relpath)
+    try:
+        directory = TrashDirectory.objects.get(path_hash=hash_path(relpath))
+    except TrashDirectory.DoesNotExist:
+        return
+    _update_paths(ancestors(relpath), count=-directory.count, size=-directory.size)
+    _subtree(relpath).delete()
@@ -7,3 +7,7 @@ class MediaTrashConfig(AppConfig):
     name = 'media_trash'
 
     # verbose_name = u"Media Trash"
+
+    def ready(self):
+        from . import generation, signals
+        signals.trash_collected.connect(generation.bump, dispatch_uid='media_trash.generation.bump')
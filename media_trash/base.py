@@ -4,36 +4,25 @@
 # ====================
 
 import datetime
+import errno
 import mimetypes
 import os
 import tempfile
 import time
 
 from django.core.files import File
-from django.core.files.move import file_move_safe
 from django.utils import timezone
 from django.utils.encoding import python_2_unicode_compatible, force_text
 from django.utils.functional import cached_property
 from django.utils.six import string_types
 
 from media_trash.storage import FileSystemStorage
-from .namers import get_namer
-from .settings import EXTENSIONS, VERSIONS, ADMIN_VERSIONS, VERSIONS_BASEDIR, VERSION_QUALITY, STRICT_PIL, \
-    IMAGE_MAXBLOCK, DEFAULT_PERMISSIONS, MEDIA_TRASH_URL
-from .utils import path_strip, process_image, get_modified_time
-
-if STRICT_PIL:
-    from PIL import Image
-    from PIL import ImageFile
-else:
-    try:
-        from PIL import Image
-        from PIL import ImageFile
-    except ImportError:
-        import Image
-        import ImageFile
-
-ImageFile.MAXBLOCK = IMAGE_MAXBLOCK  # default is 64k
+from . import aggregates, checksums, compression, generation, imagesize, instrumentation, origins, utils
+from .instrumentation import timed
+from .namers import get_namer, normalize_format
+from .settings import trash_settings
+from .utils import path_strip, process_image, get_modified_time, get_image_module, plan_versions, draft_size
+from .walkers import ConcurrentWalker
 
 
 class FileListing(object):
@@ -64,7 +53,7 @@ class FileListing(object):
         self.sorting_by = sorting_by
         self.sorting_order = sorting_order
         if not storage:
-            storage = FileSystemStorage(self.path, base_url=MEDIA_TRASH_URL)
+            storage = FileSystemStorage(self.path, base_url=trash_settings.MEDIA_TRASH_URL)
         self.storage = storage
         self.directory = path
 
@@ -98,30 +87,53 @@ class FileListing(object):
             return (f for f in dirs + files)
         return []
 
-    def _walk(self, path, filelisting):
-        """
-        Recursively walks the path and collects all files and
-        directories.
+    def walk_iter(self):
+        """Yields all files for path as soon as their directory is listed"""
+        if not self.is_folder:
+            return
+        if trash_settings.MEDIA_TRASH_WALK_CONCURRENCY > 1:
+            walk = ConcurrentWalker(self.storage).walk
+        else:
+            walk = self.storage.walk
+        for path, is_dir in walk(self.path):
+            yield path_strip(os.path.join(self.path, path), self.directory)
 
-        Danger: Symbolic links can create cycles and this function
-        ends up in a regression.
+    def walk_sorted(self, after=None):
         """
-        dirs, files = self.storage.listdir(path)
-
-        if dirs:
-            for d in dirs:
-                self._walk(os.path.join(path, d), filelisting)
-                filelisting.extend([path_strip(os.path.join(path, d), self.directory)])
-
-        if files:
-            for f in files:
-                filelisting.extend([path_strip(os.path.join(path, f), self.directory)])
+        Yields (path, is_dir) for all files for path in a stable order
+        (directories before their contents, names sorted), resuming after the
+        path after: the directories sorting before it are not listed at all.
+        """
+        if not self.is_folder:
+            return
+        after = tuple(after.split('/')) if after else None
+        stack = [self._sorted_entries((), self.path)]
+        while stack:
+            try:
+                parts, name, is_dir = next(stack[-1])
+            except StopIteration:
+                stack.pop()
+                continue
+            path = parts + (name,)
+            if after is not None and path <= after:
+                # before the cursor: only a directory leading to it is listed
+                if is_dir and path == after[:len(path)]:
+                    stack.append(self._sorted_entries(path, os.path.join(self.path, *path)))
+                continue
+            yield '/'.join(path), is_dir
+            if is_dir:
+                stack.append(self._sorted_entries(path, os.path.join(self.path, *path)))
+
+    def _sorted_entries(self, parts, name):
+        dirs, files = self.storage.listdir(name)
+        for entry, is_dir in sorted([(d, True) for d in dirs] + [(f, False) for f in files]):
+            yield parts, entry, is_dir
 
     def walk(self):
         """Walk all files for path"""
-        filelisting = []
-        if self.is_folder:
-            self._walk(self.path, filelisting)
+        with timed(instrumentation.WALK, sender=self.__class__) as timer:
+            filelisting = list(self.walk_iter())
+            timer.files = len(filelisting)
         return filelisting
 
     # Cached results of files_listing_total (without any filters and sorting applied)
@@ -219,12 +231,13 @@ class FileObject(object):
     def __init__(self, path, storage=None):
         self.storage = storage
         self.path = os.path.normpath(path)
+        self.codec = compression.get_codec(self.path)
         self.head = os.path.dirname(path)
-        self.filename = os.path.basename(path)
+        self.filename = os.path.basename(compression.strip_suffix(self.path))
         self.filename_lower = self.filename.lower()
         self.filename_root, self.extension = os.path.splitext(self.filename)
         self.mimetype = mimetypes.guess_type(self.filename)
-        self.directory = storage.location
+        self.directory = storage.root
 
     def __str__(self):
         return force_text(self.path)
@@ -245,7 +258,7 @@ class FileObject(object):
     def _get_file_type(self):
         """Get file type as defined in EXTENSIONS."""
         file_type = ''
-        for k, v in EXTENSIONS.items():
+        for k, v in trash_settings.EXTENSIONS.items():
             for extension in v:
                 if self.extension.lower() == extension.lower():
                     file_type = k
@@ -265,14 +278,25 @@ class FileObject(object):
 
     @cached_property
     def filesize(self):
-        """Filesize in bytes"""
-        return self.storage.size(self.path) if self.exists else None
+        """Filesize in bytes (before compression, or the total stored bytes of a folder)"""
+        if not self.exists:
+            return None
+        if self.is_folder:
+            return self.aggregate.size if self.aggregate else None
+        with timed(instrumentation.STAT, files=1, sender=self.__class__) as timer:
+            if self.is_compressed:
+                with self.storage.open(self.path) as f:
+                    timer.bytes = self.codec.original_size(f)
+            else:
+                timer.bytes = self.storage.size(self.path)
+        return timer.bytes
 
     @cached_property
     def date(self):
         """Modified time (from storage) as float (mktime)"""
         if self.exists:
-            return time.mktime(get_modified_time(self.storage, self.path).timetuple())
+            with timed(instrumentation.STAT, files=1, sender=self.__class__):
+                return time.mktime(get_modified_time(self.storage, self.path).timetuple())
         return None
 
     @property
@@ -287,25 +311,57 @@ class FileObject(object):
         """True, if the path exists, False otherwise"""
         return self.storage.exists(self.path)
 
-    def move(self, dst, replace=False):
-        """Move this file to another location"""
-        dstdir = os.path.dirname(dst)
-
-        if not os.path.isdir(dstdir):
-            os.makedirs(dstdir)
-
-        # The file already exists, so we need to avoid name conflict.
-        if not replace and os.path.isfile(dst):
-            filename = os.path.basename(dst)
-            fname, ext = os.path.splitext(filename)
-            dst = os.path.join(dstdir, fname.rstrip("-") + timezone.now().strftime("-%Y-%m-%d-%H%M%S") + ext)
+    @property
+    def is_compressed(self):
+        """True, if the file was compressed in the trash"""
+        return self.codec is not None
+
+    def open_original(self):
+        """Opens the file for reading its original (decompressed) contents"""
+        f = self.storage.open(self.path)
+        if self.is_compressed:
+            return self.codec.open(f)
+        return f
+
+    def move(self, dst, replace=False, makedirs=True):
+        """
+        Move this file to another location. Returns the destination, which
+        gets a timestamp suffix if dst is taken (unless replace).
+        makedirs=False skips creating the destination directory.
+        """
+        if makedirs:
+            utils.makedirs(os.path.dirname(dst))
 
-        file_move_safe(self.storage.path(self.path), dst,
-                       allow_overwrite=True)
+        size = self.storage.size(self.path)
+        with timed(instrumentation.MOVE, files=1, bytes=size, sender=self.__class__):
+            try:
+                self._move(dst, replace)
+            except (IOError, OSError) as e:
+                if replace or e.errno != errno.EEXIST:
+                    raise
+                # The file already exists, so we need to avoid name conflict.
+                fname, ext = os.path.splitext(os.path.basename(dst))
+                dst = os.path.join(os.path.dirname(dst),
+                                   fname.rstrip("-") + timezone.now().strftime("-%Y-%m-%d-%H%M%S") + ext)
+                self._move(dst, replace)
+        aggregates.remove(self.path_relative_directory, size)
+        return dst
+
+    def _move(self, dst, replace):
+        """Moves the file (decompressed) to dst, an OSError (EEXIST) if it is taken unless replace"""
+        if self.is_compressed:
+            with self.storage.open(self.path) as f:
+                compression.decompress_file(f, self.codec, dst, mtime=self.date,
+                                            mode=getattr(self.storage, 'file_permissions_mode', None),
+                                            allow_overwrite=replace)
+            self.storage.delete(self.path)
+        else:
+            self.storage.export_file(self.path, dst, allow_overwrite=replace)
 
     # PATH/URL ATTRIBUTES/PROPERTIES
     # path (see init)
     # path_relative_directory
+    # path_relative_restore
     # path_full
     # dirname
     # url
@@ -315,6 +371,11 @@ class FileObject(object):
         """Path relative to directory"""
         return path_strip(self.path, self.directory)
 
+    @property
+    def path_relative_restore(self):
+        """Path relative to directory, as it was before compression"""
+        return compression.strip_suffix(self.path_relative_directory)
+
     @property
     def path_full(self):
         """Absolute path as defined with storage"""
@@ -339,14 +400,10 @@ class FileObject(object):
 
     @cached_property
     def dimensions(self):
-        """Image dimensions as a tuple"""
-        if self.filetype != 'Image':
+        """Image dimensions as a tuple (read from the image header)"""
+        if self.filetype != 'Image' or not self.exists:
             return None
-        try:
-            im = Image.open(self.storage.open(self.path))
-            return im.size
-        except:
-            pass
+        return imagesize.get_dimensions(self.path, self.filesize, self.date, self.open_original)
 
     @property
     def width(self):
@@ -382,6 +439,8 @@ class FileObject(object):
     # FOLDER ATTRIBUTES/PROPERTIES
     # is_folder
     # is_empty
+    # aggregate
+    # filecount
 
     @cached_property
     def is_folder(self):
@@ -392,11 +451,27 @@ class FileObject(object):
     def is_empty(self):
         """True, if folder is empty. False otherwise, or if the object is not a folder."""
         if self.is_folder:
+            if self.aggregate and self.aggregate.count:
+                return False
             dirs, files = self.storage.listdir(self.path)
             if not dirs and not files:
                 return True
         return False
 
+    @cached_property
+    def aggregate(self):
+        """Recursive file count, total bytes and newest mtime of a folder (None until they are built)"""
+        if self.is_folder:
+            return aggregates.get_aggregate(self.path_relative_directory)
+        return None
+
+    @property
+    def filecount(self):
+        """Number of files in a folder (recursively)"""
+        if self.aggregate:
+            return self.aggregate.count
+        return None
+
     # VERSION ATTRIBUTES/PROPERTIES
     # is_version
     # versions_basedir
@@ -406,13 +481,13 @@ class FileObject(object):
     @property
     def is_version(self):
         """True if file is a version, false otherwise"""
-        return self.head.startswith(VERSIONS_BASEDIR)
+        return self.head.startswith(trash_settings.VERSIONS_BASEDIR)
 
     @property
     def versions_basedir(self):
         """Main directory for storing versions (either VERSIONS_BASEDIR or directory)"""
-        if VERSIONS_BASEDIR:
-            return VERSIONS_BASEDIR
+        if trash_settings.VERSIONS_BASEDIR:
+            return trash_settings.VERSIONS_BASEDIR
         elif self.directory:
             return self.directory
         else:
@@ -444,9 +519,10 @@ class FileObject(object):
     # version_name(suffix)
     # version_path(suffix)
     # version_generate(suffix)
+    # versions_generate(suffixes)
 
     def _get_options(self, version_suffix, extra_options=None):
-        options = dict(VERSIONS.get(version_suffix, {}))
+        options = dict(trash_settings.VERSIONS.get(version_suffix, {}))
         if extra_options:
             options.update(extra_options)
         if 'size' in options and 'width' not in options:
@@ -459,7 +535,7 @@ class FileObject(object):
         """List of versions (not checking if they actually exist)"""
         version_list = []
         if self.filetype == "Image" and not self.is_version:
-            for version in sorted(VERSIONS):
+            for version in sorted(trash_settings.VERSIONS):
                 version_list.append(os.path.join(self.versions_basedir, self.dirname, self.version_name(version)))
         return version_list
 
@@ -467,7 +543,7 @@ class FileObject(object):
         """List of admin versions (not checking if they actually exist)"""
         version_list = []
         if self.filetype == "Image" and not self.is_version:
-            for version in ADMIN_VERSIONS:
+            for version in trash_settings.ADMIN_VERSIONS:
                 version_list.append(os.path.join(self.versions_basedir, self.dirname, self.version_name(version)))
         return version_list
 
@@ -497,25 +573,68 @@ class FileObject(object):
         options = self._get_options(version_suffix, extra_options)
 
         version_path = self.version_path(version_suffix, extra_options)
-        if not self.storage.isfile(version_path):
-            version_path = self._generate_version(version_path, options)
-        elif get_modified_time(self.storage, path) > get_modified_time(self.storage, version_path):
-            version_path = self._generate_version(version_path, options)
+        if not self.storage.isfile(version_path) or \
+                get_modified_time(self.storage, path) > get_modified_time(self.storage, version_path):
+            with timed(instrumentation.VERSION_GENERATE, files=1, sender=self.__class__):
+                version_path = self._generate_version(version_path, options)
         return FileObject(version_path, storage=self.storage)
 
+    def versions_generate(self, version_suffixes=None, extra_options=None):
+        """
+        Generate several versions (default: all VERSIONS), decoding the
+        original once. The geometries are planned together: a JPEG is
+        decoded at the smallest scale that the largest version allows.
+        """
+        if version_suffixes is None:
+            version_suffixes = sorted(trash_settings.VERSIONS)
+        version_paths = [self.version_path(suffix, extra_options) for suffix in version_suffixes]
+        stale = []
+        for suffix, version_path in zip(version_suffixes, version_paths):
+            if not self.storage.isfile(version_path) or \
+                    get_modified_time(self.storage, self.path) > get_modified_time(self.storage, version_path):
+                stale.append((version_path, self._get_options(suffix, extra_options)))
+        if stale:
+            with timed(instrumentation.VERSION_GENERATE, files=len(stale), sender=self.__class__):
+                im = self._open_image([options for version_path, options in stale])
+                if im is not None:
+                    for version_path, options in stale:
+                        self._save_version(im, version_path, options)
+        return [FileObject(version_path, storage=self.storage) for version_path in version_paths]
+
+    def _open_image(self, options_list=None):
+        """
+        The decoded original image (None if it cannot be read). A JPEG is
+        drafted for the versions of options_list.
+        """
+        try:
+            f = self.storage.open(self.path)
+        except IOError:
+            return None
+        try:
+            im = get_image_module().open(f)
+            if options_list and im.format == 'JPEG':
+                size = draft_size(im.size, plan_versions(im.size, options_list))
+                if size is not None:
+                    im.draft(im.mode, size)
+            im.load()
+        finally:
+            f.close()
+        return im
+
     def _generate_version(self, version_path, options):
         """
         Generate Version for an Image.
         value has to be a path relative to the storage location.
         """
+        im = self._open_image()
+        if im is None:
+            return ""
+        return self._save_version(im, version_path, options)
 
+    def _save_version(self, im, version_path, options):
+        """Process the image im with options and save it as version_path"""
+        Image = get_image_module()
         tmpfile = File(tempfile.NamedTemporaryFile())
-
-        try:
-            f = self.storage.open(self.path)
-        except IOError:
-            return ""
-        im = Image.open(f)
         version_dir, version_basename = os.path.split(version_path)
         root, ext = os.path.splitext(version_basename)
         version = process_image(im, options)
@@ -530,19 +649,30 @@ class FileObject(object):
         if ext in [".jpg", ".jpeg"] and version.mode not in ("L", "RGB"):
             version = version.convert("RGB")
 
-        # save version
-        try:
-            version.save(tmpfile, format=Image.EXTENSION[ext.lower()], quality=VERSION_QUALITY,
-                         optimize=(os.path.splitext(version_path)[1] != '.gif'))
-        except IOError:
-            version.save(tmpfile, format=Image.EXTENSION[ext.lower()], quality=VERSION_QUALITY)
+        # save version: the encoder options of the version, then its quality, then the defaults of the format
+        quality = options.get('quality', trash_settings.VERSION_QUALITY)
+        if options.get('format'):
+            output_format = normalize_format(options['format'])
+            params = dict(options.get('format_options') or {})
+            if 'quality' in options:
+                params.setdefault('quality', options['quality'])
+            for key, value in trash_settings.VERSION_FORMAT_OPTIONS.get(output_format, {}).items():
+                params.setdefault(key, value)
+            params.setdefault('quality', quality)
+            version.save(tmpfile, format=output_format.upper(), **params)
+        else:
+            try:
+                version.save(tmpfile, format=Image.EXTENSION[ext.lower()], quality=quality,
+                             optimize=(os.path.splitext(version_path)[1] != '.gif'))
+            except IOError:
+                version.save(tmpfile, format=Image.EXTENSION[ext.lower()], quality=quality)
         # remove old version, if any
         if version_path != self.storage.get_available_name(version_path):
             self.storage.delete(version_path)
         self.storage.save(version_path, tmpfile)
         # set permissions
-        if DEFAULT_PERMISSIONS is not None:
-            os.chmod(self.storage.path(version_path), DEFAULT_PERMISSIONS)
+        if trash_settings.DEFAULT_PERMISSIONS is not None:
+            self.storage.setpermission(version_path)
         return version_path
 
     # DELETE METHODS
@@ -554,8 +684,16 @@ class FileObject(object):
         """Delete FileObject (deletes a folder recursively)"""
         if self.is_folder:
             self.storage.rmtree(self.path)
+            aggregates.remove_tree(self.path_relative_directory)
+            origins.forget(self.path_relative_directory, tree=True)
+            checksums.forget(self.path_relative_directory, tree=True)
         else:
+            size = self.storage.size(self.path)
             self.storage.delete(self.path)
+            aggregates.remove(self.path_relative_directory, size)
+            origins.forget(self.path_relative_restore)
+            checksums.forget(self.path_relative_restore)
+        generation.bump()
 
     def delete_versions(self):
         """Delete versions"""
@@ -0,0 +1,243 @@
+# coding: utf-8
+"""
+Integrity of the trash: a manifest (TrashChecksum) of the sha256 of the
+trashed files, keyed like the origins by the path relative to the trash
+before compression.
+
+media_trash_collect records the checksum of every source file before moving
+it (MEDIA_TRASH_CHECKSUM), so a copy damaged by a cross-device move is found
+by the next scrub. The media_trash_scrub command (Scrubber) verifies the
+manifest: only the files whose size or mtime changed since their last
+verification are hashed again. Files are hashed in a process pool, the big
+ones through mmap. The files compressed by the trash (compression.MARKER)
+are hashed by their original contents, so compaction keeps their checksum;
+any other file, archives included, is hashed as it is stored.
+"""
+import hashlib
+import mmap
+import multiprocessing
+import os
+import timeit
+from collections import Counter
+
+from django.db.models import BigIntegerField, Case, FloatField, Value, When
+from django.utils import timezone
+
+from . import aggregates, compression
+from .models import TrashChecksum, hash_path
+from .settings import trash_settings
+
+BATCH_SIZE = 500
+READ_SIZE = 1024 * 1024
+MMAP_THRESHOLD = 8 * 1024 * 1024  # hash files from this size through mmap
+
+OK = 'ok'
+UNCHANGED = 'unchanged'  # same size and mtime as when last verified
+RECORDED = 'recorded'  # not in the manifest yet
+CORRUPT = 'corrupt'  # the contents no longer match the checksum
+UNREADABLE = 'unreadable'
+MISSING = 'missing'  # in the manifest, not in the trash
+
+# temporary files of compress_file and decompress_file
+TEMPORARY_PREFIXES = ('.compress-', '.restore-')
+
+
+def hash_file(path, decompress=True):
+    """
+    Hashes the local file path, or the original contents of a file compressed
+    by the trash if decompress. Returns the tuple (path, sha256, original
+    size, stat of the file, error): sha256 and size are None and error is the
+    message if it could not be read.
+    """
+    try:
+        with open(path, 'rb') as f:
+            stat = os.fstat(f.fileno())
+            digest = hashlib.sha256()
+            codec = compression.get_codec(path) if decompress else None
+            if codec is not None:
+                reader = codec.open(f)
+                size = 0
+                while True:
+                    chunk = reader.read(READ_SIZE)
+                    if not chunk:
+                        break
+                    digest.update(chunk)
+                    size += len(chunk)
+            elif stat.st_size >= MMAP_THRESHOLD:
+                mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                try:
+                    digest.update(mapped)
+                finally:
+                    mapped.close()
+                size = stat.st_size
+            else:
+                size = 0
+                while True:
+                    chunk = f.read(READ_SIZE)
+                    if not chunk:
+                        break
+                    digest.update(chunk)
+                    size += len(chunk)
+    except Exception as e:  # unreadable or not decompressible
+        return path, None, None, None, "%s: %s" % (e.__class__.__name__, e)
+    return path, digest.hexdigest(), size, (stat.st_size, stat.st_mtime), None
+
+
+def _hash_file(args):
+    return hash_file(*args)
+
+
+def hash_files(paths, workers=None, decompress=True):
+    """Hashes the local files in a process pool, yielding the hash_file results (unordered)"""
+    paths = list(paths)
+    if not paths:
+        return
+    workers = workers or trash_settings.MEDIA_TRASH_CHECKSUM_WORKERS
+    pool = multiprocessing.Pool(workers)
+    try:
+        for result in pool.imap_unordered(_hash_file, [(path, decompress) for path in paths], chunksize=4):
+            yield result
+    finally:
+        pool.close()
+        pool.join()
+
+
+def record(items):
+    """
+    Records the checksums of trashed files: items are (path relative to the
+    trash, sha256, original size) tuples. Replaces the previous records of
+    the same paths; the stored files are verified by the next scrub.
+    """
+    records = []
+    for relpath, sha256, size in items:
+        path = aggregates.normalize(compression.strip_suffix(relpath))
+        records.append(TrashChecksum(path=path, path_hash=hash_path(path), sha256=sha256, size=size))
+    for i in range(0, len(records), BATCH_SIZE):
+        batch = records[i:i + BATCH_SIZE]
+        TrashChecksum.objects.filter(path_hash__in=[r.path_hash for r in batch]).delete()
+        TrashChecksum.objects.bulk_create(batch)
+
+
+def forget(relpath, tree=False):
+    """Removes the checksums of a trash path (and of everything below it if tree)"""
+    relpath = aggregates.normalize(relpath)
+    checksums = TrashChecksum.objects.all()
+    if tree:
+        if relpath:
+            checksums = checksums.filter(path__startswith=relpath + '/')
+    else:
+        checksums = checksums.filter(path_hash=hash_path(relpath))
+    checksums.delete()
+
+
+def forget_many(relpaths):
+    """Removes the checksums of trash files"""
+    hashes = [hash_path(aggregates.normalize(relpath)) for relpath in relpaths]
+    for i in range(0, len(hashes), BATCH_SIZE):
+        TrashChecksum.objects.filter(path_hash__in=hashes[i:i + BATCH_SIZE]).delete()
+
+
+class Scrubber(object):
+    """
+    Verifies the trash (root: its local path) against the manifest::
+
+        scrubber = Scrubber(storage.path(trash_settings.MEDIA_TRASH_PATH))
+        for relpath, status, detail in scrubber.scrub():
+            ...
+
+    The counts of every status, the hashed bytes and the hashing time are
+    kept in counts, bytes and elapsed.
+    """
+
+    def __init__(self, root, workers=None):
+        self.root = os.path.normpath(root)
+        self.workers = workers
+        self.counts = Counter()
+        self.bytes = 0
+        self.elapsed = 0
+
+    def find_files(self):
+        """Yields (manifest path, local path, (size, mtime)) for the files of the trash"""
+        versions = trash_settings.VERSIONS_BASEDIR.strip('/')
+        seen = set()
+        for dirpath, dirnames, filenames in os.walk(self.root):
+            if dirpath == self.root and versions in dirnames:
+                dirnames.remove(versions)  # generated, not trashed
+            dirnames.sort()
+            for filename in sorted(filenames):
+                if filename.startswith(TEMPORARY_PREFIXES):
+                    continue
+                path = os.path.join(dirpath, filename)
+                relpath = aggregates.normalize(compression.strip_suffix(os.path.relpath(path, self.root)))
+                if relpath in seen:  # being compressed: the original and the compressed file
+                    continue
+                try:
+                    stat = os.stat(path)
+                except OSError:  # gone meanwhile
+                    continue
+                seen.add(relpath)
+                yield relpath, path, (stat.st_size, stat.st_mtime)
+
+    def scrub(self, full=False, prune=False):
+        """
+        Yields (path relative to the trash, status, detail) for every file that
+        was hashed or is missing; full hashes the unchanged files too, prune
+        removes the checksums of the missing files.
+        """
+        manifest = {}
+        for pk, path, sha256, size, stored_size, stored_mtime in TrashChecksum.objects.values_list(
+                'pk', 'path', 'sha256', 'size', 'stored_size', 'stored_mtime').iterator():
+            manifest[path] = pk, sha256, size, (stored_size, stored_mtime)
+
+        pending = {}
+        for relpath, path, stat in self.find_files():
+            checksum = manifest.pop(relpath, None)
+            if checksum is not None and not full and checksum[3] == stat:
+                self.counts[UNCHANGED] += 1
+                continue
+            pending[path] = relpath, checksum
+
+        missing = sorted(manifest)
+        for relpath in missing:
+            self.counts[MISSING] += 1
+            yield relpath, MISSING, None
+        if prune:
+            forget_many(missing)
+
+        verified = []
+        recorded = []
+        start = timeit.default_timer()
+        for path, sha256, size, stat, error in hash_files(pending, workers=self.workers):
+            relpath, checksum = pending[path]
+            if stat is not None:
+                self.bytes += stat[0]
+            if error is not None:
+                status, detail = UNREADABLE, error
+            elif checksum is None:
+                status, detail = RECORDED, sha256
+                recorded.append((relpath, sha256, size, stat))
+            elif (sha256, size) != (checksum[1], checksum[2]):
+                status, detail = CORRUPT, "sha256 %s, expected %s" % (sha256, checksum[1])
+            else:
+                status, detail = OK, None
+                verified.append((checksum[0], stat))
+            self.counts[status] += 1
+            yield relpath, status, detail
+        self.elapsed = timeit.default_timer() - start
+
+        now = timezone.now()
+        for i in range(0, len(recorded), BATCH_SIZE):
+            batch = [TrashChecksum(path=name, path_hash=hash_path(name), sha256=digest, size=original_size,
+                                   stored_size=stored[0], stored_mtime=stored[1], verified=now)
+                     for name, digest, original_size, stored in recorded[i:i + BATCH_SIZE]]
+            # recorded by a collect meanwhile: the stored file was hashed after it
+            TrashChecksum.objects.filter(path_hash__in=[r.path_hash for r in batch]).delete()
+            TrashChecksum.objects.bulk_create(batch)
+        for i in range(0, len(verified), BATCH_SIZE):
+            batch = verified[i:i + BATCH_SIZE]
+            TrashChecksum.objects.filter(pk__in=[pk for pk, _ in batch]).update(
+                stored_size=Case(*[When(pk=pk, then=Value(stored[0])) for pk, stored in batch],
+                                 output_field=BigIntegerField()),
+                stored_mtime=Case(*[When(pk=pk, then=Value(stored[1])) for pk, stored in batch],
+                                  output_field=FloatField()),
+                verified=now)
@@ -0,0 +1,212 @@
+# coding: utf-8
+"""
+Transparent compression of the cold files kept in the trash.
+
+A compressed file keeps its original name plus the marker and the codec
+suffix (``report.pdf`` -> ``report.pdf.mtz.gz``): the marker tells the files
+compressed by the trash from the archives trashed as they are
+(``backup.sql.gz``), which are never decompressed. The original name, size
+and contents can always be recovered from the trash itself.
+"""
+import gzip
+import multiprocessing
+import os
+import shutil
+import struct
+import tempfile
+import zlib
+
+from django.conf import settings
+
+from .settings import trash_settings
+from .utils import move_file
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+CHUNK_SIZE = 64 * 1024
+
+# Written before the codec suffix by this app only.
+MARKER = '.mtz'
+
+GZIP_HEADER = struct.Struct('<2s2BL2BH')  # magic, method, flags, mtime, xfl, os, xlen
+GZIP_FEXTRA = 0x04
+GZIP_TRAILER = struct.Struct('<2L')  # crc32, size modulo 2^32
+# FEXTRA subfield keeping the original size: id, length, size
+SIZE_FIELD = struct.Struct('<2sHQ')
+SIZE_FIELD_ID = b'MT'
+
+
+class GzipCodec(object):
+    name = 'gzip'
+    suffix = MARKER + '.gz'
+
+    def _write_header(self, dst, size):
+        dst.write(GZIP_HEADER.pack(b'\037\213', 8, GZIP_FEXTRA, 0, 0, 255, SIZE_FIELD.size) +
+                  SIZE_FIELD.pack(SIZE_FIELD_ID, SIZE_FIELD.size - 4, size))
+
+    def compress(self, src, dst):
+        """
+        Writes a gzip member whose FEXTRA field keeps the original size
+        (the ISIZE trailer is only the size modulo 4 GB).
+        """
+        with open(src, 'rb') as fsrc:
+            start = dst.tell()
+            size = os.fstat(fsrc.fileno()).st_size
+            self._write_header(dst, size)
+            compressor = zlib.compressobj(9, zlib.DEFLATED, -15)
+            crc = length = 0
+            while True:
+                chunk = fsrc.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                crc = zlib.crc32(chunk, crc)
+                length += len(chunk)
+                dst.write(compressor.compress(chunk))
+            dst.write(compressor.flush())
+            dst.write(GZIP_TRAILER.pack(crc & 0xFFFFFFFF, length & 0xFFFFFFFF))
+            if length != size:  # changed while being compressed
+                end = dst.tell()
+                dst.seek(start)
+                self._write_header(dst, length)
+                dst.seek(end)
+
+    def open(self, fileobj):
+        f = gzip.GzipFile(filename='', mode='rb', fileobj=fileobj)
+        f.myfileobj = fileobj  # closed along with the GzipFile
+        return f
+
+    def original_size(self, fileobj):
+        header = fileobj.read(GZIP_HEADER.size + SIZE_FIELD.size)
+        if len(header) == GZIP_HEADER.size + SIZE_FIELD.size:
+            magic, method, flags, mtime, xfl, os_code, xlen = GZIP_HEADER.unpack_from(header)
+            field_id, field_length, size = SIZE_FIELD.unpack_from(header, GZIP_HEADER.size)
+            if flags & GZIP_FEXTRA and field_id == SIZE_FIELD_ID and field_length == SIZE_FIELD.size - 4:
+                return size
+        # ISIZE trailer: size of the uncompressed input modulo 2^32.
+        fileobj.seek(-4, os.SEEK_END)
+        return struct.unpack('<I', fileobj.read(4))[0]
+
+
+class ZstdCodec(object):
+    name = 'zstd'
+    suffix = MARKER + '.zst'
+
+    def compress(self, src, dst):
+        with open(src, 'rb') as fsrc:
+            zstandard.ZstdCompressor().copy_stream(fsrc, dst, size=os.path.getsize(src))
+
+    def open(self, fileobj):
+        return zstandard.ZstdDecompressor().stream_reader(fileobj)
+
+    def original_size(self, fileobj):
+        size = zstandard.frame_content_size(fileobj.read(18))
+        return size if size >= 0 else None
+
+
+CODECS = [GzipCodec()]
+if zstandard is not None:
+    CODECS.append(ZstdCodec())
+
+
+def get_codec(name):
+    """Returns the codec that compressed the file name (with the marker) or None"""
+    for codec in CODECS:
+        if name.endswith(codec.suffix):
+            return codec
+    return None
+
+
+def get_default_codec():
+    for codec in CODECS:
+        if codec.name == trash_settings.MEDIA_TRASH_COMPRESS_FORMAT:
+            return codec
+    raise ValueError("unknown compression format: %s" % trash_settings.MEDIA_TRASH_COMPRESS_FORMAT)
+
+
+def strip_suffix(name):
+    """Name of the file before compression"""
+    codec = get_codec(name)
+    if codec is None:
+        return name
+    return name[:-len(codec.suffix)]
+
+
+def is_compressible(name):
+    """True if the file type is worth compressing (and is not compressed yet)"""
+    if get_codec(name) is not None:
+        return False
+    extension = os.path.splitext(name)[1].lower()
+    for category in trash_settings.MEDIA_TRASH_COMPRESS_CATEGORIES:
+        if extension in [ext.lower() for ext in trash_settings.EXTENSIONS.get(category, [])]:
+            return True
+    return False
+
+
+def compress_file(path, codec_name=None):
+    """
+    Compresses the file in place (path -> path + suffix).
+
+    Returns the tuple (path, original size, compressed size). The compressed
+    size is None when the file compresses poorly and was left untouched.
+    """
+    codec = get_default_codec() if codec_name is None else \
+        [c for c in CODECS if c.name == codec_name][0]
+    size = os.path.getsize(path)
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix='.compress-')
+    try:
+        with os.fdopen(fd, 'wb') as tmp:
+            codec.compress(path, tmp)
+        compressed_size = os.path.getsize(tmp_path)
+        if compressed_size > size * trash_settings.MEDIA_TRASH_COMPRESS_MIN_RATIO:
+            os.remove(tmp_path)
+            return path, size, None
+        shutil.copystat(path, tmp_path)
+        os.rename(tmp_path, path + codec.suffix)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    os.remove(path)
+    return path, size, compressed_size
+
+
+def _compress_file(args):
+    return compress_file(*args)
+
+
+def compress_files(paths, workers=None):
+    """Compresses the files in a process pool, yielding the compress_file results"""
+    codec = get_default_codec()
+    workers = workers or trash_settings.MEDIA_TRASH_COMPRESS_WORKERS
+    pool = multiprocessing.Pool(workers)
+    try:
+        for result in pool.imap_unordered(_compress_file, [(path, codec.name) for path in paths]):
+            yield result
+    finally:
+        pool.close()
+        pool.join()
+
+
+def decompress_file(fileobj, codec, dst, mtime=None, mode=None, allow_overwrite=True):
+    """
+    Streams the decompressed contents of fileobj into the file dst, with the
+    permissions mode (default: FILE_UPLOAD_PERMISSIONS, else 0o644). Unless
+    allow_overwrite, raises an OSError (EEXIST) if dst exists.
+    """
+    if mode is None:
+        mode = settings.FILE_UPLOAD_PERMISSIONS
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(dst), prefix='.restore-')
+    try:
+        with os.fdopen(fd, 'wb') as fdst:
+            shutil.copyfileobj(codec.open(fileobj), fdst, CHUNK_SIZE)
+        os.chmod(tmp_path, 0o644 if mode is None else mode)
+        if mtime is not None:
+            os.utime(tmp_path, (mtime, mtime))
+        move_file(tmp_path, dst, allow_overwrite=allow_overwrite)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
@@ -0,0 +1,223 @@
+# coding: utf-8
+"""
+Zip and tar archives of trash files, generated chunk by chunk (for a
+StreamingHttpResponse or a file) without a temporary archive::
+
+    for chunk in stream_archive(iter_files(storage, ['reports', 'a/b.pdf']), 'zip'):
+        output.write(chunk)
+
+Files compressed in the trash are exported with their original contents.
+Zip members are written with data descriptors (so their size and CRC are
+only needed after their data) and zip64 records where the sizes or offsets
+need them. Only the central directory (one small record per member) is kept
+in memory until the end of the archive.
+"""
+import os
+import struct
+import tarfile
+import time
+import zlib
+
+from django.utils.encoding import force_text
+
+from .base import FileListing, FileObject
+from .settings import trash_settings
+
+CHUNK_SIZE = 64 * 1024
+
+# name: (content type, extension)
+FORMATS = {
+    'zip': ('application/zip', '.zip'),
+    'tar': ('application/x-tar', '.tar'),
+}
+
+# already compressed, whatever their category
+STORED_EXTENSIONS = frozenset(['.zip', '.gz', '.tgz', '.zst', '.bz2', '.xz', '.7z', '.rar',
+                               '.docx', '.xlsx', '.pptx', '.odt', '.ods', '.odp'])
+
+ZIP64_LIMIT = (1 << 31) - 1
+ZIP_FILECOUNT_LIMIT = (1 << 16) - 1
+ZIP_MAX = 0xFFFFFFFF
+ZIP_STORED = 0
+ZIP_DEFLATED = 8
+FLAG_DATA_DESCRIPTOR = 0x08
+FLAG_UTF8 = 0x800
+
+LOCAL_HEADER = struct.Struct('<4s2B4HL2L2H')
+DATA_DESCRIPTOR = struct.Struct('<4sL2L')
+DATA_DESCRIPTOR64 = struct.Struct('<4sL2Q')
+CENTRAL_DIRECTORY = struct.Struct('<4s4B4HL2L5H2L')
+END_ARCHIVE = struct.Struct('<4s4H2LH')
+END_ARCHIVE64 = struct.Struct('<4sQ2H2L4Q')
+END_ARCHIVE64_LOCATOR = struct.Struct('<4sLQL')
+
+
+def iter_files(storage, relpaths):
+    """FileObjects of the files at (or below) the paths relative to the trash, in order"""
+    for relpath in relpaths:
+        path = os.path.join(trash_settings.MEDIA_TRASH_PATH, relpath)
+        fileobject = FileObject(path, storage=storage)
+        if fileobject.is_folder:
+            file_listing = FileListing(path, storage=storage)
+            for walkpath, is_dir in file_listing.walk_sorted():
+                if not is_dir:
+                    yield FileObject(os.path.join(file_listing.path, walkpath), storage=storage)
+        elif fileobject.exists:
+            yield fileobject
+
+
+def is_stored(name):
+    """True if the file type is already compressed (stored as is in a zip)"""
+    extension = os.path.splitext(name)[1].lower()
+    if extension in STORED_EXTENSIONS:
+        return True
+    for category in trash_settings.MEDIA_TRASH_EXPORT_STORED_CATEGORIES:
+        if extension in [ext.lower() for ext in trash_settings.EXTENSIONS.get(category, [])]:
+            return True
+    return False
+
+
+def _read_chunks(fileobject):
+    f = fileobject.open_original()
+    try:
+        while True:
+            chunk = f.read(CHUNK_SIZE)
+            if not chunk:
+                break
+            yield chunk
+    finally:
+        f.close()
+
+
+def _arcname(fileobject):
+    return force_text(fileobject.path_relative_restore).replace(os.sep, '/')
+
+
+class ZipStream(object):
+    """Writes a zip archive member by member (see stream_archive)"""
+
+    def __init__(self):
+        self.offset = 0
+        self.members = []
+
+    def _dos_time(self, mtime):
+        t = time.localtime(mtime)
+        if t.tm_year < 1980:
+            return 0, 1 << 5 | 1  # 1980-01-01
+        return (t.tm_hour << 11 | t.tm_min << 5 | t.tm_sec // 2,
+                (t.tm_year - 1980) << 9 | t.tm_mon << 5 | t.tm_mday)
+
+    def add(self, fileobject):
+        """Yields the chunks of a member"""
+        name = _arcname(fileobject).encode('utf-8')
+        method = ZIP_STORED if is_stored(name.decode('utf-8')) else ZIP_DEFLATED
+        dos_time, dos_date = self._dos_time(fileobject.date or time.time())
+        zip64 = (fileobject.filesize or 0) * 1.05 > ZIP64_LIMIT
+        offset = self.offset
+        flags = FLAG_DATA_DESCRIPTOR | FLAG_UTF8
+        version = 45 if zip64 else 20
+
+        extra = struct.pack('<2H2Q', 1, 16, 0, 0) if zip64 else b''
+        header = LOCAL_HEADER.pack(b'PK\003\004', version, 0, flags, method, dos_time, dos_date, 0,
+                                   ZIP_MAX if zip64 else 0, ZIP_MAX if zip64 else 0, len(name), len(extra))
+        yield self._written(header + name + extra)
+
+        crc = size = compressed_size = 0
+        compressor = zlib.compressobj(6, zlib.DEFLATED, -15) if method == ZIP_DEFLATED else None
+        for chunk in _read_chunks(fileobject):
+            crc = zlib.crc32(chunk, crc)
+            size += len(chunk)
+            if compressor is not None:
+                chunk = compressor.compress(chunk)
+            if chunk:
+                compressed_size += len(chunk)
+                yield self._written(chunk)
+        if compressor is not None:
+            chunk = compressor.flush()
+            compressed_size += len(chunk)
+            yield self._written(chunk)
+        crc &= 0xFFFFFFFF
+
+        if zip64:
+            descriptor = DATA_DESCRIPTOR64.pack(b'PK\007\010', crc, compressed_size, size)
+        elif size > ZIP_MAX or compressed_size > ZIP_MAX:
+            raise IOError("%s grew over 4 GB while being archived" % fileobject.path)
+        else:
+            descriptor = DATA_DESCRIPTOR.pack(b'PK\007\010', crc, compressed_size, size)
+        yield self._written(descriptor)
+        self.members.append((name, flags, method, dos_time, dos_date, crc, compressed_size, size, offset))
+
+    def close(self):
+        """Yields the central directory and the end records"""
+        start = self.offset
+        for name, flags, method, dos_time, dos_date, crc, compressed_size, size, offset in self.members:
+            extra = []
+            if size > ZIP64_LIMIT or compressed_size > ZIP64_LIMIT:
+                extra += [size, compressed_size]
+                size = compressed_size = ZIP_MAX
+            if offset > ZIP64_LIMIT:
+                extra.append(offset)
+                offset = ZIP_MAX
+            extra = struct.pack('<2H%dQ' % len(extra), 1, 8 * len(extra), *extra) if extra else b''
+            version = 45 if extra else 20
+            record = CENTRAL_DIRECTORY.pack(
+                b'PK\001\002', version, 3, version, 0, flags, method, dos_time, dos_date, crc,
+                compressed_size, size, len(name), len(extra), 0, 0, 0, 0o100644 << 16, offset)
+            yield self._written(record + name + extra)
+        count, directory_size = len(self.members), self.offset - start
+
+        if count >= ZIP_FILECOUNT_LIMIT or directory_size > ZIP64_LIMIT or start > ZIP64_LIMIT:
+            end64 = self.offset
+            yield self._written(END_ARCHIVE64.pack(b'PK\006\006', END_ARCHIVE64.size - 12, 45, 45, 0, 0,
+                                                   count, count, directory_size, start) +
+                                END_ARCHIVE64_LOCATOR.pack(b'PK\006\007', 0, end64, 1))
+            count = min(count, ZIP_FILECOUNT_LIMIT)
+            directory_size = min(directory_size, ZIP_MAX)
+            start = min(start, ZIP_MAX)
+        yield self._written(END_ARCHIVE.pack(b'PK\005\006', 0, 0, count, count, directory_size, start, 0))
+
+    def _written(self, data):
+        self.offset += len(data)
+        return data
+
+
+class TarStream(object):
+    """Writes a (pax) tar archive member by member (see stream_archive)"""
+
+    def _get_size(self, fileobject):
+        if fileobject.filesize is not None:
+            return fileobject.filesize
+        # not stored by the codec (zstd frames without a content size)
+        return sum(len(chunk) for chunk in _read_chunks(fileobject))
+
+    def add(self, fileobject):
+        """Yields the chunks of a member"""
+        info = tarfile.TarInfo(_arcname(fileobject))
+        info.size = self._get_size(fileobject)
+        info.mtime = int(fileobject.date or time.time())
+        info.mode = 0o644
+        yield info.tobuf(tarfile.PAX_FORMAT, 'utf-8', 'strict')
+
+        size = 0
+        for chunk in _read_chunks(fileobject):
+            size += len(chunk)
+            if size > info.size:
+                raise IOError("%s grew while being archived" % fileobject.path)
+            yield chunk
+        if size != info.size:
+            raise IOError("%s shrank while being archived" % fileobject.path)
+        if size % tarfile.BLOCKSIZE:
+            yield tarfile.NUL * (tarfile.BLOCKSIZE - size % tarfile.BLOCKSIZE)
+
+    def close(self):
+        yield tarfile.NUL * (tarfile.BLOCKSIZE * 2)
+
+
+def stream_archive(fileobjects, archive_format='zip'):
+    """Yields the chunks of a zip or tar archive of the FileObjects"""
+    archive = ZipStream() if archive_format == 'zip' else TarStream()
+    for fileobject in fileobjects:
+        for chunk in archive.add(fileobject):
+            yield chunk
+    for chunk in archive.close():
+        yield chunk
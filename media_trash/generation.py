@@ -0,0 +1,47 @@
+# coding: utf-8
+"""
+The generation of the trash: a token that changes whenever the trash
+contents change, used as the ETag of the trash pages and as the key of their
+cached rows.
+
+A new generation is started (``bump``) after every collect run (on the
+trash_collected signal), restore, purge, compaction, version cleanup and
+watcher update. It is kept in MEDIA_TRASH_CACHE, which should be shared by
+the web and the command processes; the aggregates of the trash root are part
+of the token too, so that a change still shows with a per-process cache.
+"""
+import time
+import uuid
+
+from django.core.cache import caches
+
+from .models import TrashDirectory, hash_path
+from .settings import trash_settings
+
+KEY = 'media_trash:generation'
+
+
+def _get_cache():
+    return caches[trash_settings.MEDIA_TRASH_CACHE]
+
+
+def bump(**kwargs):
+    """Starts a new generation (also a trash_collected receiver)"""
+    value = (uuid.uuid4().hex, time.time())
+    _get_cache().set(KEY, value, None)
+    return value
+
+
+def get_generation():
+    """The (token, timestamp) of the current generation"""
+    cache = _get_cache()
+    value = cache.get(KEY)
+    if value is None:
+        value = (uuid.uuid4().hex, time.time())
+        if not cache.add(KEY, value, None):  # started meanwhile
+            value = cache.get(KEY) or value
+    token, timestamp = value
+    root = TrashDirectory.objects.filter(path_hash=hash_path('')).values_list('count', 'size', 'mtime').first()
+    if root is not None:
+        token = '%s-%d-%d-%s' % ((token,) + tuple(root))
+    return token, timestamp
@@ -0,0 +1,112 @@
+# coding: utf-8
+"""
+Image dimensions read from the file header (PNG, GIF and JPEG are parsed
+directly, other formats are opened lazily with PIL), without decoding the
+image. The results are cached by (path, size, mtime).
+"""
+import struct
+import threading
+from collections import OrderedDict
+
+from .utils import get_image_module
+
+CACHE_SIZE = 10000
+HEADER_SIZE = 26
+CHUNK_SIZE = 4096
+
+PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+GIF_SIGNATURES = (b'GIF87a', b'GIF89a')
+JPEG_SOI = b'\xff\xd8'
+# JPEG start of frame markers (0xC4, 0xC8 and 0xCC are DHT, JPG and DAC)
+JPEG_SOF_MARKERS = frozenset(range(0xC0, 0xD0)) - frozenset((0xC4, 0xC8, 0xCC))
+# JPEG markers without a length (TEM, RST0-7)
+JPEG_STANDALONE_MARKERS = frozenset([0x01] + list(range(0xD0, 0xD8)))
+
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def _fill(f, data, size):
+    """data completed with the next bytes of f up to size bytes, None at the end of f"""
+    while len(data) < size:
+        chunk = f.read(max(size - len(data), CHUNK_SIZE))
+        if not chunk:
+            return None
+        data += chunk
+    return data
+
+
+def _jpeg_size(f, data):
+    """Width and height of the first frame of a JPEG (data follows the SOI marker)"""
+    data = bytearray(data)
+    while True:
+        data = _fill(f, data, 4)
+        if data is None or data[0] != 0xFF:
+            return None
+        marker = data[1]
+        if marker == 0xFF:  # fill byte
+            data = data[1:]
+            continue
+        if marker in JPEG_STANDALONE_MARKERS:
+            data = data[2:]
+            continue
+        if marker in JPEG_SOF_MARKERS:
+            data = _fill(f, data, 9)
+            if data is None:
+                return None
+            height, width = struct.unpack('>HH', bytes(data[5:9]))
+            return width, height
+        # skip the segment (the length includes its own two bytes)
+        skip = 2 + struct.unpack('>H', bytes(data[2:4]))[0]
+        if skip > len(data):
+            f.read(skip - len(data))
+            data = bytearray()
+        else:
+            data = data[skip:]
+
+
+def probe(f):
+    """
+    Returns the (width, height) of the image file f or None if it is not
+    a readable image. f is read from its current position.
+    """
+    head = f.read(HEADER_SIZE)
+    if head.startswith(PNG_SIGNATURE) and head[12:16] == b'IHDR':
+        return struct.unpack('>II', head[16:24])
+    if head[:6] in GIF_SIGNATURES:
+        return struct.unpack('<HH', head[6:10])
+    if head.startswith(JPEG_SOI):
+        return _jpeg_size(f, head[2:])
+
+    try:
+        f.seek(0)
+        im = get_image_module().open(f)  # lazy: reads the header only
+        try:
+            return im.size
+        finally:
+            im.close()
+    except (IOError, OSError, ValueError):
+        return None
+
+
+def get_dimensions(path, size, mtime, opener):
+    """
+    The cached dimensions of the image at path. On a miss the file is opened
+    with opener(), probed and closed.
+    """
+    key = (path, size, mtime)
+    with _cache_lock:
+        if key in _cache:
+            return _cache[key]
+
+    f = opener()
+    try:
+        dimensions = probe(f)
+    finally:
+        f.close()
+
+    with _cache_lock:
+        _cache[key] = dimensions
+        if len(_cache) > CACHE_SIZE:
+            _cache.popitem(last=False)
+    return dimensions
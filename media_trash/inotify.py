@@ -0,0 +1,110 @@
+# coding: utf-8
+"""
+Minimal ctypes binding of the Linux inotify API::
+
+    inotify = Inotify()
+    wd = inotify.add_watch('/data/trash', IN_CREATE | IN_DELETE)
+    for event in inotify.read_events(timeout=1.0):
+        print event.wd, event.mask, event.name
+"""
+import ctypes
+import ctypes.util
+import errno
+import os
+import select
+import struct
+import sys
+from collections import namedtuple
+
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_DONT_FOLLOW = 0x02000000
+IN_EXCL_UNLINK = 0x04000000
+IN_ISDIR = 0x40000000
+
+IN_CLOEXEC = 0o2000000
+IN_NONBLOCK = 0o4000
+
+EVENT_HEADER = struct.Struct('iIII')  # wd, mask, cookie, len
+BUFFER_SIZE = 64 * 1024
+
+Event = namedtuple('Event', ['wd', 'mask', 'cookie', 'name'])
+
+_libc = None
+
+
+def _get_libc():
+    global _libc
+    if _libc is None:
+        libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        if not hasattr(libc, 'inotify_init1'):
+            raise OSError(errno.ENOSYS, "inotify is not available")
+        libc.inotify_add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+        libc.inotify_rm_watch.argtypes = [ctypes.c_int, ctypes.c_int]
+        _libc = libc
+    return _libc
+
+
+def _check(result, path=None):
+    if result < 0:
+        code = ctypes.get_errno()
+        raise OSError(code, os.strerror(code), path)
+    return result
+
+
+class Inotify(object):
+    """An inotify instance (close it, or use it as a context manager)"""
+
+    def __init__(self):
+        self.libc = _get_libc()
+        self.fd = _check(self.libc.inotify_init1(IN_CLOEXEC | IN_NONBLOCK))
+
+    def add_watch(self, path, mask):
+        """Watches path (bytes or text); returns the watch descriptor (the same one for the same inode)"""
+        if not isinstance(path, bytes):
+            path = path.encode(sys.getfilesystemencoding() or 'utf-8')
+        return _check(self.libc.inotify_add_watch(self.fd, path, mask), path)
+
+    def rm_watch(self, wd):
+        _check(self.libc.inotify_rm_watch(self.fd, wd))
+
+    def read_events(self, timeout=None):
+        """The queued events, waiting up to timeout seconds (None: forever) for the first one"""
+        if not select.select([self.fd], [], [], timeout)[0]:
+            return []
+        try:
+            data = os.read(self.fd, BUFFER_SIZE)
+        except OSError as e:
+            if e.errno in (errno.EAGAIN, errno.EINTR):
+                return []
+            raise
+        events = []
+        offset = 0
+        while offset + EVENT_HEADER.size <= len(data):
+            wd, mask, cookie, length = EVENT_HEADER.unpack_from(data, offset)
+            offset += EVENT_HEADER.size
+            events.append(Event(wd, mask, cookie, data[offset:offset + length].rstrip(b'\0')))
+            offset += length
+        return events
+
+    def close(self):
+        if self.fd is not None:
+            os.close(self.fd)
+            self.fd = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
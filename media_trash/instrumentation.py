@@ -0,0 +1,71 @@
+# coding: utf-8
+"""
+Low overhead timing of the hot paths.
+
+Every phase is reported to the receivers of the ``phase_timed`` signal and to
+the MEDIA_TRASH_METRICS_HOOK callable, ``hook(phase, duration, files=, bytes=)``,
+which is the place to feed StatsD/Prometheus exporters. Nothing is timed while
+there are no receivers and no hook.
+"""
+import timeit
+
+from django.utils.module_loading import import_string
+
+from . import signals
+from .settings import trash_settings
+
+WALK = 'walk'
+STAT = 'stat'
+MOVE = 'move'
+DELETE_ROW = 'delete-row'
+VERSION_GENERATE = 'version-generate'
+CHECKSUM = 'checksum'
+
+_hooks = {}
+
+
+def get_hook():
+    """The MEDIA_TRASH_METRICS_HOOK callable (imported once) or None"""
+    path = trash_settings.MEDIA_TRASH_METRICS_HOOK
+    if not path:
+        return None
+    if path not in _hooks:
+        _hooks[path] = import_string(path)
+    return _hooks[path]
+
+
+def is_enabled():
+    return get_hook() is not None or signals.phase_timed.has_listeners()
+
+
+def emit(phase, duration, files=0, bytes=0, sender=None):
+    hook = get_hook()
+    if hook is not None:
+        hook(phase, duration, files=files, bytes=bytes)
+    signals.phase_timed.send(sender=sender, phase=phase, duration=duration, files=files, bytes=bytes)
+
+
+class timed(object):
+    """
+    Times the block as phase. The counters may be updated inside the block::
+
+        with timed(MOVE, files=1) as timer:
+            timer.bytes = move(...)
+    """
+
+    def __init__(self, phase, files=0, bytes=0, sender=None):
+        self.phase = phase
+        self.files = files
+        self.bytes = bytes
+        self.sender = sender
+        self.start = None
+
+    def __enter__(self):
+        if is_enabled():
+            self.start = timeit.default_timer()
+        return self
+
+    def __exit__(self, exc_type, exc_value, tb):
+        if self.start is not None and exc_type is None:
+            emit(self.phase, timeit.default_timer() - self.start,
+                 files=self.files, bytes=self.bytes, sender=self.sender)
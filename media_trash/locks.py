@@ -0,0 +1,125 @@
+# coding: utf-8
+"""
+Advisory locks (POSIX fcntl record locks, which also hold across NFS clients)
+keeping the collectors of several processes or nodes apart.
+"""
+import errno
+
+from .settings import trash_settings
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+
+class LockError(Exception):
+    """The lock is held by another process"""
+
+
+class FileLock(object):
+    """
+    Locks the file at path (created if needed) for the duration of the block::
+
+        with FileLock('/data/trash.lock'):
+            ...
+
+    Shared locks exclude the exclusive ones only. Raises LockError when the
+    lock is taken, unless blocking. A no-op where fcntl is not available.
+    """
+
+    def __init__(self, path, shared=False, blocking=False):
+        self.path = path
+        self.shared = shared
+        self.blocking = blocking
+        self.file = None
+
+    def acquire(self):
+        if fcntl is None:
+            return
+        self.file = open(self.path, 'a+')
+        try:
+            self._lock(fcntl.LOCK_SH if self.shared else fcntl.LOCK_EX)
+        except Exception:
+            self.file.close()
+            self.file = None
+            raise
+
+    def _lock(self, operation, blocking=None):
+        if not (self.blocking if blocking is None else blocking):
+            operation |= fcntl.LOCK_NB
+        try:
+            fcntl.lockf(self.file, operation)
+        except (IOError, OSError) as e:
+            if e.errno in (errno.EACCES, errno.EAGAIN):
+                raise LockError("%s is locked by another process" % self.path)
+            raise
+
+    def release(self):
+        if self.file is not None:
+            fcntl.lockf(self.file, fcntl.LOCK_UN)
+            self.file.close()
+            self.file = None
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.release()
+
+
+class ShardLock(FileLock):
+    """
+    Shared lock of the runs of the shards of one count: the shard count is
+    recorded in the locked file, and a run with another count is refused
+    (or waits for the running shards if blocking), as their shards would
+    overlap (pk % 4 == 0 is part of pk % 2 == 0).
+    """
+
+    def __init__(self, path, count, blocking=False):
+        super(ShardLock, self).__init__(path, shared=True, blocking=blocking)
+        self.count = count
+
+    def acquire(self):
+        if fcntl is None:
+            return
+        # the guard makes the check and the record of the count atomic
+        with FileLock(self.path + '.guard', blocking=True):
+            super(ShardLock, self).acquire()
+
+    def _lock(self, operation, blocking=None):
+        if blocking is not None:
+            return super(ShardLock, self)._lock(operation, blocking)
+        try:
+            super(ShardLock, self)._lock(fcntl.LOCK_EX, blocking=False)
+        except LockError:
+            # held: by a full run (waits or fails here) or by running shards
+            super(ShardLock, self)._lock(fcntl.LOCK_SH)
+            self.file.seek(0)
+            recorded = self.file.read().strip()
+            if recorded == str(self.count):
+                return
+            try:
+                super(ShardLock, self)._lock(fcntl.LOCK_EX)
+            except LockError:
+                raise LockError("%s is locked by the shards of another count (%s)" % (self.path, recorded))
+        self.file.seek(0)
+        self.file.truncate()
+        self.file.write('%d\n' % self.count)
+        self.file.flush()
+        super(ShardLock, self)._lock(fcntl.LOCK_SH, blocking=False)
+
+
+def collect_locks(shard=None, blocking=False):
+    """
+    The locks of a collect run: a full run holds MEDIA_TRASH_LOCK_FILE
+    exclusively; a run of shard (i, n) holds it shared with the runs of the
+    other shards of n (not along a full run or shards of another count)
+    plus the exclusive lock of its shard.
+    """
+    path = trash_settings.MEDIA_TRASH_LOCK_FILE
+    if shard is None:
+        return [FileLock(path, blocking=blocking)]
+    return [ShardLock(path, shard[1], blocking=blocking),
+            FileLock('%s.%d-%d' % (path, shard[0], shard[1]), blocking=blocking)]
@@ -0,0 +1,26 @@
+from django.core.management import BaseCommand, CommandError
+
+from ... import aggregates
+from ...locks import LockError, collect_locks
+from ...storage import get_storage
+
+
+class Command(BaseCommand):
+    help = "Recomputes the size and file count aggregates of the trash directories."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--wait', action='store_true', dest='wait',
+                            help="Wait for a running collect instead of exiting.")
+
+    def handle(self, *args, **options):
+        # the exclusive collect lock: no collector updates the tree while it is rebuilt
+        lock, = collect_locks(blocking=options['wait'])
+        try:
+            lock.acquire()
+        except LockError as e:
+            raise CommandError("a media_trash_collect is running (%s)." % e)
+        try:
+            aggregate = aggregates.rebuild('', get_storage())
+        finally:
+            lock.release()
+        self.stdout.write("%d file(s), %d bytes." % (aggregate.count, aggregate.size))
@@ -1,16 +1,56 @@
+import errno
 import os
-import shutil
+import timeit
 import traceback
+from collections import defaultdict
+from stat import S_ISREG
 
 from django.apps import apps
-from django.core.files.move import file_move_safe
-from django.core.management import BaseCommand
+from django.core.management import BaseCommand, CommandError
+from django.db.models import F
 
-from ... import settings, signals
+from ... import aggregates, checksums, instrumentation, origins, signals
+from ...compression import compress_files, is_compressible
+from ...instrumentation import timed
+from ...locks import FileLock, LockError, collect_locks
+from ...settings import trash_settings
+from ...storage import get_storage
+from ...utils import path_strip
+
+try:
+    from os import scandir
+except ImportError:
+    try:
+        from scandir import scandir
+    except ImportError:
+        scandir = None
+
+# the source is gone (any other error leaves the row for the next run)
+MISSING_ERRNOS = (errno.ENOENT, errno.ENOTDIR)
 
 
 class Command(BaseCommand):
 
+    def add_arguments(self, parser):
+        parser.add_argument('--compress', action='store_true', dest='compress',
+                            default=trash_settings.MEDIA_TRASH_COMPRESS,
+                            help="Compress the collected documents.")
+        parser.add_argument('--shard', dest='shard', default=None,
+                            help="Collect only the rows whose pk %% N == i (i/N, 0 <= i < N), "
+                                 "to run N collectors in parallel (a run with another N is refused meanwhile).")
+        parser.add_argument('--wait', action='store_true', dest='wait',
+                            help="Wait for a running collect instead of exiting.")
+
+    @staticmethod
+    def _parse_shard(value):
+        try:
+            index, count = [int(v) for v in value.split('/')]
+        except ValueError:
+            raise CommandError("--shard must be i/N, e.g. 0/4.")
+        if not 0 <= index < count:
+            raise CommandError("--shard i/N requires 0 <= i < N.")
+        return index, count
+
     @staticmethod
     def _path_normalize(path):
         return os.path.normcase(os.path.abspath(os.path.normpath(path)))
@@ -24,44 +64,194 @@ class Command(BaseCommand):
                 return False
         return cls._path_normalize(src) == cls._path_normalize(dst)
 
+    @staticmethod
+    def _stat_sources(paths):
+        """
+        Stats the source files listing each of their directories once (with
+        os.scandir where available): returns {path: os.stat_result, or False
+        if it is not a regular file}, without the missing paths, the number of
+        entries of every directory and {path: OSError} for the paths that could
+        not be checked (unreadable directory, stale mount, ...).
+        """
+        names = defaultdict(dict)
+        for path in paths:
+            names[os.path.dirname(path)][os.path.basename(path)] = path
+        stats = {}
+        entries = {}
+        errors = {}
+        for directory, directory_names in names.items():
+            try:
+                if scandir is not None:
+                    listing = dict((entry.name, entry) for entry in scandir(directory))
+                else:
+                    listing = dict.fromkeys(os.listdir(directory))
+            except OSError as e:
+                if e.errno not in MISSING_ERRNOS:
+                    errors.update(dict.fromkeys(directory_names.values(), e))
+                continue
+            entries[directory] = len(listing)
+            for name, path in directory_names.items():
+                if name not in listing:
+                    continue
+                try:
+                    if scandir is not None:
+                        entry = listing[name]
+                        stats[path] = entry.stat() if entry.is_file() else False
+                    else:
+                        stat = os.stat(path)
+                        stats[path] = stat if S_ISREG(stat.st_mode) else False
+                except OSError as e:
+                    if e.errno not in MISSING_ERRNOS:
+                        errors[path] = e
+        return stats, entries, errors
+
     def handle(self, *args, **options):
-        model = apps.get_model(*settings.MEDIA_TRASH_MODEL.split("."))
+        shard = self._parse_shard(options['shard']) if options['shard'] else None
+        locks = collect_locks(shard, blocking=options['wait'])
+        try:
+            for lock in locks:
+                lock.acquire()
+        except LockError as e:
+            for lock in locks:
+                lock.release()
+            raise CommandError("another media_trash_collect is running (%s)." % e)
+        try:
+            self.collect(shard, options)
+        finally:
+            for lock in reversed(locks):
+                lock.release()
+        self.build_aggregates()
+
+    @staticmethod
+    def build_aggregates():
+        """
+        Builds the aggregates of the trash if they do not exist yet (the trash
+        page shows them unknown until then; a running watcher does its own).
+        Only under the exclusive lock: after a full run, or by the last shard
+        to finish.
+        """
+        if trash_settings.MEDIA_TRASH_WATCHED or aggregates.is_built():
+            return
+        lock = FileLock(trash_settings.MEDIA_TRASH_LOCK_FILE)
+        try:
+            lock.acquire()
+        except LockError:  # other runs go on, the last one builds them
+            return
+        try:
+            if not aggregates.is_built():
+                aggregates.rebuild('', get_storage())
+        finally:
+            lock.release()
+
+    def collect(self, shard, options):
+        start = timeit.default_timer()
+        summary = dict(files=0, bytes=0, renamed=0, copied=0, failed=0, skipped=0, deferred=0)
+        model = apps.get_model(*trash_settings.MEDIA_TRASH_MODEL.split("."))
 
         objs = model.objects.all().trash()
+        if shard is not None:
+            objs = objs.annotate(media_trash_shard=F('pk') % shard[1]).filter(media_trash_shard=shard[0])
 
-        if not os.path.isdir(settings.MEDIA_TRASH_PATH):
-            os.makedirs(settings.MEDIA_TRASH_PATH)
+        storage = get_storage()
 
-        recover_dir = settings.MEDIA_TRASH_RECOVER_DIR
+        if not storage.isdir(trash_settings.MEDIA_TRASH_PATH):
+            storage.makedirs(trash_settings.MEDIA_TRASH_PATH)
 
-        for media in objs:
-            if not media.exists:
-                continue
+        if options['compress']:
+            try:
+                storage.path(trash_settings.MEDIA_TRASH_PATH)
+            except NotImplementedError:
+                raise CommandError("compression requires a trash storage with local paths.")
+
+        recover_dir = trash_settings.MEDIA_TRASH_RECOVER_DIR
+        compressible = []
+        collected = []
+
+        rows = list(objs)
+        stats, entries, errors = self._stat_sources([media.path for media in rows])
+
+        # left for the next run: the source may well be there
+        for e in set(errors.values()):
+            self.stderr.write("%s: %s (left for the next run)" % (e.filename, e.strerror))
+        summary['deferred'] += len(set(media.pk for media in rows if media.path in errors))
 
+        missing = [media.pk for media in rows if media.path not in stats and media.path not in errors]
+        for i in range(0, len(missing), origins.BATCH_SIZE):
+            with timed(instrumentation.DELETE_ROW, files=len(missing[i:i + origins.BATCH_SIZE]),
+                       sender=self.__class__):
+                model.objects.filter(pk__in=missing[i:i + origins.BATCH_SIZE]).delete()
+        summary['skipped'] += len(missing)
+
+        # hashed before the move, to check the copies of cross-device moves (media_trash_scrub)
+        sums = {}
+        if trash_settings.MEDIA_TRASH_CHECKSUM:
+            sources = [path for path, stat in stats.items() if stat]
+            with timed(instrumentation.CHECKSUM, files=len(sources),
+                       bytes=sum(stats[path].st_size for path in sources), sender=self.__class__):
+                for path, sha256, size, stat, error in checksums.hash_files(sources, decompress=False):
+                    if error is None:
+                        sums[path] = sha256, size
+        summed = []
+
+        for media in rows:
             src = media.path
-            srcdir = os.path.dirname(src)
+            stat = stats.get(src)
+            if stat is None:
+                continue
+            if stat is False:  # not a regular file
+                summary['skipped'] += 1
+                continue
 
-            dst = os.path.normpath(os.path.join(settings.MEDIA_TRASH_PATH, media.relpath))
-            dstdir = os.path.dirname(dst)
+            srcdir = os.path.dirname(src)
 
-            if os.path.isfile(src) and not os.path.isdir(dstdir):
-                os.makedirs(dstdir)
+            dst = os.path.normpath(os.path.join(trash_settings.MEDIA_TRASH_PATH, media.relpath))
 
             try:
-                file_move_safe(src, dst, allow_overwrite=True)
+                with timed(instrumentation.MOVE, files=1, bytes=stat.st_size, sender=self.__class__):
+                    renamed = storage.import_file(src, dst)
             except OSError:
                 # Avoid hide the error.
                 print traceback.format_exc()
+                summary['failed'] += 1
                 continue
 
-            media.delete()
+            summary['files'] += 1
+            summary['bytes'] += stat.st_size
+            summary['renamed' if renamed else 'copied'] += 1
+            relpath = path_strip(dst, trash_settings.MEDIA_TRASH_PATH)
+            collected.append((relpath, os.path.abspath(src), origins.get_origin(media)))
+            if len(collected) >= origins.BATCH_SIZE:
+                origins.record(collected)
+                collected = []
+            if src in sums:
+                summed.append((relpath,) + sums[src])
+                if len(summed) >= checksums.BATCH_SIZE:
+                    checksums.record(summed)
+                    summed = []
+
+            with timed(instrumentation.DELETE_ROW, files=1, sender=self.__class__):
+                media.delete()
+
+            aggregates.add(relpath, stat.st_size, stat.st_mtime)
+
+            if options['compress'] and is_compressible(dst):
+                compressible.append(storage.path(dst))
 
-            if not self._is_samefile(srcdir, recover_dir) and \
-                    not os.listdir(srcdir):
+            # remove the source directory once its last entry is gone
+            entries[srcdir] -= 1
+            if not entries[srcdir] and not self._is_samefile(srcdir, recover_dir):
                 try:
-                    shutil.rmtree(srcdir)
+                    os.rmdir(srcdir)
                 except OSError:
                     pass
+        origins.record(collected)
+        checksums.record(summed)
+        if compressible:
+            for path, size, compressed_size in compress_files(compressible):
+                if compressed_size is not None:
+                    aggregates.resize(path_strip(path, trash_settings.MEDIA_TRASH_PATH), compressed_size - size)
         # send signal after processing
         if objs.exists():
-            signals.trash_collected.send(sender=self.__class__)
+            signals.trash_collected.send(sender=self.__class__,
+                                         elapsed=timeit.default_timer() - start,
+                                         **summary)
@@ -0,0 +1,43 @@
+import os
+
+from django.core.management import BaseCommand, CommandError
+
+from ... import aggregates, generation
+from ...compression import compress_files, is_compressible
+from ...settings import trash_settings
+from ...storage import get_storage
+from ...utils import path_strip
+
+
+class Command(BaseCommand):
+    help = "Compresses the compressible files (documents) kept in the trash."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=None,
+                            help="Number of compression processes.")
+
+    @staticmethod
+    def find_compressible(root):
+        for dirpath, dirnames, filenames in os.walk(root):
+            for filename in filenames:
+                if is_compressible(filename):
+                    yield os.path.join(dirpath, filename)
+
+    def handle(self, *args, **options):
+        try:
+            root = get_storage().path(trash_settings.MEDIA_TRASH_PATH)
+        except NotImplementedError:
+            raise CommandError("compression requires a trash storage with local paths.")
+
+        paths = list(self.find_compressible(root))
+        compressed = skipped = saved = 0
+        for path, size, compressed_size in compress_files(paths, workers=options['workers']):
+            if compressed_size is None:
+                skipped += 1
+                continue
+            compressed += 1
+            saved += size - compressed_size
+            aggregates.resize(path_strip(path, root), compressed_size - size)
+        if compressed:
+            generation.bump()
+        self.stdout.write("%d file(s) compressed, %d skipped, %d bytes saved." % (compressed, skipped, saved))
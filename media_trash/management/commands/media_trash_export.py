@@ -0,0 +1,38 @@
+import sys
+
+from django.core.management import BaseCommand, CommandError
+
+from ... import export
+from ...storage import get_storage
+
+
+class Command(BaseCommand):
+    help = "Writes a zip or tar archive of trash files and folders (paths relative to the trash)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('relpath', nargs='+', help="Trash file or folder to export.")
+        parser.add_argument('-o', '--output', dest='output', required=True,
+                            help="Archive file ('-' for the standard output).")
+        parser.add_argument('--format', dest='format', choices=sorted(export.FORMATS), default=None,
+                            help="Archive format (default: from the output extension, else zip).")
+
+    def handle(self, *args, **options):
+        archive_format = options['format']
+        if archive_format is None:
+            archive_format = 'tar' if options['output'].endswith(export.FORMATS['tar'][1]) else 'zip'
+
+        fileobjects = export.iter_files(get_storage(), options['relpath'])
+        to_stdout = options['output'] == '-'
+        output = getattr(sys.stdout, 'buffer', sys.stdout) if to_stdout else open(options['output'], 'wb')
+        written = 0
+        try:
+            for chunk in export.stream_archive(fileobjects, archive_format):
+                output.write(chunk)
+                written += len(chunk)
+        except (IOError, OSError) as e:
+            raise CommandError("export failed: %s" % e)
+        finally:
+            if not to_stdout:
+                output.close()
+        if not to_stdout:
+            self.stdout.write("%d bytes written to %s." % (written, options['output']))
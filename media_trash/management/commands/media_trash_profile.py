@@ -0,0 +1,33 @@
+from django.contrib.auth.models import AnonymousUser
+from django.core.management import BaseCommand
+from django.test import RequestFactory
+
+from ...base import FileListing
+from ...profiling import ProfilingStorage
+from ...settings import trash_settings
+from ...storage import get_storage
+from ...views import MediaView
+
+
+class Command(BaseCommand):
+    help = "Profiles the storage calls of the trash page (or of a full walk of the trash)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', nargs='?', default='',
+                            help="Trash directory of the page (relative to the trash).")
+        parser.add_argument('--walk', action='store_true', dest='walk',
+                            help="Profile files_walk_filtered instead of the page.")
+
+    def handle(self, *args, **options):
+        storage = ProfilingStorage(get_storage())
+        if options['walk']:
+            FileListing(trash_settings.MEDIA_TRASH_PATH, storage=storage).files_walk_filtered()
+        else:
+            request = RequestFactory().get('/', {'path': options['path']})
+            request.user = AnonymousUser()
+            MediaView.as_view(storage=storage, cache_rows=False)(request)
+
+        self.stdout.write("%-20s %10s %12s %12s" % ("method", "calls", "total (ms)", "mean (us)"))
+        for name, (calls, seconds) in storage.stats().items():
+            self.stdout.write("%-20s %10d %12.3f %12.1f" % (name, calls, seconds * 1000,
+                                                          seconds * 1e6 / calls))
@@ -0,0 +1,45 @@
+import multiprocessing
+
+from django.core.management import BaseCommand, CommandError
+
+from ... import checksums
+from ...settings import trash_settings
+from ...storage import get_storage
+
+
+class Command(BaseCommand):
+    help = ("Verifies the trashed files against their recorded checksums, hashing only the files "
+            "changed since their last verification, and records the files without one.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--full', action='store_true', dest='full',
+                            help="Hash the unchanged files too.")
+        parser.add_argument('--prune', action='store_true', dest='prune',
+                            help="Remove the checksums of the missing files.")
+        parser.add_argument('--workers', type=int, default=None,
+                            help="Number of hashing processes.")
+
+    def handle(self, *args, **options):
+        try:
+            root = get_storage().path(trash_settings.MEDIA_TRASH_PATH)
+        except NotImplementedError:
+            raise CommandError("scrubbing requires a trash storage with local paths.")
+
+        scrubber = checksums.Scrubber(root, workers=options['workers'])
+        for relpath, status, detail in scrubber.scrub(full=options['full'], prune=options['prune']):
+            if status in (checksums.CORRUPT, checksums.UNREADABLE, checksums.MISSING):
+                self.stdout.write("%s: %s%s" % (status, relpath, " (%s)" % detail if detail else ""))
+            elif options['verbosity'] > 1:
+                self.stdout.write("%s: %s" % (status, relpath))
+
+        counts = scrubber.counts
+        self.stdout.write("%d file(s) verified, %d unchanged, %d recorded, %d corrupt, %d unreadable, %d missing." % (
+            counts[checksums.OK], counts[checksums.UNCHANGED], counts[checksums.RECORDED],
+            counts[checksums.CORRUPT], counts[checksums.UNREADABLE], counts[checksums.MISSING]))
+        self.stdout.write("%d bytes hashed in %.1fs (%.1f MB/s, %d worker(s))." % (
+            scrubber.bytes, scrubber.elapsed, scrubber.bytes / 1e6 / scrubber.elapsed if scrubber.elapsed else 0,
+            options['workers'] or trash_settings.MEDIA_TRASH_CHECKSUM_WORKERS or multiprocessing.cpu_count()))
+
+        problems = counts[checksums.CORRUPT] + counts[checksums.UNREADABLE] + counts[checksums.MISSING]
+        if problems:
+            raise CommandError("%d damaged or missing file(s) in the trash." % problems)
@@ -0,0 +1,44 @@
+from collections import Counter
+
+from django.core.management import BaseCommand
+
+from ...storage import get_storage
+from ...versions import UNKNOWN, VersionCollector
+
+
+class Command(BaseCommand):
+    help = ("Deletes the image versions whose original is gone or newer than the version. "
+            "The files that no longer map to an original are only reported (see --delete-unknown).")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', dest='dry_run',
+                            help="Only report the orphaned versions.")
+        parser.add_argument('--delete-unknown', action='store_true', dest='delete_unknown',
+                            help="Also delete the files that do not map to an original (versions of "
+                                 "a renamed VERSIONS setting, files of other tools, ...).")
+
+    def handle(self, *args, **options):
+        collector = VersionCollector(get_storage())
+        orphans = list(collector.find_orphans())
+        unknown = []
+        if not options['delete_unknown']:
+            unknown = [orphan for orphan in orphans if orphan[2] == UNKNOWN]
+            orphans = [orphan for orphan in orphans if orphan[2] != UNKNOWN]
+        reasons = Counter(reason for _, _, reason in orphans)
+        if options['verbosity'] > 1:
+            for name, size, reason in orphans:
+                self.stdout.write("%s (%s, %d bytes)" % (name, reason, size))
+            for name, size, reason in unknown:
+                self.stdout.write("%s (%s, %d bytes, kept)" % (name, reason, size))
+
+        details = ", ".join("%d %s" % (n, reason) for reason, n in sorted(reasons.items()))
+        if options['dry_run']:
+            self.stdout.write("%d orphaned version(s) (%s), %d bytes to reclaim." % (
+                len(orphans), details or "none", sum(size for _, size, _ in orphans)))
+        else:
+            count, size = collector.delete(orphans)
+            self.stdout.write("%d orphaned version(s) deleted (%s), %d bytes reclaimed." % (
+                count, details or "none", size))
+        if unknown:
+            self.stdout.write("%d file(s) not mapping to an original kept, %d bytes "
+                              "(--delete-unknown deletes them)." % (len(unknown), sum(size for _, size, _ in unknown)))
@@ -0,0 +1,42 @@
+from django.core.management import BaseCommand, CommandError
+
+from ...settings import trash_settings
+from ...storage import get_storage
+from ...watcher import TrashWatcher
+
+
+class Command(BaseCommand):
+    help = ("Keeps the directory aggregates of the trash in sync with inotify events (Linux), "
+            "until interrupted. Set MEDIA_TRASH_WATCHED while it runs.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--debounce', type=float, dest='debounce', default=None,
+                            help="Seconds without events before a burst is applied "
+                                 "(default: MEDIA_TRASH_WATCH_DEBOUNCE).")
+        parser.add_argument('--rescan-interval', type=float, dest='rescan_interval', default=None,
+                            help="Seconds between two full rescans (default: MEDIA_TRASH_WATCH_RESCAN_INTERVAL, "
+                                 "only when events were lost).")
+
+    def handle(self, *args, **options):
+        storage = get_storage()
+        try:
+            root = storage.path(trash_settings.MEDIA_TRASH_PATH)
+        except NotImplementedError:
+            raise CommandError("watching requires a trash storage with local paths.")
+
+        if not trash_settings.MEDIA_TRASH_WATCHED:
+            self.stderr.write("MEDIA_TRASH_WATCHED is not set: the changes made by this app will be counted twice.")
+
+        def log(message):
+            if options['verbosity'] > 1:
+                self.stdout.write(message)
+
+        watcher = TrashWatcher(root, storage, debounce=options['debounce'],
+                               rescan_interval=options['rescan_interval'], log=log)
+        try:
+            watcher.run()
+        except KeyboardInterrupt:
+            pass
+        except OSError as e:
+            raise CommandError("watching %s failed: %s (see fs.inotify.max_user_watches if the watches "
+                               "ran out)." % (root, e))
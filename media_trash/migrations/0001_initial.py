@@ -0,0 +1,30 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.29 on 2026-10-18 23:22
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TrashDirectory',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('path', models.CharField(max_length=255, unique=True, verbose_name='path')),
+                ('count', models.BigIntegerField(default=0, verbose_name='files')),
+                ('size', models.BigIntegerField(default=0, verbose_name='size')),
+                ('mtime', models.FloatField(blank=True, null=True, verbose_name='newest modification')),
+            ],
+            options={
+                'verbose_name': 'trash directory',
+                'verbose_name_plural': 'trash directories',
+            },
+        ),
+    ]
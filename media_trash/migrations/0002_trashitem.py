@@ -0,0 +1,31 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.29 on 2026-10-18 23:38
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('media_trash', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TrashItem',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('path', models.CharField(max_length=255, unique=True, verbose_name='path')),
+                ('original_path', models.CharField(max_length=1024, verbose_name='original path')),
+                ('model', models.CharField(blank=True, max_length=100, verbose_name='model')),
+                ('object_id', models.CharField(blank=True, max_length=255, verbose_name='object id')),
+                ('field', models.CharField(blank=True, max_length=100, verbose_name='field')),
+                ('collected', models.DateTimeField(auto_now_add=True, verbose_name='collected')),
+            ],
+            options={
+                'verbose_name': 'trash item',
+                'verbose_name_plural': 'trash items',
+            },
+        ),
+    ]
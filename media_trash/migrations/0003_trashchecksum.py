@@ -0,0 +1,31 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.29 on 2026-10-18 23:54
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('media_trash', '0002_trashitem'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TrashChecksum',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('path', models.CharField(max_length=255, unique=True, verbose_name='path')),
+                ('sha256', models.CharField(max_length=64, verbose_name='sha256')),
+                ('size', models.BigIntegerField(verbose_name='size')),
+                ('stored_size', models.BigIntegerField(blank=True, null=True, verbose_name='stored size')),
+                ('stored_mtime', models.FloatField(blank=True, null=True, verbose_name='stored modification')),
+                ('verified', models.DateTimeField(blank=True, null=True, verbose_name='verified')),
+            ],
+            options={
+                'verbose_name': 'trash checksum',
+                'verbose_name_plural': 'trash checksums',
+            },
+        ),
+    ]
@@ -0,0 +1,40 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+import hashlib
+
+from django.db import migrations, models
+from django.utils.encoding import force_bytes
+
+
+def fill_path_hash(apps, schema_editor):
+    TrashDirectory = apps.get_model('media_trash', 'TrashDirectory')
+    for directory in TrashDirectory.objects.only('pk', 'path').iterator():
+        TrashDirectory.objects.filter(pk=directory.pk).update(
+            path_hash=hashlib.sha1(force_bytes(directory.path)).hexdigest())
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('media_trash', '0003_trashchecksum'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='trashdirectory',
+            name='path_hash',
+            field=models.CharField(editable=False, max_length=40, null=True, verbose_name='path hash'),
+        ),
+        migrations.RunPython(fill_path_hash, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='trashdirectory',
+            name='path',
+            field=models.TextField(verbose_name='path'),
+        ),
+        migrations.AlterField(
+            model_name='trashdirectory',
+            name='path_hash',
+            field=models.CharField(editable=False, max_length=40, unique=True, verbose_name='path hash'),
+        ),
+    ]
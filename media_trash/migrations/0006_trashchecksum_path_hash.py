@@ -0,0 +1,40 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+import hashlib
+
+from django.db import migrations, models
+from django.utils.encoding import force_bytes
+
+
+def fill_path_hash(apps, schema_editor):
+    TrashChecksum = apps.get_model('media_trash', 'TrashChecksum')
+    for checksum in TrashChecksum.objects.only('pk', 'path').iterator():
+        TrashChecksum.objects.filter(pk=checksum.pk).update(
+            path_hash=hashlib.sha1(force_bytes(checksum.path)).hexdigest())
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('media_trash', '0005_trashitem_path_hash'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='trashchecksum',
+            name='path_hash',
+            field=models.CharField(editable=False, max_length=40, null=True, verbose_name='path hash'),
+        ),
+        migrations.RunPython(fill_path_hash, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='trashchecksum',
+            name='path',
+            field=models.TextField(verbose_name='path'),
+        ),
+        migrations.AlterField(
+            model_name='trashchecksum',
+            name='path_hash',
+            field=models.CharField(editable=False, max_length=40, unique=True, verbose_name='path hash'),
+        ),
+    ]
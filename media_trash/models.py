@@ -0,0 +1,84 @@
+# coding: utf-8
+import hashlib
+
+from django.db import models
+from django.utils.encoding import force_bytes, python_2_unicode_compatible
+from django.utils.translation import ugettext_lazy as _
+
+
+def hash_path(path):
+    """Unique key of a trash path: the paths themselves may be longer than an indexable column"""
+    return hashlib.sha1(force_bytes(path)).hexdigest()
+
+
+@python_2_unicode_compatible
+class TrashDirectory(models.Model):
+    """Recursive aggregates of a trash directory (path relative to the trash, '' for the root)"""
+    path = models.TextField(_("path"))
+    path_hash = models.CharField(_("path hash"), max_length=40, unique=True, editable=False)
+    count = models.BigIntegerField(_("files"), default=0)
+    size = models.BigIntegerField(_("size"), default=0)
+    mtime = models.FloatField(_("newest modification"), null=True, blank=True)
+
+    class Meta:
+        verbose_name = _("trash directory")
+        verbose_name_plural = _("trash directories")
+
+    def __str__(self):
+        return self.path or '/'
+
+    def save(self, *args, **kwargs):
+        self.path_hash = hash_path(self.path)
+        super(TrashDirectory, self).save(*args, **kwargs)
+
+
+@python_2_unicode_compatible
+class TrashItem(models.Model):
+    """
+    Origin of a collected file (path relative to the trash, before compression):
+    where it was and the model row it belonged to.
+    """
+    path = models.TextField(_("path"))
+    path_hash = models.CharField(_("path hash"), max_length=40, unique=True, editable=False)
+    original_path = models.CharField(_("original path"), max_length=1024)
+    model = models.CharField(_("model"), max_length=100, blank=True)
+    object_id = models.CharField(_("object id"), max_length=255, blank=True)
+    field = models.CharField(_("field"), max_length=100, blank=True)
+    collected = models.DateTimeField(_("collected"), auto_now_add=True)
+
+    class Meta:
+        verbose_name = _("trash item")
+        verbose_name_plural = _("trash items")
+
+    def __str__(self):
+        return self.path
+
+    def save(self, *args, **kwargs):
+        self.path_hash = hash_path(self.path)
+        super(TrashItem, self).save(*args, **kwargs)
+
+
+@python_2_unicode_compatible
+class TrashChecksum(models.Model):
+    """
+    Checksum of a trashed file (path relative to the trash, before
+    compression) and the stat of the stored file when it was last verified.
+    """
+    path = models.TextField(_("path"))
+    path_hash = models.CharField(_("path hash"), max_length=40, unique=True, editable=False)
+    sha256 = models.CharField(_("sha256"), max_length=64)
+    size = models.BigIntegerField(_("size"))
+    stored_size = models.BigIntegerField(_("stored size"), null=True, blank=True)
+    stored_mtime = models.FloatField(_("stored modification"), null=True, blank=True)
+    verified = models.DateTimeField(_("verified"), null=True, blank=True)
+
+    class Meta:
+        verbose_name = _("trash checksum")
+        verbose_name_plural = _("trash checksums")
+
+    def __str__(self):
+        return self.path
+
+    def save(self, *args, **kwargs):
+        self.path_hash = hash_path(self.path)
+        super(TrashChecksum, self).save(*args, **kwargs)
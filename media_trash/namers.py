@@ -4,20 +4,59 @@
 
 from __future__ import unicode_literals
 
+import os
 import re
 
+from django.core.exceptions import ImproperlyConfigured
 from django.utils import six
 from django.utils.encoding import force_text
 from django.utils.module_loading import import_string
 
-from .settings import VERSIONS, VERSION_NAMER
+from .settings import trash_settings
 
 
 def get_namer(**kwargs):
-    namer_cls = import_string(VERSION_NAMER)
+    namer_cls = import_string(trash_settings.VERSION_NAMER)
     return namer_cls(**kwargs)
 
 
+# output format of a version: extension appended to the version name
+FORMAT_EXTENSIONS = {
+    'jpeg': '.jpg',
+    'jpg': '.jpg',
+    'png': '.png',
+    'gif': '.gif',
+    'webp': '.webp',
+    'avif': '.avif',
+}
+
+# names of the same format (as PIL knows it)
+EQUIVALENT_FORMATS = {
+    'jpg': 'jpeg',
+}
+
+# extensions of the same format
+EQUIVALENT_EXTENSIONS = {
+    '.jpeg': '.jpg',
+    '.tif': '.tiff',
+}
+
+
+def normalize_format(name):
+    """Lowercase output format of a version, the same for the names of one format: 'JPG' -> 'jpeg'"""
+    name = name.lower()
+    if name not in FORMAT_EXTENSIONS:
+        raise ImproperlyConfigured("unknown version format %r (known: %s)" % (
+            name, ", ".join(sorted(FORMAT_EXTENSIONS))))
+    return EQUIVALENT_FORMATS.get(name, name)
+
+
+def normalize_extension(extension):
+    """Lowercase extension, the same for the extensions of one format: '.JPEG' -> '.jpg'"""
+    extension = extension.lower()
+    return EQUIVALENT_EXTENSIONS.get(extension, extension)
+
+
 class VersionNamer(object):
     """Base namer only for reference"""
 
@@ -26,24 +65,47 @@ class VersionNamer(object):
         for k, v in kwargs.items():
             setattr(self, k, v)
 
+    @property
+    def format_extension(self):
+        """
+        Extension of the output format of the version ('' for the format of
+        the original), appended to the original extension: photo_small.png.webp
+        """
+        options = self.kwargs.get('options') or {}
+        if not options.get('format'):
+            return ''
+        extension = FORMAT_EXTENSIONS[normalize_format(options['format'])]
+        return '' if extension == normalize_extension(self.file_object.extension) else extension
+
+    def split_format_extension(self):
+        """The filename root and the extension of the original (without the format extension of a version)"""
+        root, extension = self.file_object.filename_root, self.file_object.extension
+        inner_root, inner_extension = os.path.splitext(root)
+        if extension.lower() in FORMAT_EXTENSIONS.values() and \
+                inner_extension.lower() in [ext.lower() for ext in trash_settings.EXTENSIONS.get('Image', [])]:
+            return inner_root, inner_extension
+        return root, extension
+
     def get_version_name(self):
-        return self.file_object.filename_root + "_" + self.version_suffix + self.extension
+        return self.file_object.filename_root + "_" + self.version_suffix + self.extension + self.format_extension
 
     def get_original_name(self):
-        tmp = self.file_object.filename_root.split("_")
-        if tmp[len(tmp) - 1] in VERSIONS:
+        root, extension = self.split_format_extension()
+        tmp = root.split("_")
+        if tmp[len(tmp) - 1] in trash_settings.VERSIONS:
             return "%s%s" % (
-                self.file_object.filename_root.replace("_%s" % tmp[len(tmp) - 1], ""),
-                self.file_object.extension)
+                root.replace("_%s" % tmp[len(tmp) - 1], ""),
+                extension)
 
 
 class OptionsNamer(VersionNamer):
 
     def get_version_name(self):
-        name = "{root}_{options}{extension}".format(
+        name = "{root}_{options}{extension}{format_extension}".format(
             root=force_text(self.file_object.filename_root),
             options=self.options_as_string,
             extension=self.file_object.extension,
+            format_extension=self.format_extension,
         )
         return name
 
@@ -52,11 +114,11 @@ class OptionsNamer(VersionNamer):
         Restores the original file name wipping out the last
         `_version_suffix--plus-any-configs` block entirely.
         """
-        root = self.file_object.filename_root
+        root, extension = self.split_format_extension()
         tmp = root.split("_")
         options_part = tmp[len(tmp) - 1]
         name = re.sub('_%s$' % options_part, '', root)
-        return "%s%s" % (name, self.file_object.extension)
+        return "%s%s" % (name, extension)
 
     @property
     def options_as_string(self):
@@ -85,8 +147,8 @@ class OptionsNamer(VersionNamer):
             opts.append('%dx%d' % (width, height))
 
         for k, v in sorted(self.options.items()):
-            if not v or k in ('size', 'width', 'height',
-                              'quality', 'subsampling', 'verbose_name'):
+            if not v or k in ('size', 'width', 'height', 'format',
+                              'quality', 'subsampling', 'format_options', 'verbose_name'):
                 continue
             if v is True:
                 opts.append(k)
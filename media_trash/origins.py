@@ -0,0 +1,51 @@
+# coding: utf-8
+"""
+Origins of the collected files: where every file of the trash came from and
+the model row it belonged to (TrashItem, keyed by the path relative to the
+trash before compression).
+"""
+from django.utils import six
+from django.utils.module_loading import import_string
+
+from . import aggregates
+from .models import TrashItem, hash_path
+from .settings import trash_settings
+
+BATCH_SIZE = 500
+
+
+def get_origin(media):
+    """(model label, pk, file field name or '') of a trash model row"""
+    if trash_settings.MEDIA_TRASH_GET_ORIGIN:
+        return import_string(trash_settings.MEDIA_TRASH_GET_ORIGIN)(media)
+    return media._meta.label, media.pk, ''
+
+
+def record(items):
+    """
+    Records the origins of collected files: items are (path relative to the
+    trash, original path, origin) tuples, origin as returned by get_origin.
+    Replaces the previous records of the same paths.
+    """
+    records = []
+    for relpath, original_path, (model, pk, field) in items:
+        path = aggregates.normalize(relpath)
+        records.append(TrashItem(path=path, path_hash=hash_path(path), original_path=original_path,
+                                 model=model or '', object_id='' if pk is None else six.text_type(pk),
+                                 field=field or ''))
+    for i in range(0, len(records), BATCH_SIZE):
+        batch = records[i:i + BATCH_SIZE]
+        TrashItem.objects.filter(path_hash__in=[r.path_hash for r in batch]).delete()
+        TrashItem.objects.bulk_create(batch)
+
+
+def forget(relpath, tree=False):
+    """Removes the records of a trash path (and of everything below it if tree)"""
+    relpath = aggregates.normalize(relpath)
+    items = TrashItem.objects.all()
+    if tree:
+        if relpath:
+            items = items.filter(path__startswith=relpath + '/')
+    else:
+        items = items.filter(path_hash=hash_path(relpath))
+    items.delete()
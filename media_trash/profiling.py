@@ -0,0 +1,71 @@
+# coding: utf-8
+"""
+Storage wrapper that counts and times the storage calls (opt-in with MEDIA_TRASH_PROFILE_STORAGE).
+"""
+import threading
+import timeit
+from collections import OrderedDict
+
+PROFILED_METHODS = ('isdir', 'isfile', 'exists', 'size', 'listdir', 'walk', 'get_modified_time',
+                    'modified_time', 'open', 'url', 'delete', 'move', 'import_file', 'export_file')
+
+
+class ProfilingStorage(object):
+    """
+    Proxies a storage, accumulating the number of calls and the time spent
+    in each of the PROFILED_METHODS. Generators (walk) are timed while they
+    are consumed.
+    """
+
+    def __init__(self, storage):
+        self.storage = storage
+        self.calls = OrderedDict()
+        self._lock = threading.Lock()  # the calls may come from the walk and stat pools
+
+    def _record(self, name, elapsed, calls=1):
+        with self._lock:
+            counters = self.calls.setdefault(name, [0, 0.0])
+            counters[0] += calls
+            counters[1] += elapsed
+
+    def _profile_iter(self, name, iterator):
+        elapsed = 0.0
+        try:
+            while True:
+                start = timeit.default_timer()
+                try:
+                    item = next(iterator)
+                finally:
+                    elapsed += timeit.default_timer() - start
+                yield item
+        except StopIteration:
+            return
+        finally:
+            self._record(name, elapsed)
+
+    def _profile(self, name, method):
+        def wrapper(*args, **kwargs):
+            if name == 'walk':
+                return self._profile_iter(name, iter(method(*args, **kwargs)))
+            start = timeit.default_timer()
+            try:
+                return method(*args, **kwargs)
+            finally:
+                self._record(name, timeit.default_timer() - start)
+        return wrapper
+
+    def __getattr__(self, name):
+        attr = getattr(self.storage, name)
+        if name in PROFILED_METHODS and callable(attr):
+            return self._profile(name, attr)
+        return attr
+
+    def stats(self):
+        """{method: (calls, seconds)} sorted by the time spent"""
+        return OrderedDict(sorted(((name, tuple(counters)) for name, counters in self.calls.items()),
+                                  key=lambda item: item[1][1], reverse=True))
+
+    def server_timing(self):
+        """The stats as a Server-Timing header value (durations in milliseconds)"""
+        return ', '.join('storage-%s;desc="%d calls";dur=%.3f' % (name, calls, seconds * 1000)
+                         for name, (calls, seconds) in self.stats().items())
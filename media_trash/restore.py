@@ -0,0 +1,115 @@
+# coding: utf-8
+"""
+Batched restore of trash files to their original location (see origins):
+each destination directory is created once per batch and the file field of
+the origin rows can be pointed back to the restored files with a single
+UPDATE per model and field.
+"""
+import errno
+import os
+from collections import defaultdict
+
+from django.apps import apps
+from django.conf import settings
+from django.db.models import Case, F, Value, When
+
+from . import aggregates, checksums, generation
+from .base import FileObject
+from .models import TrashItem, hash_path
+from .origins import BATCH_SIZE
+from .settings import trash_settings
+from .utils import makedirs
+from .walkers import map_concurrently
+
+
+class Restorer(object):
+    """
+    Restores trash files (paths relative to the trash) to their original
+    location, or under MEDIA_TRASH_RECOVER_DIR for files collected without
+    a record.
+    """
+
+    def __init__(self, storage, reattach=None):
+        self.storage = storage
+        self.reattach = trash_settings.MEDIA_TRASH_RESTORE_REATTACH if reattach is None else reattach
+
+    @staticmethod
+    def stat(fileobject):
+        return fileobject.exists and fileobject.is_folder
+
+    def restore(self, relpaths):
+        """
+        Restores the files. Returns (relpath, destination, exception) tuples:
+        destination is None if the file failed, it differs from the original
+        path if that one was taken.
+        """
+        fileobjects = [FileObject(os.path.join(trash_settings.MEDIA_TRASH_PATH, relpath), storage=self.storage)
+                       for relpath in relpaths]
+        keys = [aggregates.normalize(f.path_relative_restore) for f in fileobjects]
+        map_concurrently(self.stat, fileobjects)
+        items = {}
+        for i in range(0, len(keys), BATCH_SIZE):
+            hashes = [hash_path(key) for key in keys[i:i + BATCH_SIZE]]
+            items.update((item.path, item) for item in TrashItem.objects.filter(path_hash__in=hashes))
+
+        results = {}
+        pending = []
+        for relpath, fileobject, key in zip(relpaths, fileobjects, keys):
+            if os.path.isabs(relpath) or os.path.normpath(relpath).startswith(os.pardir) or \
+                    not fileobject.exists or fileobject.is_folder:
+                results[relpath] = (relpath, None, IOError(errno.ENOENT, "not a file in the trash", relpath))
+            elif key in items:
+                pending.append((relpath, fileobject, key, items[key].original_path))
+            else:
+                pending.append((relpath, fileobject, key, os.path.join(trash_settings.MEDIA_TRASH_RECOVER_DIR,
+                                                                       fileobject.path_relative_restore)))
+
+        failed_directories = {}
+        for directory in set(os.path.dirname(destination) for _, _, _, destination in pending):
+            try:
+                makedirs(directory)
+            except OSError as exc:
+                failed_directories[directory] = exc
+
+        restored = []
+        for relpath, fileobject, key, dst in pending:
+            try:
+                if os.path.dirname(dst) in failed_directories:
+                    raise failed_directories[os.path.dirname(dst)]
+                dst = fileobject.move(dst, makedirs=False)
+            except Exception as exc:
+                results[relpath] = (relpath, None, exc)
+                continue
+            results[relpath] = (relpath, dst, None)
+            if key in items:
+                restored.append((items[key], dst))
+
+        if any(dst is not None for relpath, dst, exc in results.values()):
+            checksums.forget_many([key for relpath, _, key, _ in pending
+                                   if results[relpath][1] is not None])
+            generation.bump()
+        if restored:
+            if self.reattach:
+                self.reattach_files(restored)
+            pks = [item.pk for item, dst in restored]
+            for i in range(0, len(pks), BATCH_SIZE):
+                TrashItem.objects.filter(pk__in=pks[i:i + BATCH_SIZE]).delete()
+        return [results[relpath] for relpath in relpaths]
+
+    def reattach_files(self, restored):
+        """
+        Points the file field of the origin rows to the restored files:
+        one UPDATE per model and field.
+        """
+        names = defaultdict(dict)
+        for item, dst in restored:
+            if item.model and item.object_id and item.field:
+                names[(item.model, item.field)][item.object_id] = os.path.relpath(dst, settings.MEDIA_ROOT)
+        for (label, field), values in names.items():
+            model = apps.get_model(label)
+            pks = list(values)
+            for i in range(0, len(pks), BATCH_SIZE):
+                batch = pks[i:i + BATCH_SIZE]
+                model.objects.filter(pk__in=batch).update(**{field: Case(
+                    *[When(pk=pk, then=Value(values[pk])) for pk in batch],
+                    default=F(field), output_field=model._meta.get_field(field))})
@@ -0,0 +1,168 @@
+# coding: utf-8
+"""
+Trash storage for S3-compatible object stores (AWS S3, MinIO, ...).
+
+Requires django-storages and boto3. Example settings::
+
+    MEDIA_TRASH_STORAGE = 'media_trash.s3.S3Storage'
+    MEDIA_TRASH_STORAGE_OPTIONS = {
+        'bucket_name': 'media-trash',
+        'location': 'trash',
+        'endpoint_url': 'http://localhost:9000',  # MinIO
+    }
+
+Names under MEDIA_TRASH_PATH (the names FileListing builds) are mapped to
+keys under the storage location.
+"""
+import errno
+import os
+import tempfile
+
+from botocore.config import Config
+from django.utils.functional import cached_property
+from storages.backends.s3boto3 import S3Boto3Storage
+from storages.utils import clean_name
+
+from .settings import trash_settings
+from .storage import StorageMixin
+from .utils import move_file, path_strip
+
+# Limit of keys of a single DeleteObjects request.
+DELETE_BATCH_SIZE = 1000
+
+
+class S3StorageMixin(StorageMixin):
+
+    def __init__(self, *args, **kwargs):
+        super(S3StorageMixin, self).__init__(*args, **kwargs)
+        # Enough pooled connections for the concurrent walks.
+        pool_config = Config(max_pool_connections=max(10, trash_settings.MEDIA_TRASH_WALK_CONCURRENCY),
+                             connect_timeout=trash_settings.MEDIA_TRASH_WALK_TIMEOUT,
+                             read_timeout=trash_settings.MEDIA_TRASH_WALK_TIMEOUT)
+        self.config = self.config.merge(pool_config) if self.config else pool_config
+
+    @property
+    def root(self):
+        return trash_settings.MEDIA_TRASH_PATH
+
+    @cached_property
+    def client(self):
+        """
+        The connections of django-storages (boto3 resources) are per thread.
+        boto3 clients are thread safe, so a single client (and its connection
+        pool) is shared by every thread and every walk of the storage.
+        """
+        return self._create_session().client(
+            's3',
+            region_name=self.region_name,
+            use_ssl=self.use_ssl,
+            endpoint_url=self.endpoint_url,
+            config=self.config,
+            verify=self.verify,
+        )
+
+    def _relative_name(self, name):
+        name = os.path.normpath(path_strip(name, self.root) or os.curdir)
+        return '' if name == os.curdir else name.replace(os.sep, '/')
+
+    def _normalize_name(self, name):
+        return super(S3StorageMixin, self)._normalize_name(self._relative_name(name))
+
+    def _key(self, name):
+        return self._normalize_name(clean_name(name))
+
+    def _prefix(self, name):
+        key = self._key(name).rstrip('/')
+        return key + '/' if key else ''
+
+    def isdir(self, name):
+        prefix = self._prefix(name)
+        if not prefix:
+            return True
+        response = self.client.list_objects_v2(Bucket=self.bucket_name, Prefix=prefix, MaxKeys=1)
+        return response.get('KeyCount', 0) > 0
+
+    def isfile(self, name):
+        return self.exists(name)
+
+    def move(self, old_file_name, new_file_name, allow_overwrite=False):
+        """Server-side copy followed by the delete of the source object"""
+        if not allow_overwrite and self.exists(new_file_name):
+            raise IOError(errno.EEXIST, "Destination file exists and allow_overwrite is False", new_file_name)
+        src = self._key(old_file_name)
+        self.client.copy({'Bucket': self.bucket_name, 'Key': src}, self.bucket_name, self._key(new_file_name))
+        self.client.delete_object(Bucket=self.bucket_name, Key=src)
+
+    def makedirs(self, name):
+        # Object stores have no directories.
+        pass
+
+    def setpermission(self, name):
+        pass
+
+    def _iter_keys(self, prefix):
+        paginator = self.client.get_paginator('list_objects_v2')
+        for page in paginator.paginate(Bucket=self.bucket_name, Prefix=prefix):
+            for item in page.get('Contents', []):
+                yield item['Key']
+
+    def listdir(self, name):
+        prefix = self._prefix(name)
+        dirs, files = [], []
+        paginator = self.client.get_paginator('list_objects_v2')
+        for page in paginator.paginate(Bucket=self.bucket_name, Prefix=prefix, Delimiter='/'):
+            for item in page.get('CommonPrefixes', []):
+                dirs.append(item['Prefix'][len(prefix):].rstrip('/'))
+            for item in page.get('Contents', []):
+                files.append(item['Key'][len(prefix):])
+        return dirs, files
+
+    def walk(self, name):
+        """One paginated prefix listing instead of one listing per directory"""
+        prefix = self._prefix(name)
+        seen = set()
+        for key in self._iter_keys(prefix):
+            path = key[len(prefix):]
+            parts = path.split('/')
+            for i in range(1, len(parts)):
+                dirname = '/'.join(parts[:i])
+                if dirname not in seen:
+                    seen.add(dirname)
+                    yield dirname.replace('/', os.sep), True
+            yield path.replace('/', os.sep), False
+
+    def _delete_keys(self, keys):
+        keys = list(keys)
+        for i in range(0, len(keys), DELETE_BATCH_SIZE):
+            self.client.delete_objects(Bucket=self.bucket_name, Delete={
+                'Objects': [{'Key': key} for key in keys[i:i + DELETE_BATCH_SIZE]],
+                'Quiet': True,
+            })
+
+    def delete_many(self, names):
+        self._delete_keys(self._key(name) for name in names)
+
+    def rmtree(self, name):
+        self._delete_keys(self._iter_keys(self._prefix(name)))
+
+    def import_file(self, path, name):
+        self.client.upload_file(path, self.bucket_name, self._key(name))
+        os.remove(path)
+        return False
+
+    def export_file(self, name, path, allow_overwrite=False):
+        key = self._key(name)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix='.restore-')
+        os.close(fd)
+        try:
+            self.client.download_file(self.bucket_name, key, tmp_path)
+            move_file(tmp_path, path, allow_overwrite=allow_overwrite)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        self.client.delete_object(Bucket=self.bucket_name, Key=key)
+
+
+class S3Storage(S3StorageMixin, S3Boto3Storage):
+    """ StorageMixin """
@@ -1,131 +1,275 @@
+"""
+Settings of the media trash, resolved lazily from the django settings::
+
+    from media_trash.settings import trash_settings
+
+    trash_settings.MEDIA_TRASH_PATH
+
+Every setting is read (and its default computed) on first access and cached
+until the django setting changes (e.g. with override_settings).
+
+The module-level names of the former constant settings
+(``from media_trash.settings import MEDIA_TRASH_PATH``) still resolve through
+trash_settings, with a DeprecationWarning.
+"""
 import os
+import sys
+import types
+import warnings
 
 from django.conf import settings
 from django.core.exceptions import ImproperlyConfigured
+from django.core.signals import setting_changed
 from django.utils.translation import ugettext_lazy as _
 
-MEDIA_TRASH_URL = getattr(settings, "MEDIA_TRASH_URL", '/media/trash/')
-MEDIA_TRASH_PATH = getattr(settings,
-                           'MEDIA_TRASH_PATH',
-                           os.path.abspath(os.path.join(settings.MEDIA_ROOT, '..', 'trash')))
-MEDIA_TRASH_LOGIN_URL = getattr(settings, 'MEDIA_TRASH_LOGIN_URL',
-                                settings.LOGIN_URL)
-MEDIA_TRASH_MODEL = getattr(settings, 'MEDIA_TRASH_MODEL', None)
-if MEDIA_TRASH_MODEL is None:
+
+class computed(object):
+    """A default computed on first access from the django settings and the other trash settings"""
+
+    def __init__(self, func):
+        self.func = func
+
+
+def _required(trash_settings):
     raise ImproperlyConfigured("trash model settings is required!")
 
-MEDIA_TRASH_RECOVER_DIR = getattr(settings, "MEDIA_TRASH_RECOVER_DIR",
-                                  settings.MEDIA_ROOT)
-
-MEDIA_TRASH_GET_BACK_URL = getattr(settings, "MEDIA_TRASH_GET_BACK_URL", None)
-MEDIA_TRASH_BUTTON_BACK_TITLE = getattr(settings, "MEDIA_TRASH_BUTTON_BACK_TITLE", None)
-
-# source taken from:
-# https://github.com/sehmaschine/django-filebrowser
-# ====================
-
-# Main FileBrowser Directory. Relative to site.storage.location.
-# DO NOT USE A SLASH AT THE BEGINNING, DO NOT FORGET THE TRAILING SLASH AT THE END.
-DIRECTORY = getattr(settings, "FILEBROWSER_DIRECTORY", 'uploads/')
-
-# EXTENSIONS AND FORMATS
-# Allowed Extensions for File Upload. Lower case is important.
-EXTENSIONS = getattr(settings, "FILEBROWSER_EXTENSIONS", {
-    'Image': ['.jpg', '.jpeg', '.gif', '.png', '.tif', '.tiff'],
-    'Document': ['.pdf', '.doc', '.rtf', '.txt', '.xls', '.csv', '.docx'],
-    'Video': ['.mov', '.mp4', '.m4v', '.webm', '.wmv', '.mpeg', '.mpg', '.avi', '.rm'],
-    'Audio': ['.mp3', '.wav', '.aiff', '.midi', '.m4p']
-})
-# Define different formats for allowed selections.
-# This has to be a subset of EXTENSIONS.
-# e.g., add ?type=image to the browse-URL ...
-SELECT_FORMATS = getattr(settings, "FILEBROWSER_SELECT_FORMATS", {
-    'file': ['Image', 'Document', 'Video', 'Audio'],
-    'image': ['Image'],
-    'document': ['Document'],
-    'media': ['Video', 'Audio'],
-})
-
-# VERSIONS
-
-# Directory to Save Image Versions (and Thumbnails). Relative to site.storage.location.
-# If no directory is given, versions are stored within the Image directory.
-# VERSION URL: VERSIONS_BASEDIR/original_path/originalfilename_versionsuffix.extension
-VERSIONS_BASEDIR = getattr(settings, 'FILEBROWSER_VERSIONS_BASEDIR', '_versions')
-# Versions Format. Available Attributes: verbose_name, width, height, opts
-VERSIONS = getattr(settings, "FILEBROWSER_VERSIONS", {
-    'admin_thumbnail': {'verbose_name': 'Admin Thumbnail', 'width': 60, 'height': 60, 'opts': 'crop'},
-    'thumbnail': {'verbose_name': 'Thumbnail (1 col)', 'width': 60, 'height': 60, 'opts': 'crop'},
-    'small': {'verbose_name': 'Small (2 col)', 'width': 140, 'height': '', 'opts': ''},
-    'medium': {'verbose_name': 'Medium (4col )', 'width': 300, 'height': '', 'opts': ''},
-    'big': {'verbose_name': 'Big (6 col)', 'width': 460, 'height': '', 'opts': ''},
-    'large': {'verbose_name': 'Large (8 col)', 'width': 680, 'height': '', 'opts': ''},
-})
-# Quality of saved versions
-VERSION_QUALITY = getattr(settings, 'FILEBROWSER_VERSION_QUALITY', 90)
-# Versions available within the Admin-Interface.
-ADMIN_VERSIONS = getattr(settings, 'FILEBROWSER_ADMIN_VERSIONS', ['thumbnail', 'small', 'medium', 'big', 'large'])
-# Which Version should be used as Admin-thumbnail.
-ADMIN_THUMBNAIL = getattr(settings, 'FILEBROWSER_ADMIN_THUMBNAIL', 'admin_thumbnail')
-
-VERSION_PROCESSORS = getattr(settings, 'FILEBROWSER_VERSION_PROCESSORS', [
-    'filebrowser.utils.scale_and_crop',
-])
-VERSION_NAMER = getattr(settings, 'FILEBROWSER_VERSION_NAMER', 'filebrowser.namers.VersionNamer')
-
-# PLACEHOLDER
-
-# Path to placeholder image (relative to storage location)
-PLACEHOLDER = getattr(settings, "FILEBROWSER_PLACEHOLDER", "")
-# Show Placeholder if the original image does not exist
-SHOW_PLACEHOLDER = getattr(settings, "FILEBROWSER_SHOW_PLACEHOLDER", False)
-# Always show placeholder (even if the original image exists)
-FORCE_PLACEHOLDER = getattr(settings, "FILEBROWSER_FORCE_PLACEHOLDER", False)
-
-# EXTRA SETTINGS
-
-# If set to True, the FileBrowser will not try to import a mis-installed PIL.
-STRICT_PIL = getattr(settings, 'FILEBROWSER_STRICT_PIL', False)
-# PIL's Error "Suspension not allowed here" work around:
-# s. http://mail.python.org/pipermail/image-sig/1999-August/000816.html
-IMAGE_MAXBLOCK = getattr(settings, 'FILEBROWSER_IMAGE_MAXBLOCK', 1024 * 1024)
-# Exclude files matching any of the following regular expressions
-# Default is to exclude 'thumbnail' style naming of image-thumbnails.
-EXTENSION_LIST = []
-for exts in EXTENSIONS.values():
-    EXTENSION_LIST += exts
-EXCLUDE = getattr(settings, 'FILEBROWSER_EXCLUDE',
-                  (r'_(%(exts)s)_.*_q\d{1,3}\.(%(exts)s)' % {'exts': ('|'.join(EXTENSION_LIST))},))
-# Max. Upload Size in Bytes.
-MAX_UPLOAD_SIZE = getattr(settings, "FILEBROWSER_MAX_UPLOAD_SIZE", 10485760)
-# Normalize filename and remove all non-alphanumeric characters
-# except for underscores, spaces & dashes.
-NORMALIZE_FILENAME = getattr(settings, "FILEBROWSER_NORMALIZE_FILENAME", False)
-# Convert Filename (replace spaces and convert to lowercase)
-CONVERT_FILENAME = getattr(settings, "FILEBROWSER_CONVERT_FILENAME", True)
-# Max. Entries per Page
-# Loading a Sever-Directory with lots of files might take a while
-# Use this setting to limit the items shown
-LIST_PER_PAGE = getattr(settings, "FILEBROWSER_LIST_PER_PAGE", 50)
-# Default Sorting
-# Options: date, filesize, filename_lower, filetype_checked
-DEFAULT_SORTING_BY = getattr(settings, "FILEBROWSER_DEFAULT_SORTING_BY", "date")
-# Sorting Order: asc, desc
-DEFAULT_SORTING_ORDER = getattr(settings, "FILEBROWSER_DEFAULT_SORTING_ORDER", "desc")
-# regex to clean dir names before creation
-FOLDER_REGEX = getattr(settings, "FILEBROWSER_FOLDER_REGEX", r'^[\w._\ /-]+$')
-# Traverse directories when searching
-SEARCH_TRAVERSE = getattr(settings, "FILEBROWSER_SEARCH_TRAVERSE", False)
-# Default Upload and Version Permissions
-DEFAULT_PERMISSIONS = getattr(settings, "FILEBROWSER_DEFAULT_PERMISSIONS", 0o755)
-# Overwrite existing files on upload
-OVERWRITE_EXISTING = getattr(settings, "FILEBROWSER_OVERWRITE_EXISTING", True)
-
-# UPLOAD
-
-# Directory to Save temporary uploaded files (FileBrowseUploadField)
-# Relative to site.storage.location.
-UPLOAD_TEMPDIR = getattr(settings, 'FILEBROWSER_UPLOAD_TEMPDIR', '_temp')
+
+# name: (django setting name or None if not overridable, default)
+DEFAULTS = {
+    'MEDIA_TRASH_URL': ("MEDIA_TRASH_URL", '/media/trash/'),
+    'MEDIA_TRASH_PATH': ('MEDIA_TRASH_PATH', computed(
+        lambda s: os.path.abspath(os.path.join(settings.MEDIA_ROOT, '..', 'trash')))),
+    'MEDIA_TRASH_LOGIN_URL': ('MEDIA_TRASH_LOGIN_URL', computed(lambda s: settings.LOGIN_URL)),
+    'MEDIA_TRASH_MODEL': ('MEDIA_TRASH_MODEL', computed(_required)),
+
+    'MEDIA_TRASH_RECOVER_DIR': ("MEDIA_TRASH_RECOVER_DIR", computed(lambda s: settings.MEDIA_ROOT)),
+
+    'MEDIA_TRASH_GET_BACK_URL': ("MEDIA_TRASH_GET_BACK_URL", None),
+    'MEDIA_TRASH_BUTTON_BACK_TITLE': ("MEDIA_TRASH_BUTTON_BACK_TITLE", None),
+
+    # Lock file keeping concurrent media_trash_collect runs apart (on a shared
+    # filesystem for several nodes). Default: next to MEDIA_TRASH_PATH.
+    'MEDIA_TRASH_LOCK_FILE': ("MEDIA_TRASH_LOCK_FILE", computed(
+        lambda s: os.path.normpath(s.MEDIA_TRASH_PATH) + '.lock')),
+
+    # Callable (dotted path) returning the origin of a collected trash model row:
+    # (model label, pk, file field name or ''). None records the trash model row itself.
+    'MEDIA_TRASH_GET_ORIGIN': ("MEDIA_TRASH_GET_ORIGIN", None),
+    # Point the file field of the origin row back to the restored file.
+    'MEDIA_TRASH_RESTORE_REATTACH': ("MEDIA_TRASH_RESTORE_REATTACH", False),
+
+    # Storage class of the trash (must implement media_trash.storage.StorageMixin),
+    # e.g. 'media_trash.s3.S3Storage' to keep the trash in an S3-compatible bucket.
+    'MEDIA_TRASH_STORAGE': ("MEDIA_TRASH_STORAGE", 'media_trash.storage.FileSystemStorage'),
+    # Keyword arguments of the storage class (None uses MEDIA_TRASH_PATH and MEDIA_TRASH_URL).
+    'MEDIA_TRASH_STORAGE_OPTIONS': ("MEDIA_TRASH_STORAGE_OPTIONS", None),
+    # Number of directories listed concurrently when walking the trash (1 walks sequentially).
+    # Useful on remote storages where each listing is a network round trip.
+    'MEDIA_TRASH_WALK_CONCURRENCY': ("MEDIA_TRASH_WALK_CONCURRENCY", 1),
+    # Seconds to wait for a directory listing during a concurrent walk.
+    'MEDIA_TRASH_WALK_TIMEOUT': ("MEDIA_TRASH_WALK_TIMEOUT", 30),
+    # Threads (shared by all the requests) stat-ing the entries of a trash page and of a
+    # restore concurrently (1 stats sequentially in the request thread).
+    'MEDIA_TRASH_STAT_CONCURRENCY': ("MEDIA_TRASH_STAT_CONCURRENCY", 1),
+
+    # Cache keeping the trash generation (see media_trash.generation; it should be shared by
+    # the web and the command processes) and the rendered rows of the trash pages.
+    'MEDIA_TRASH_CACHE': ("MEDIA_TRASH_CACHE", 'default'),
+    'MEDIA_TRASH_CACHE_TIMEOUT': ("MEDIA_TRASH_CACHE_TIMEOUT", 300),
+
+    # Rows per page of the JSON listing API (?limit= may ask for up to MEDIA_TRASH_API_MAX_PAGE_SIZE).
+    'MEDIA_TRASH_API_PAGE_SIZE': ("MEDIA_TRASH_API_PAGE_SIZE", 1000),
+    'MEDIA_TRASH_API_MAX_PAGE_SIZE': ("MEDIA_TRASH_API_MAX_PAGE_SIZE", 10000),
+
+    # The directory aggregates are kept by a running media_trash_watch (collect, restore and
+    # purge leave them alone).
+    'MEDIA_TRASH_WATCHED': ("MEDIA_TRASH_WATCHED", False),
+    # Seconds without events before media_trash_watch applies a burst, and at most between
+    # two updates while events keep coming.
+    'MEDIA_TRASH_WATCH_DEBOUNCE': ("MEDIA_TRASH_WATCH_DEBOUNCE", 0.5),
+    'MEDIA_TRASH_WATCH_MAX_DELAY': ("MEDIA_TRASH_WATCH_MAX_DELAY", 5),
+    # Seconds between two full rescans of media_trash_watch (None: only when events were lost).
+    'MEDIA_TRASH_WATCH_RESCAN_INTERVAL': ("MEDIA_TRASH_WATCH_RESCAN_INTERVAL", None),
+
+    # Callable (dotted path) receiving the timings of the hot paths:
+    # hook(phase, duration, files=0, bytes=0). See media_trash.instrumentation.
+    'MEDIA_TRASH_METRICS_HOOK': ("MEDIA_TRASH_METRICS_HOOK", None),
+    # Count and time the storage calls of every trash page (reported in the Server-Timing header).
+    'MEDIA_TRASH_PROFILE_STORAGE': ("MEDIA_TRASH_PROFILE_STORAGE", False),
+
+    # Categories of EXTENSIONS stored as is in exported zip archives (already compressed).
+    'MEDIA_TRASH_EXPORT_STORED_CATEGORIES': ("MEDIA_TRASH_EXPORT_STORED_CATEGORIES", ['Image', 'Video', 'Audio']),
+
+    # COMPRESSION
+
+    # Compress the collected files (see the media_trash_compact command).
+    'MEDIA_TRASH_COMPRESS': ("MEDIA_TRASH_COMPRESS", False),
+    # Compression format: gzip or zstd (requires the zstandard package).
+    'MEDIA_TRASH_COMPRESS_FORMAT': ("MEDIA_TRASH_COMPRESS_FORMAT", 'gzip'),
+    # Categories of EXTENSIONS that are worth compressing.
+    'MEDIA_TRASH_COMPRESS_CATEGORIES': ("MEDIA_TRASH_COMPRESS_CATEGORIES", ['Document']),
+    # Files whose compressed size exceeds this ratio of the original are kept uncompressed.
+    'MEDIA_TRASH_COMPRESS_MIN_RATIO': ("MEDIA_TRASH_COMPRESS_MIN_RATIO", 0.9),
+    # Number of compression processes (None uses the cpu count).
+    'MEDIA_TRASH_COMPRESS_WORKERS': ("MEDIA_TRASH_COMPRESS_WORKERS", None),
+
+    # INTEGRITY
+
+    # Record the sha256 of the collected files before moving them (verified by media_trash_scrub).
+    'MEDIA_TRASH_CHECKSUM': ("MEDIA_TRASH_CHECKSUM", False),
+    # Number of hashing processes (None uses the cpu count).
+    'MEDIA_TRASH_CHECKSUM_WORKERS': ("MEDIA_TRASH_CHECKSUM_WORKERS", None),
+
+    # source taken from:
+    # https://github.com/sehmaschine/django-filebrowser
+    # ====================
+
+    # Main FileBrowser Directory. Relative to site.storage.location.
+    # DO NOT USE A SLASH AT THE BEGINNING, DO NOT FORGET THE TRAILING SLASH AT THE END.
+    'DIRECTORY': ("FILEBROWSER_DIRECTORY", 'uploads/'),
+
+    # EXTENSIONS AND FORMATS
+    # Allowed Extensions for File Upload. Lower case is important.
+    'EXTENSIONS': ("FILEBROWSER_EXTENSIONS", {
+        'Image': ['.jpg', '.jpeg', '.gif', '.png', '.tif', '.tiff', '.webp', '.avif'],
+        'Document': ['.pdf', '.doc', '.rtf', '.txt', '.xls', '.csv', '.docx'],
+        'Video': ['.mov', '.mp4', '.m4v', '.webm', '.wmv', '.mpeg', '.mpg', '.avi', '.rm'],
+        'Audio': ['.mp3', '.wav', '.aiff', '.midi', '.m4p']
+    }),
+    # Define different formats for allowed selections.
+    # This has to be a subset of EXTENSIONS.
+    # e.g., add ?type=image to the browse-URL ...
+    'SELECT_FORMATS': ("FILEBROWSER_SELECT_FORMATS", {
+        'file': ['Image', 'Document', 'Video', 'Audio'],
+        'image': ['Image'],
+        'document': ['Document'],
+        'media': ['Video', 'Audio'],
+    }),
+
+    # VERSIONS
+
+    # Directory to Save Image Versions (and Thumbnails). Relative to site.storage.location.
+    # If no directory is given, versions are stored within the Image directory.
+    # VERSION URL: VERSIONS_BASEDIR/original_path/originalfilename_versionsuffix.extension
+    'VERSIONS_BASEDIR': ('FILEBROWSER_VERSIONS_BASEDIR', '_versions'),
+    # Versions Format. Available Attributes: verbose_name, width, height, opts,
+    # format (output format, e.g. 'webp'; default: the format of the original), quality and
+    # format_options (encoder options of the version, over VERSION_FORMAT_OPTIONS)
+    'VERSIONS': ("FILEBROWSER_VERSIONS", {
+        'admin_thumbnail': {'verbose_name': 'Admin Thumbnail', 'width': 60, 'height': 60, 'opts': 'crop'},
+        'thumbnail': {'verbose_name': 'Thumbnail (1 col)', 'width': 60, 'height': 60, 'opts': 'crop'},
+        'small': {'verbose_name': 'Small (2 col)', 'width': 140, 'height': '', 'opts': ''},
+        'medium': {'verbose_name': 'Medium (4col )', 'width': 300, 'height': '', 'opts': ''},
+        'big': {'verbose_name': 'Big (6 col)', 'width': 460, 'height': '', 'opts': ''},
+        'large': {'verbose_name': 'Large (8 col)', 'width': 680, 'height': '', 'opts': ''},
+    }),
+    # Quality of saved versions
+    'VERSION_QUALITY': ('FILEBROWSER_VERSION_QUALITY', 90),
+    # Default encoder options per output format of the versions (see the 'format' of VERSIONS)
+    'VERSION_FORMAT_OPTIONS': ('FILEBROWSER_VERSION_FORMAT_OPTIONS', {
+        'jpeg': {'optimize': True},
+        'png': {'optimize': True},
+        'webp': {'method': 4},
+        'avif': {'speed': 8},
+    }),
+    # Versions available within the Admin-Interface.
+    'ADMIN_VERSIONS': ('FILEBROWSER_ADMIN_VERSIONS', ['thumbnail', 'small', 'medium', 'big', 'large']),
+    # Which Version should be used as Admin-thumbnail.
+    'ADMIN_THUMBNAIL': ('FILEBROWSER_ADMIN_THUMBNAIL', 'admin_thumbnail'),
+
+    'VERSION_PROCESSORS': ('FILEBROWSER_VERSION_PROCESSORS', [
+        'filebrowser.utils.scale_and_crop',
+    ]),
+    'VERSION_NAMER': ('FILEBROWSER_VERSION_NAMER', 'filebrowser.namers.VersionNamer'),
+
+    # PLACEHOLDER
+
+    # Path to placeholder image (relative to storage location)
+    'PLACEHOLDER': ("FILEBROWSER_PLACEHOLDER", ""),
+    # Show Placeholder if the original image does not exist
+    'SHOW_PLACEHOLDER': ("FILEBROWSER_SHOW_PLACEHOLDER", False),
+    # Always show placeholder (even if the original image exists)
+    'FORCE_PLACEHOLDER': ("FILEBROWSER_FORCE_PLACEHOLDER", False),
+
+    # EXTRA SETTINGS
+
+    # If set to True, the FileBrowser will not try to import a mis-installed PIL.
+    'STRICT_PIL': ('FILEBROWSER_STRICT_PIL', False),
+    # PIL's Error "Suspension not allowed here" work around:
+    # s. http://mail.python.org/pipermail/image-sig/1999-August/000816.html
+    'IMAGE_MAXBLOCK': ('FILEBROWSER_IMAGE_MAXBLOCK', 1024 * 1024),
+    'EXTENSION_LIST': (None, computed(lambda s: [ext for exts in s.EXTENSIONS.values() for ext in exts])),
+    # Exclude files matching any of the following regular expressions
+    # Default is to exclude 'thumbnail' style naming of image-thumbnails.
+    'EXCLUDE': ('FILEBROWSER_EXCLUDE', computed(
+        lambda s: (r'_(%(exts)s)_.*_q\d{1,3}\.(%(exts)s)' % {'exts': ('|'.join(s.EXTENSION_LIST))},))),
+    # Max. Upload Size in Bytes.
+    'MAX_UPLOAD_SIZE': ("FILEBROWSER_MAX_UPLOAD_SIZE", 10485760),
+    # Normalize filename and remove all non-alphanumeric characters
+    # except for underscores, spaces & dashes.
+    'NORMALIZE_FILENAME': ("FILEBROWSER_NORMALIZE_FILENAME", False),
+    # Convert Filename (replace spaces and convert to lowercase)
+    'CONVERT_FILENAME': ("FILEBROWSER_CONVERT_FILENAME", True),
+    # Max. Entries per Page
+    # Loading a Sever-Directory with lots of files might take a while
+    # Use this setting to limit the items shown
+    'LIST_PER_PAGE': ("FILEBROWSER_LIST_PER_PAGE", 50),
+    # Default Sorting
+    # Options: date, filesize, filename_lower, filetype_checked
+    'DEFAULT_SORTING_BY': ("FILEBROWSER_DEFAULT_SORTING_BY", "date"),
+    # Sorting Order: asc, desc
+    'DEFAULT_SORTING_ORDER': ("FILEBROWSER_DEFAULT_SORTING_ORDER", "desc"),
+    # regex to clean dir names before creation
+    'FOLDER_REGEX': ("FILEBROWSER_FOLDER_REGEX", r'^[\w._\ /-]+$'),
+    # Traverse directories when searching
+    'SEARCH_TRAVERSE': ("FILEBROWSER_SEARCH_TRAVERSE", False),
+    # Default Upload and Version Permissions
+    'DEFAULT_PERMISSIONS': ("FILEBROWSER_DEFAULT_PERMISSIONS", 0o755),
+    # Overwrite existing files on upload
+    'OVERWRITE_EXISTING': ("FILEBROWSER_OVERWRITE_EXISTING", True),
+
+    # UPLOAD
+
+    # Directory to Save temporary uploaded files (FileBrowseUploadField)
+    # Relative to site.storage.location.
+    'UPLOAD_TEMPDIR': ('FILEBROWSER_UPLOAD_TEMPDIR', '_temp'),
+}
+
+
+class TrashSettings(object):
+    """
+    The settings of DEFAULTS as attributes, resolved on first access.
+    """
+
+    def __getattr__(self, name):
+        try:
+            setting, default = DEFAULTS[name]
+        except KeyError:
+            raise AttributeError("Invalid media trash setting: '%s'" % name)
+        if setting is not None and hasattr(settings, setting):
+            value = getattr(settings, setting)
+        elif isinstance(default, computed):
+            value = default.func(self)
+        else:
+            value = default
+        setattr(self, name, value)
+        return value
+
+    def reload(self):
+        """Forgets the resolved settings"""
+        self.__dict__.clear()
+
+
+trash_settings = TrashSettings()
+
+
+def reload_trash_settings(setting, **kwargs):
+    if setting in ('MEDIA_ROOT', 'LOGIN_URL') or any(setting == django_setting
+                                                   for django_setting, _default in DEFAULTS.values()):
+        trash_settings.reload()
+
+
+setting_changed.connect(reload_trash_settings)
 
 # EXTRA TRANSLATION STRINGS
 
@@ -135,3 +279,20 @@ _('Image')
 _('Video')
 _('Document')
 _('Audio')
+
+
+class _SettingsModule(types.ModuleType):
+    """This module, resolving the names of DEFAULTS from trash_settings (deprecated)"""
+
+    def __getattr__(self, name):
+        if name not in DEFAULTS:
+            raise AttributeError("module %r has no attribute %r" % (self.__name__, name))
+        warnings.warn("media_trash.settings.%s is deprecated, use media_trash.settings.trash_settings.%s"
+                      % (name, name), DeprecationWarning, stacklevel=2)
+        return getattr(trash_settings, name)
+
+
+_module = _SettingsModule(__name__, __doc__)
+_module.__dict__.update(globals())
+_module._module = sys.modules[__name__]  # keeps the globals of the functions alive (Python 2)
+sys.modules[__name__] = _module
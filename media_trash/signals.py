@@ -1,3 +1,11 @@
 from django.dispatch import Signal
 
-trash_collected = Signal(providing_args=[])
+# Sent by media_trash_collect after processing, with a summary of the run:
+# elapsed (seconds), files and bytes collected, renamed/copied split of the moves,
+# failed moves, skipped (missing) items and deferred items (whose source could not be
+# checked, e.g. an unreadable directory: they are left for the next run).
+trash_collected = Signal(providing_args=['elapsed', 'files', 'bytes', 'renamed', 'copied', 'failed', 'skipped',
+                                         'deferred'])
+
+# Sent at the end of every instrumented phase (see media_trash.instrumentation).
+phase_timed = Signal(providing_args=['phase', 'duration', 'files', 'bytes'])
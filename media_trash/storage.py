@@ -5,9 +5,20 @@ import shutil
 
 from django.core.files.move import file_move_safe
 from django.core.files import storage
-from django.utils.encoding import smart_text
+from django.utils.module_loading import import_string
 
-from .settings import DEFAULT_PERMISSIONS
+from .settings import trash_settings
+from .utils import move_file
+
+
+def get_storage():
+    """
+    Returns the storage that keeps the trash (MEDIA_TRASH_STORAGE).
+    """
+    options = trash_settings.MEDIA_TRASH_STORAGE_OPTIONS
+    if options is None:
+        options = {'location': trash_settings.MEDIA_TRASH_PATH, 'base_url': trash_settings.MEDIA_TRASH_URL}
+    return import_string(trash_settings.MEDIA_TRASH_STORAGE)(**options)
 
 
 class StorageMixin(object):
@@ -53,6 +64,41 @@ class StorageMixin(object):
         """
         raise NotImplementedError()
 
+    @property
+    def root(self):
+        """
+        Local path that names are relative to (names may be given as absolute paths under it).
+        """
+        return self.location
+
+    def walk(self, name):
+        """
+        Yields (path, is_dir) for every directory and file below name, paths relative to name.
+        """
+        raise NotImplementedError()
+
+    def delete_many(self, names):
+        """
+        Deletes a batch of files.
+        """
+        raise NotImplementedError()
+
+    def import_file(self, path, name):
+        """
+        Moves the local file path into the storage as name.
+
+        Returns True if the file was renamed, False if it had to be copied.
+        """
+        raise NotImplementedError()
+
+    def export_file(self, name, path, allow_overwrite=False):
+        """
+        Moves the file name out of the storage to the local file path (in an
+        existing directory). If allow_overwrite==False and path exists, raises
+        an OSError (EEXIST).
+        """
+        raise NotImplementedError()
+
 
 class FileSystemStorageMixin(StorageMixin):
 
@@ -72,10 +118,40 @@ class FileSystemStorageMixin(StorageMixin):
         shutil.rmtree(self.path(name))
 
     def setpermission(self, name):
-        from .base import FileObject
+        os.chmod(self.path(name), trash_settings.DEFAULT_PERMISSIONS)
 
-        full_path = FileObject(smart_text(name), site=self).path_full
-        os.chmod(full_path, DEFAULT_PERMISSIONS)
+    def walk(self, name):
+        """
+        Danger: Symbolic links can create cycles and this function
+        ends up in a regression.
+        """
+        dirs, files = self.listdir(name)
+        for d in dirs:
+            for path, is_dir in self.walk(os.path.join(name, d)):
+                yield os.path.join(d, path), is_dir
+            yield d, True
+        for f in files:
+            yield f, False
+
+    def delete_many(self, names):
+        for name in names:
+            self.delete(name)
+
+    def import_file(self, path, name):
+        dst = self.path(name)
+        dstdir = os.path.dirname(dst)
+        if not os.path.isdir(dstdir):
+            os.makedirs(dstdir)
+        try:
+            os.rename(path, dst)
+            return True
+        except OSError:
+            pass
+        file_move_safe(path, dst, allow_overwrite=True)
+        return False
+
+    def export_file(self, name, path, allow_overwrite=False):
+        move_file(self.path(name), path, allow_overwrite=allow_overwrite)
 
 
 class FileSystemStorage(storage.FileSystemStorage, FileSystemStorageMixin):
@@ -1,10 +1,20 @@
 from django.conf.urls import url
 from django.contrib.auth.decorators import login_required
 
-from . import views, settings
+from . import views
+from .settings import trash_settings
 
 urlpatterns = [
     url("^$", login_required(views.MediaView.as_view(),
-                             login_url=settings.MEDIA_TRASH_LOGIN_URL),
-        name='media-trash')
+                             login_url=trash_settings.MEDIA_TRASH_LOGIN_URL),
+        name='media-trash'),
+    url("^api/$", login_required(views.MediaApiView.as_view(),
+                                 login_url=trash_settings.MEDIA_TRASH_LOGIN_URL),
+        name='media-trash-api'),
+    url("^export/$", login_required(views.MediaExportView.as_view(),
+                                    login_url=trash_settings.MEDIA_TRASH_LOGIN_URL),
+        name='media-trash-export'),
+    url("^download/$", login_required(views.MediaDownloadView.as_view(),
+                                      login_url=trash_settings.MEDIA_TRASH_LOGIN_URL),
+        name='media-trash-download')
 ]
@@ -3,24 +3,42 @@
 # https://github.com/sehmaschine/django-filebrowser
 # ====================
 
+import errno
 import math
 import os
 import re
 import unicodedata
 
+from django.core.files.move import file_move_safe
 from django.utils import six
 from django.utils.module_loading import import_string
 
-from .settings import STRICT_PIL, NORMALIZE_FILENAME, CONVERT_FILENAME
-from .settings import VERSION_PROCESSORS
+from .settings import trash_settings
 
-if STRICT_PIL:
-    from PIL import Image
-else:
-    try:
-        from PIL import Image
-    except ImportError:
-        import Image
+_image_module = None
+
+
+def get_image_module():
+    """
+    The PIL Image module, imported on first image use: loading the views
+    and commands does not pay for the imaging library.
+    """
+    global _image_module
+    if _image_module is None:
+        if trash_settings.STRICT_PIL:
+            from PIL import Image
+            from PIL import ImageFile
+        else:
+            try:
+                from PIL import Image
+                from PIL import ImageFile
+            except ImportError:
+                import Image
+                import ImageFile
+
+        ImageFile.MAXBLOCK = trash_settings.IMAGE_MAXBLOCK  # default is 64k
+        _image_module = Image
+    return _image_module
 
 
 def convert_filename(value):
@@ -28,7 +46,7 @@ def convert_filename(value):
     Convert Filename.
     """
 
-    if NORMALIZE_FILENAME:
+    if trash_settings.NORMALIZE_FILENAME:
         chunks = value.split(os.extsep)
         normalized = []
         for v in chunks:
@@ -41,12 +59,43 @@ def convert_filename(value):
         else:
             value = normalized[0]
 
-    if CONVERT_FILENAME:
+    if trash_settings.CONVERT_FILENAME:
         value = value.replace(" ", "_").lower()
 
     return value
 
 
+def makedirs(path):
+    """os.makedirs, without an error if the directory exists (no check beforehand)"""
+    try:
+        os.makedirs(path)
+    except OSError as e:
+        if e.errno != errno.EEXIST:
+            raise
+
+
+def move_file(src, dst, allow_overwrite=False):
+    """
+    Moves the local file src to dst. Unless allow_overwrite, fails with EEXIST
+    if dst exists: a hard link to dst (which cannot replace a file) and the
+    unlink of src, so dst is not probed beforehand; it only is for a copy
+    across devices (or on a filesystem without hard links).
+    """
+    if allow_overwrite:
+        file_move_safe(src, dst, allow_overwrite=True)
+        return
+    try:
+        os.link(src, dst)
+    except OSError as e:
+        if e.errno not in (errno.EXDEV, errno.EPERM, errno.EOPNOTSUPP):
+            raise
+        if os.path.lexists(dst):
+            raise OSError(errno.EEXIST, os.strerror(errno.EEXIST), dst)
+        file_move_safe(src, dst, allow_overwrite=True)
+    else:
+        os.unlink(src)
+
+
 def path_strip(path, root):
     if not path or not root:
         return path
@@ -57,7 +106,15 @@ def path_strip(path, root):
     return path
 
 
-_default_processors = None
+_default_processors = {}
+
+
+def get_default_processors():
+    """The VERSION_PROCESSORS functions"""
+    names = tuple(trash_settings.VERSION_PROCESSORS)
+    if names not in _default_processors:
+        _default_processors[names] = [import_string(name) for name in names]
+    return _default_processors[names]
 
 
 def process_image(source, processor_options, processors=None):
@@ -65,58 +122,137 @@ def process_image(source, processor_options, processors=None):
     Process a source PIL image through a series of image processors, returning
     the (potentially) altered image.
     """
-    global _default_processors
     if processors is None:
-        if _default_processors is None:
-            _default_processors = [import_string(name) for name in VERSION_PROCESSORS]
-        processors = _default_processors
+        processors = get_default_processors()
     image = source
     for processor in processors:
         image = processor(image, **processor_options)
     return image
 
 
-def scale_and_crop(im, width=None, height=None, opts='', **kwargs):
+def get_resample_filter():
+    """LANCZOS (named ANTIALIAS before Pillow 2.7, which is removed in Pillow 10)"""
+    Image = get_image_module()
+    return getattr(Image, 'LANCZOS', None) or Image.ANTIALIAS
+
+
+def plan_scale_and_crop(size, width=None, height=None, opts='', **kwargs):
     """
-    Scale and Crop.
+    Geometry of scale_and_crop for an image of size, without touching the image:
+    (scaled size or None, crop box in the scaled image or None).
     """
-    x, y = [float(v) for v in im.size]
+    x, y = [float(v) for v in size]
     width = float(width or 0)
     height = float(height or 0)
 
     if (x, y) == (width, height):
-        return im
+        return None, None
 
     if 'upscale' not in opts:
         if (x < width or not width) and (y < height or not height):
-            return im
-
-    if width:
-        xr = float(width)
-    else:
-        xr = float(x * height / y)
-    if height:
-        yr = float(height)
-    else:
-        yr = float(y * width / x)
+            return None, None
 
-    if 'crop' in opts:
-        r = max(xr / x, yr / y)
-    else:
-        r = min(xr / x, yr / y)
+    xr = width or x * height / y
+    yr = height or y * width / x
+    r = max(xr / x, yr / y) if 'crop' in opts else min(xr / x, yr / y)
 
+    scaled = None
     if r < 1.0 or (r > 1.0 and 'upscale' in opts):
-        im = im.resize((int(math.ceil(x * r)), int(math.ceil(y * r))), resample=Image.ANTIALIAS)
+        scaled = (int(math.ceil(x * r)), int(math.ceil(y * r)))
+        x, y = [float(v) for v in scaled]
 
+    box = None
     if 'crop' in opts:
-        x, y = [float(v) for v in im.size]
         ex, ey = (x - min(x, xr)) / 2, (y - min(y, yr)) / 2
         if ex or ey:
-            im = im.crop((int(ex), int(ey), int(ex + xr), int(ey + yr)))
+            box = (int(ex), int(ey), int(ex + xr), int(ey + yr))
+    return scaled, box
+
+
+def scale_and_crop(im, width=None, height=None, opts='', **kwargs):
+    """
+    Scale and Crop.
+    """
+    scaled, box = plan_scale_and_crop(im.size, width, height, opts)
+    if scaled is not None:
+        im = im.resize(scaled, resample=get_resample_filter())
+    if box is not None:
+        im = im.crop(box)
     return im
 
 
 scale_and_crop.valid_options = ('crop', 'upscale')
+scale_and_crop.plan = plan_scale_and_crop
+
+# Images are first reduced by an integer factor (box filter) down to
+# REDUCING_GAP times the target size, then resampled with LANCZOS.
+REDUCING_GAP = 3.0
+
+
+def plan_versions(size, options_list):
+    """
+    Geometries of several versions of an image of size, planned at once:
+    a list of (scaled size or None, crop box or None), one per options.
+    None if the version processors cannot be planned (only a single
+    processor with a plan function, as scale_and_crop, can).
+    """
+    processors = get_default_processors()
+    if len(processors) != 1 or getattr(processors[0], 'plan', None) is None:
+        return None
+    if any('methods' in options for options in options_list):
+        return None
+    return [processors[0].plan(size, **options) for options in options_list]
+
+
+def draft_size(size, plans):
+    """
+    The smallest size a JPEG may be decoded at (see Image.draft) without
+    degrading any of the planned versions, or None to decode at full size.
+    """
+    if not plans:
+        return None
+    targets = [scaled for scaled, box in plans if scaled is not None]
+    if len(targets) < len(plans):
+        return None
+    width = max(w for w, h in targets) * REDUCING_GAP
+    height = max(h for w, h in targets) * REDUCING_GAP
+    if width >= size[0] or height >= size[1]:
+        return None
+    return int(width), int(height)
+
+
+def resize(im, size):
+    """
+    Resizes im to size: downscales by an integer factor first (Image.reduce,
+    or a box filter before Pillow 7) while the image stays at least
+    REDUCING_GAP times the target, then resamples with LANCZOS.
+    """
+    Image = get_image_module()
+    if not hasattr(Image, 'BOX'):  # PIL
+        return im.resize(size, resample=get_resample_filter())
+    if hasattr(im, 'reduce'):
+        return im.resize(size, resample=get_resample_filter(), reducing_gap=REDUCING_GAP)
+    factor = int(min(im.size[0] / (size[0] * REDUCING_GAP), im.size[1] / (size[1] * REDUCING_GAP)))
+    if factor > 1:
+        im = im.resize((int(math.ceil(im.size[0] / float(factor))), int(math.ceil(im.size[1] / float(factor)))),
+                       resample=Image.BOX)
+    return im.resize(size, resample=get_resample_filter())
+
+
+def reduce_and_crop(im, width=None, height=None, opts='', **kwargs):
+    """
+    Scale and Crop like scale_and_crop, reducing large downscales first (see resize).
+    """
+    scaled, box = plan_scale_and_crop(im.size, width, height, opts)
+    if scaled is not None:
+        im = resize(im, scaled)
+    if box is not None:
+        im = im.crop(box)
+    return im
+
+
+reduce_and_crop.valid_options = ('crop', 'upscale')
+reduce_and_crop.plan = plan_scale_and_crop
 
 
 def get_modified_time(storage, path):
@@ -0,0 +1,83 @@
+# coding: utf-8
+"""
+Garbage collection of the image versions kept in VERSIONS_BASEDIR: every
+version is mapped back to its original with the namer (get_original_name)
+in a single walk, listing each original directory once.
+"""
+import os
+import time
+
+from . import aggregates, compression, generation
+from .base import FileObject
+from .settings import trash_settings
+from .utils import get_modified_time
+
+BATCH_SIZE = 500
+
+MISSING = 'missing'  # the original is gone
+STALE = 'stale'  # the original is newer than the version
+UNKNOWN = 'unknown'  # the name does not map to an original (only deleted on demand)
+
+
+class VersionCollector(object):
+    """Finds and deletes the orphaned versions of a trash storage"""
+
+    def __init__(self, storage):
+        self.storage = storage
+        self._listings = {}
+        self._mtimes = {}
+
+    def _get_mtime(self, name):
+        if name not in self._mtimes:
+            self._mtimes[name] = time.mktime(get_modified_time(self.storage, name).timetuple())
+        return self._mtimes[name]
+
+    def _find_original(self, path):
+        """Name of the original file at path (possibly compressed in the trash) or None"""
+        directory, filename = os.path.split(path)
+        if directory not in self._listings:
+            try:
+                self._listings[directory] = set(self.storage.listdir(directory)[1])
+            except (IOError, OSError):
+                self._listings[directory] = set()
+        files = self._listings[directory]
+        for name in [filename] + [filename + codec.suffix for codec in compression.CODECS]:
+            if name in files:
+                return os.path.join(directory, name)
+        return None
+
+    def find_orphans(self):
+        """Yields (name, size, reason) for the versions to delete (names relative to the storage)"""
+        basedir = trash_settings.VERSIONS_BASEDIR.rstrip('/')
+        if not basedir or not self.storage.isdir(basedir):
+            return
+        for path, is_dir in self.storage.walk(basedir):
+            if is_dir:
+                continue
+            name = os.path.join(basedir, path)
+            version = FileObject(name, storage=self.storage)
+            if version.original_filename is None:
+                reason = UNKNOWN
+            else:
+                original = self._find_original(version.original.path)
+                if original is None:
+                    reason = MISSING
+                elif self._get_mtime(original) > self._get_mtime(name):
+                    reason = STALE
+                else:
+                    continue
+            yield name, self.storage.size(name), reason
+
+    def delete(self, orphans):
+        """Deletes the (name, size, reason) orphans in batches; returns the deleted (count, bytes)"""
+        count = size = 0
+        orphans = list(orphans)
+        for i in range(0, len(orphans), BATCH_SIZE):
+            batch = orphans[i:i + BATCH_SIZE]
+            self.storage.delete_many([name for name, _, _ in batch])
+            aggregates.remove_many([(name, version_size) for name, version_size, _ in batch])
+            count += len(batch)
+            size += sum(version_size for _, version_size, _ in batch)
+        if count:
+            generation.bump()
+        return count, size
@@ -1,53 +1,285 @@
+import base64
+import hashlib
+import json
 import os
+import unicodedata
 import urllib
+from wsgiref.util import FileWrapper
 
 from django.contrib import messages
-from django.http import HttpResponseRedirect
+from django.core.cache import caches
+from django.http import HttpResponseBadRequest, HttpResponseRedirect, StreamingHttpResponse, Http404
+from django.middleware.csrf import get_token
 from django.shortcuts import render
 from django.template.loader import render_to_string
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.encoding import force_bytes, force_text
+from django.utils.http import http_date, quote_etag
 from django.utils.module_loading import import_string
+from django.utils.safestring import mark_safe
+from django.utils.translation import get_language
 from django.views.generic import View
 
-from . import settings
+from . import compression, export, generation
 from .base import FileListing, FileObject
+from .profiling import ProfilingStorage
+from .restore import Restorer
+from .settings import trash_settings
+from .storage import get_storage
+from .walkers import map_concurrently
 
 
-class MediaView(View):
+def content_disposition(disposition, filename):
+    """
+    The Content-Disposition header value for filename: an ASCII filename
+    (quoted, escaped) for old clients and the UTF-8 filename* of RFC 5987.
+    """
+    filename = force_text(filename)
+    fallback = unicodedata.normalize('NFKD', filename).encode('ascii', 'ignore').decode('ascii')
+    fallback = ''.join(c if ' ' <= c < '\x7f' else '_' for c in fallback)
+    fallback = fallback.replace('\\', '\\\\').replace('"', '\\"') or 'download'
+    return '%s; filename="%s"; filename*=UTF-8\'\'%s' % (
+        disposition, fallback, urllib.quote(filename.encode('utf-8'), safe=''))
+
+
+class TrashListingMixin(object):
+    """The trash storage and the listing of its directories (for the trash views)"""
+    storage = None
 
     def __init__(self, *args, **kwargs):
-        super(MediaView, self).__init__(*args, **kwargs)
+        super(TrashListingMixin, self).__init__(*args, **kwargs)
+
+        storage = self.storage or get_storage()
+        if trash_settings.MEDIA_TRASH_PROFILE_STORAGE and not isinstance(storage, ProfilingStorage):
+            storage = ProfilingStorage(storage)
+        self.file_listing = FileListing(trash_settings.MEDIA_TRASH_PATH, storage=storage)
+
+    def get_directory_listing(self, path):
+        """Listing of a single directory level (path is relative to the trash)"""
+        path = os.path.normpath(path or os.curdir)
+        if os.path.isabs(path) or path.split(os.sep)[0] == os.pardir:
+            raise Http404(path)
+        path = '' if path == os.curdir else path
+        file_listing = FileListing(os.path.join(trash_settings.MEDIA_TRASH_PATH, path),
+                                   sorting_by='filename_lower',
+                                   storage=self.file_listing.storage)
+        if not file_listing.is_folder:
+            raise Http404(path)
+        return path, file_listing
+
 
-        self.file_listing = FileListing(settings.MEDIA_TRASH_PATH)
+class MediaView(TrashListingMixin, View):
+    # cache the rendered rows per generation of the trash
+    cache_rows = True
+
+    @staticmethod
+    def get_breadcrumbs(path):
+        breadcrumbs, parts = [], []
+        for part in path.split(os.sep) if path else []:
+            parts.append(part)
+            breadcrumbs.append((part, "/".join(parts)))
+        return breadcrumbs
+
+    @staticmethod
+    def stat_entry(fileobject):
+        """
+        The storage calls of a row of the page (cached on the FileObject).
+        The aggregates of the folders are read from the database later.
+        """
+        if not fileobject.is_folder:
+            fileobject.filesize
+
+    def get_rows(self, path, file_listing, token):
+        """The rendered rows of the page, cached for the generation of the trash"""
+        cache = caches[trash_settings.MEDIA_TRASH_CACHE]
+        key = 'media_trash:rows:%s' % hashlib.md5(force_bytes('%s:%s:%s' % (token, path, get_language()))).hexdigest()
+        rows = cache.get(key) if self.cache_rows else None
+        if rows is None:
+            files_listing = file_listing.files_listing_filtered()
+            map_concurrently(self.stat_entry, files_listing)
+            rows = render_to_string('media-trash/rows.html', context={'files_listing': files_listing})
+            if self.cache_rows:
+                cache.set(key, rows, trash_settings.MEDIA_TRASH_CACHE_TIMEOUT)
+        return mark_safe(rows)
 
     def get(self, request, *args, **kwargs):
+        path, file_listing = self.get_directory_listing(request.GET.get('path'))
+        token, timestamp = generation.get_generation()
         context = {
-            'files_walk': self.file_listing.files_walk_filtered(),
+            'path': path,
+            'breadcrumbs': self.get_breadcrumbs(path),
         }
-        if isinstance(settings.MEDIA_TRASH_GET_BACK_URL, basestring):
-            context['back_url'] = import_string(settings.MEDIA_TRASH_GET_BACK_URL)(request, **kwargs)
+        if isinstance(trash_settings.MEDIA_TRASH_GET_BACK_URL, basestring):
+            context['back_url'] = import_string(trash_settings.MEDIA_TRASH_GET_BACK_URL)(request, **kwargs)
 
-        if settings.MEDIA_TRASH_BUTTON_BACK_TITLE:
-            context['return_button_title'] = settings.MEDIA_TRASH_BUTTON_BACK_TITLE
+        if trash_settings.MEDIA_TRASH_BUTTON_BACK_TITLE:
+            context['return_button_title'] = trash_settings.MEDIA_TRASH_BUTTON_BACK_TITLE
 
-        return render(request, 'media-trash/index.html', context=context)
-
-    def post(self, request, *args, **kwargs):
-        post = request.POST
+        # A page showing messages is never cached by the client (they are shown once). The page
+        # holds the CSRF token of its restore form: a cached page must not outlive the token
+        # (rotated on login).
+        etag = None
+        if not len(messages.get_messages(request)):
+            get_token(request)
+            etag = quote_etag(hashlib.md5(force_bytes('%s:%s:%s:%s:%s:%s:%s' % (
+                token, path, get_language(), context.get('back_url'), context.get('return_button_title'),
+                request.user.pk, request.META.get('CSRF_COOKIE'))
+            )).hexdigest())
+            response = get_conditional_response(request, etag=etag, last_modified=int(timestamp))
+            if response is not None:
+                return response
 
-        relpath = urllib.unquote_plus(post.get('relpath'))
+        context['rows'] = self.get_rows(path, file_listing, token)
+        response = render(request, 'media-trash/index.html', context=context)
+        if etag is not None:
+            response['ETag'] = etag
+            response['Last-Modified'] = http_date(timestamp)
+        patch_cache_control(response, private=True, no_cache=True)
+        if isinstance(self.file_listing.storage, ProfilingStorage):
+            response['Server-Timing'] = self.file_listing.storage.server_timing()
+        return response
 
-        fileobject = FileObject(relpath, storage=self.file_listing.storage)
+    def post(self, request, *args, **kwargs):
+        relpaths = [urllib.unquote_plus(relpath) for relpath in request.POST.getlist('relpath')]
 
-        if fileobject.exists:
-            filepath = os.path.join(settings.MEDIA_TRASH_RECOVER_DIR, fileobject.path_relative_directory)
-            try:
-                fileobject.move(filepath)
+        restorer = Restorer(self.file_listing.storage)
+        for relpath, destination, exc in restorer.restore(relpaths):
+            if exc is None:
                 messages.success(request, render_to_string('media-trash/restore-success.html', context=dict(
-                    filepath=relpath
+                    filepath=relpath,
+                    destination=destination,
+                    renamed=os.path.basename(destination) != os.path.basename(compression.strip_suffix(relpath))
                 )))
-            except Exception as exc:
+            else:
                 messages.error(request, render_to_string('media-trash/restore-error.html', context=dict(
                     filepath=relpath,
                     exc=exc
                 )))
-        return HttpResponseRedirect(request.path)
+        return HttpResponseRedirect(request.get_full_path())
+
+
+class MediaApiView(TrashListingMixin, View):
+    """
+    The trash contents below ?path= as data, streamed from a sorted walk:
+    one JSON object per line (NDJSON), or a JSON document with ?format=json.
+
+    ?fields= selects the fields (comma separated, default: all of FIELDS) and
+    ?limit= the page size. When more rows remain, the page ends with
+    {"next": cursor}: pass it back as ?cursor= for the next page.
+    """
+    FIELDS = ('relpath', 'size', 'mtime', 'filetype')
+    CONTENT_TYPES = {'ndjson': 'application/x-ndjson', 'json': 'application/json'}
+    # rows per chunk written to the response
+    CHUNK_ROWS = 100
+
+    @staticmethod
+    def encode_cursor(path):
+        return force_text(base64.urlsafe_b64encode(force_bytes(path)))
+
+    @staticmethod
+    def decode_cursor(cursor):
+        return force_text(base64.urlsafe_b64decode(force_bytes(cursor)))
+
+    def get_row(self, fileobject, relpath, fields):
+        values = {
+            'relpath': lambda: relpath,
+            'size': lambda: fileobject.filesize,
+            'mtime': lambda: fileobject.date,
+            'filetype': lambda: fileobject.filetype,
+        }
+        return dict((field, values[field]()) for field in fields)
+
+    def stream(self, path, file_listing, fields, cursor, limit, output_format):
+        """Response chunks of CHUNK_ROWS rows"""
+        as_json = output_format == 'json'
+        chunk = ['{"results": ['] if as_json else []
+        after = next_cursor = None
+        for count, (walkpath, is_dir) in enumerate(file_listing.walk_sorted(cursor)):
+            if count == limit:
+                next_cursor = self.encode_cursor(after)
+                break
+            fileobject = FileObject(os.path.join(file_listing.path, walkpath), storage=file_listing.storage)
+            row = json.dumps(self.get_row(fileobject, '/'.join([path, walkpath]) if path else walkpath, fields))
+            chunk.append((',' if count else '') + row if as_json else row + '\n')
+            after = walkpath
+            if len(chunk) >= self.CHUNK_ROWS:
+                yield ''.join(chunk)
+                chunk = []
+        if as_json:
+            chunk.append('], "next": %s}' % json.dumps(next_cursor))
+        elif next_cursor is not None:
+            chunk.append(json.dumps({'next': next_cursor}) + '\n')
+        yield ''.join(chunk)
+
+    def get(self, request, *args, **kwargs):
+        path, file_listing = self.get_directory_listing(request.GET.get('path'))
+
+        fields = [field for field in request.GET.get('fields', '').split(',') if field] or list(self.FIELDS)
+        unknown = [field for field in fields if field not in self.FIELDS]
+        if unknown:
+            return HttpResponseBadRequest("unknown fields: %s" % ', '.join(unknown))
+
+        output_format = request.GET.get('format', 'ndjson')
+        if output_format not in self.CONTENT_TYPES:
+            return HttpResponseBadRequest("unknown format: %s" % output_format)
+
+        try:
+            limit = int(request.GET.get('limit', trash_settings.MEDIA_TRASH_API_PAGE_SIZE))
+            cursor = self.decode_cursor(request.GET['cursor']) if request.GET.get('cursor') else None
+        except (TypeError, ValueError):
+            return HttpResponseBadRequest("invalid limit or cursor")
+        if limit < 1:
+            return HttpResponseBadRequest("invalid limit or cursor")
+        limit = min(limit, trash_settings.MEDIA_TRASH_API_MAX_PAGE_SIZE)
+
+        return StreamingHttpResponse(self.stream(path, file_listing, fields, cursor, limit, output_format),
+                                     content_type=self.CONTENT_TYPES[output_format])
+
+
+class MediaExportView(TrashListingMixin, View):
+    """
+    Streams a zip (or a tar with ?format=tar) of the trash files and folders
+    given as ?relpath= (relative to the trash, repeatable).
+    """
+
+    def get(self, request, *args, **kwargs):
+        relpaths = [os.path.normpath(relpath) for relpath in request.GET.getlist('relpath') if relpath]
+        if not relpaths:
+            return HttpResponseBadRequest("no relpath")
+        for relpath in relpaths:
+            if os.path.isabs(relpath) or relpath.split(os.sep)[0] == os.pardir:
+                raise Http404(relpath)
+
+        archive_format = request.GET.get('format', 'zip')
+        if archive_format not in export.FORMATS:
+            return HttpResponseBadRequest("unknown format: %s" % archive_format)
+        content_type, extension = export.FORMATS[archive_format]
+
+        fileobjects = export.iter_files(self.file_listing.storage, relpaths)
+        response = StreamingHttpResponse(export.stream_archive(fileobjects, archive_format),
+                                         content_type=content_type)
+        name = os.path.basename(relpaths[0]) if len(relpaths) == 1 and relpaths[0] != os.curdir else 'trash'
+        response['Content-Disposition'] = content_disposition('attachment', force_text(name) + extension)
+        return response
+
+
+class MediaDownloadView(View):
+    """Serves a trash file, decompressing it on the fly when needed"""
+
+    def get(self, request, *args, **kwargs):
+        relpath = request.GET.get('relpath', '')
+
+        fileobject = FileObject(relpath, storage=get_storage())
+
+        if not relpath or not fileobject.exists or fileobject.is_folder:
+            raise Http404(relpath)
+
+        if not fileobject.is_compressed:
+            return HttpResponseRedirect(fileobject.url)
+
+        response = StreamingHttpResponse(FileWrapper(fileobject.open_original()),
+                                         content_type=fileobject.mimetype[0] or 'application/octet-stream')
+        if fileobject.filesize is not None:  # unknown for zstd frames without a content size
+            response['Content-Length'] = fileobject.filesize
+        response['Content-Disposition'] = content_disposition('inline', fileobject.filename)
+        return response
@@ -0,0 +1,85 @@
+# coding: utf-8
+import errno
+import os
+import threading
+from multiprocessing.pool import ThreadPool
+
+from django.utils.six.moves import queue
+
+from .settings import trash_settings
+
+_stat_pool = None
+_stat_pool_lock = threading.Lock()
+
+
+class ConcurrentWalker(object):
+    """
+    Walks a storage listing its directories in a bounded thread pool.
+
+    The directory listings are fanned out as soon as their parent is listed,
+    so the walk latency depends on the tree depth instead of the directory
+    count. Entries are yielded as soon as each listing returns (in no
+    particular order).
+    """
+
+    def __init__(self, storage, concurrency=None, timeout=None):
+        self.storage = storage
+        self.concurrency = concurrency or trash_settings.MEDIA_TRASH_WALK_CONCURRENCY
+        self.timeout = timeout or trash_settings.MEDIA_TRASH_WALK_TIMEOUT
+
+    def _listdir(self, name, path, results):
+        try:
+            results.put((path, self.storage.listdir(os.path.join(name, path)), None))
+        except Exception as exc:
+            results.put((path, None, exc))
+
+    def walk(self, name):
+        """Yields (path, is_dir) for every directory and file below name, paths relative to name"""
+        pool = ThreadPool(self.concurrency)
+        results = queue.Queue()
+        try:
+            pool.apply_async(self._listdir, (name, '', results))
+            pending = 1
+            while pending:
+                try:
+                    path, listing, exc = results.get(timeout=self.timeout)
+                except queue.Empty:
+                    raise OSError(errno.ETIMEDOUT, "listing timed out", name)
+                pending -= 1
+                if exc is not None:
+                    raise exc
+                dirs, files = listing
+                for d in dirs:
+                    dirpath = os.path.join(path, d)
+                    pool.apply_async(self._listdir, (name, dirpath, results))
+                    pending += 1
+                    yield dirpath, True
+                for f in files:
+                    yield os.path.join(path, f), False
+        finally:
+            pool.terminate()
+
+
+def get_stat_pool():
+    """
+    The thread pool (MEDIA_TRASH_STAT_CONCURRENCY threads) shared by all the
+    requests, so that the storage calls in flight stay bounded however many
+    pages are served at once.
+    """
+    global _stat_pool
+    with _stat_pool_lock:
+        if _stat_pool is None:
+            _stat_pool = ThreadPool(trash_settings.MEDIA_TRASH_STAT_CONCURRENCY)
+        return _stat_pool
+
+
+def map_concurrently(func, items):
+    """
+    [func(item) for item in items], running the calls in the shared stat pool
+    when MEDIA_TRASH_STAT_CONCURRENCY > 1. func should only do storage calls
+    (no database queries: the pool threads are not request threads).
+    """
+    items = list(items)
+    if trash_settings.MEDIA_TRASH_STAT_CONCURRENCY <= 1 or len(items) <= 1:
+        return [func(item) for item in items]
+    return get_stat_pool().map(func, items)
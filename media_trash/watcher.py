@@ -0,0 +1,202 @@
+# coding: utf-8
+"""
+Keeps the directory aggregates of the trash in sync with MEDIA_TRASH_PATH
+from inotify events, including the files that land there or leave outside
+this app (see the media_trash_watch command).
+
+The events of a burst are coalesced into the set of changed paths, which are
+compared with the known files when the burst is over: each changed directory
+gets a single aggregates update. If events were lost (queue overflow) the
+whole trash is rescanned.
+"""
+import errno
+import os
+import posixpath
+import time
+from stat import S_ISDIR, S_ISREG
+
+from . import aggregates, generation
+from .inotify import (Inotify, IN_ATTRIB, IN_CLOSE_WRITE, IN_CREATE, IN_DELETE, IN_DONT_FOLLOW,
+                      IN_EXCL_UNLINK, IN_IGNORED, IN_MOVED_FROM, IN_MOVED_TO, IN_ONLYDIR, IN_Q_OVERFLOW)
+from .settings import trash_settings
+
+WATCH_MASK = (IN_CREATE | IN_DELETE | IN_MOVED_FROM | IN_MOVED_TO | IN_CLOSE_WRITE | IN_ATTRIB |
+              IN_ONLYDIR | IN_DONT_FOLLOW | IN_EXCL_UNLINK)
+
+_decode = getattr(os, 'fsdecode', lambda name: name)
+
+
+class TrashWatcher(object):
+    """
+    Watches every directory of the trash (root: its local path)::
+
+        TrashWatcher(storage.root, storage).run()
+    """
+
+    def __init__(self, root, storage, debounce=None, max_delay=None, rescan_interval=None, log=None):
+        self.root = os.path.normpath(root)
+        self.storage = storage
+        self.debounce = trash_settings.MEDIA_TRASH_WATCH_DEBOUNCE if debounce is None else debounce
+        self.max_delay = trash_settings.MEDIA_TRASH_WATCH_MAX_DELAY if max_delay is None else max_delay
+        self.rescan_interval = trash_settings.MEDIA_TRASH_WATCH_RESCAN_INTERVAL \
+            if rescan_interval is None else rescan_interval
+        self.log = log or (lambda message: None)
+        self.inotify = None
+        self.watches = {}  # wd: directory (relative to the trash)
+        self.files = {}  # directory: {name: (size, mtime)}
+        self.pending = set()  # paths changed since the last update
+        self.overflowed = False
+
+    def close(self):
+        if self.inotify is not None:
+            self.inotify.close()
+            self.inotify = None
+
+    def rescan(self):
+        """Watches the whole trash again and rebuilds its aggregates"""
+        self.close()
+        self.inotify = Inotify()
+        self.watches = {}
+        self.files = {}
+        self.pending = set()
+        self.overflowed = False
+        self._watch_tree('', {})
+        aggregate = aggregates.rebuild('', self.storage)
+        generation.bump()
+        self.log("rescanned: %d director(ies), %d file(s), %d bytes." % (
+            len(self.files), aggregate.count, aggregate.size))
+
+    def _watch_tree(self, relpath, changes):
+        """Watches the directory relpath and its subdirectories, recording the new files in changes"""
+        stack = [relpath]
+        while stack:
+            directory = stack.pop()
+            path = os.path.join(self.root, directory)
+            try:
+                wd = self.inotify.add_watch(path, WATCH_MASK)
+                names = os.listdir(path)
+            except OSError as e:
+                if e.errno in (errno.ENOENT, errno.ENOTDIR):  # gone meanwhile
+                    continue
+                raise
+            self.watches[wd] = directory
+            self.files.setdefault(directory, {})
+            for name in names:
+                try:
+                    stat = os.lstat(os.path.join(path, name))
+                except OSError:
+                    continue
+                if S_ISDIR(stat.st_mode):
+                    stack.append(posixpath.join(directory, name))
+                elif S_ISREG(stat.st_mode):
+                    self._set_file(directory, name, stat, changes)
+
+    def _set_file(self, directory, name, stat, changes):
+        old = self.files[directory].get(name)
+        new = (stat.st_size, stat.st_mtime)
+        if old == new:
+            return
+        self.files[directory][name] = new
+        change = changes.setdefault(directory, [0, 0, None])
+        change[0] += old is None
+        change[1] += new[0] - (old[0] if old else 0)
+        change[2] = new[1] if change[2] is None else max(change[2], new[1])
+
+    def _forget_file(self, directory, name, changes):
+        old = self.files[directory].pop(name, None)
+        if old is not None:
+            change = changes.setdefault(directory, [0, 0, None])
+            change[0] -= 1
+            change[1] -= old[0]
+
+    def _forget_tree(self, relpath, changes):
+        """The directory relpath is gone (or moved)"""
+        prefix = relpath + '/'
+        for directory in [d for d in self.files if d == relpath or d.startswith(prefix)]:
+            del self.files[directory]
+            changes.pop(directory, None)
+        for wd, directory in list(self.watches.items()):
+            if directory == relpath or directory.startswith(prefix):
+                del self.watches[wd]
+                try:
+                    self.inotify.rm_watch(wd)
+                except OSError:  # already removed with the directory
+                    pass
+        aggregates.forget_tree(relpath)
+
+    def handle(self, event):
+        """Records the path of an event (applied by update)"""
+        if event.mask & IN_Q_OVERFLOW:
+            self.overflowed = True
+        elif event.mask & IN_IGNORED:
+            if self.watches.pop(event.wd, None) == '':
+                raise OSError(errno.ENOENT, "the trash directory was removed", self.root)
+        elif event.wd in self.watches and event.name:
+            self.pending.add(posixpath.join(self.watches[event.wd], _decode(event.name)))
+
+    def update(self):
+        """Applies the changed paths to the aggregates (or rescans if events were lost)"""
+        if self.overflowed:
+            self.log("events were lost, rescanning.")
+            self.rescan()
+            return
+        changes = {}
+        # sorted: a directory comes before its contents
+        for relpath in sorted(self.pending):
+            directory, name = posixpath.split(relpath)
+            if directory not in self.files:  # in a directory removed meanwhile
+                continue
+            try:
+                stat = os.lstat(os.path.join(self.root, relpath))
+            except OSError as e:
+                if e.errno not in (errno.ENOENT, errno.ENOTDIR):
+                    raise
+                stat = None
+            is_dir = stat is not None and S_ISDIR(stat.st_mode)
+            if relpath in self.files and not is_dir:
+                self._forget_tree(relpath, changes)
+            if stat is not None and S_ISREG(stat.st_mode):
+                self._set_file(directory, name, stat, changes)
+            else:
+                self._forget_file(directory, name, changes)
+                if is_dir and relpath not in self.files:
+                    self._watch_tree(relpath, changes)
+        self.log("%d path(s) changed, %d director(ies) updated." % (len(self.pending), len(changes)))
+        self.pending = set()
+        for directory, (count, size, mtime) in sorted(changes.items()):
+            if count or size or mtime is not None:
+                aggregates.update_directory(directory, count, size, mtime)
+        generation.bump()
+
+    def run(self):
+        """Watches the trash until interrupted"""
+        self.rescan()
+        last_rescan = time.time()
+        first_event = last_event = None
+        try:
+            while True:
+                if self.pending or self.overflowed:
+                    timeout = self.debounce
+                elif self.rescan_interval:
+                    timeout = max(0, last_rescan + self.rescan_interval - time.time())
+                else:
+                    timeout = None
+                events = self.inotify.read_events(timeout)
+                now = time.time()
+                for event in events:
+                    self.handle(event)
+                if events:
+                    last_event = now
+                    first_event = first_event or now
+                if (self.pending or self.overflowed) and \
+                        (now - last_event >= self.debounce or now - first_event >= self.max_delay):
+                    if self.overflowed:
+                        last_rescan = now
+                    self.update()
+                    first_event = None
+                if self.rescan_interval and now - last_rescan >= self.rescan_interval:
+                    self.rescan()
+                    last_rescan = time.time()
+                    first_event = None
+        finally:
+            self.close()
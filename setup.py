@@ -6,6 +6,7 @@ setup(
     packages=['media_trash',
               'media_trash.management',
               'media_trash.management.commands',
+              'media_trash.migrations',
               'media_trash.templatetags'],
     url='https://github.com/alexsilva/django-media-trash',
     license='MIT',
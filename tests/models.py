@@ -0,0 +1,21 @@
+import os
+
+from django.conf import settings
+from django.db import models
+
+
+class MediaQuerySet(models.QuerySet):
+
+    def trash(self):
+        return self
+
+
+class TrashedMedia(models.Model):
+    """Trash model of the tests: every row is a media file waiting to be collected"""
+    relpath = models.TextField()
+
+    objects = MediaQuerySet.as_manager()
+
+    @property
+    def path(self):
+        return os.path.join(settings.MEDIA_ROOT, self.relpath)
@@ -0,0 +1,46 @@
+# Django settings of the tests: python -m django test --settings=tests.settings
+import atexit
+import os
+import shutil
+import tempfile
+
+ROOT = tempfile.mkdtemp(prefix='media-trash-tests-')
+atexit.register(shutil.rmtree, ROOT, True)
+
+SECRET_KEY = 'tests'
+INSTALLED_APPS = [
+    'django.contrib.auth',
+    'django.contrib.contenttypes',
+    'django.contrib.sessions',
+    'django.contrib.messages',
+    'django.contrib.staticfiles',
+    'media_trash',
+    'tests',
+]
+MIDDLEWARE = [
+    'django.contrib.sessions.middleware.SessionMiddleware',
+    'django.middleware.csrf.CsrfViewMiddleware',
+    'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'django.contrib.messages.middleware.MessageMiddleware',
+]
+DATABASES = {
+    'default': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': ':memory:',
+    }
+}
+TEMPLATES = [{
+    'BACKEND': 'django.template.backends.django.DjangoTemplates',
+    'APP_DIRS': True,
+    'OPTIONS': {
+        'context_processors': ['django.contrib.messages.context_processors.messages'],
+    },
+}]
+ROOT_URLCONF = 'media_trash.urls'
+STATIC_URL = '/static/'
+MEDIA_URL = '/media/'
+MEDIA_ROOT = os.path.join(ROOT, 'media')
+
+MEDIA_TRASH_PATH = os.path.join(ROOT, 'trash')
+MEDIA_TRASH_RECOVER_DIR = os.path.join(ROOT, 'recover')
+MEDIA_TRASH_MODEL = 'tests.TrashedMedia'
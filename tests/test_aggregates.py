@@ -0,0 +1,85 @@
+# coding: utf-8
+import os
+import shutil
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.test import TestCase, override_settings
+from django.utils.six import StringIO
+
+from media_trash import aggregates
+from media_trash.models import TrashDirectory
+from media_trash.storage import FileSystemStorage, get_storage
+
+from .models import TrashedMedia
+
+
+class RemoteStorage(FileSystemStorage):
+    """A trash storage without local paths"""
+
+    def path(self, name):
+        raise NotImplementedError("This backend doesn't support absolute paths.")
+
+
+class AggregatesTest(TestCase):
+
+    def setUp(self):
+        for path in (settings.MEDIA_ROOT, settings.MEDIA_TRASH_PATH):
+            shutil.rmtree(path, ignore_errors=True)
+            os.makedirs(path)
+        cache.clear()
+
+    def write(self, root, relpath, data=b'data'):
+        path = os.path.join(root, relpath)
+        if not os.path.isdir(os.path.dirname(path)):
+            os.makedirs(os.path.dirname(path))
+        with open(path, 'wb') as f:
+            f.write(data)
+
+    def test_page_does_not_build(self):
+        self.write(settings.MEDIA_TRASH_PATH, 'a/doc.txt')
+        self.client.force_login(User.objects.create_superuser('admin', 'admin@example.com', 'admin'))
+        response = self.client.get('/')
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'unknown')
+        self.assertFalse(TrashDirectory.objects.exists())
+        self.assertIsNone(aggregates.get_aggregate('a'))
+
+    def test_collect_builds(self):
+        self.write(settings.MEDIA_ROOT, 'a/doc.txt')
+        TrashedMedia.objects.create(relpath='a/doc.txt')
+        call_command('media_trash_collect')
+        self.assertTrue(aggregates.is_built())
+        self.assertEqual(aggregates.get_aggregate('a')[:2], (1, 4))
+
+    def test_deep_paths(self):
+        relpath = '/'.join(['directory-%02d' % i for i in range(30)])
+        self.assertGreater(len(relpath), 255)
+        self.write(settings.MEDIA_TRASH_PATH, relpath + '/doc.txt')
+        aggregates.rebuild('', get_storage())
+        self.assertEqual(aggregates.get_aggregate(relpath)[:2], (1, 4))
+
+        aggregates.add(relpath + '/new.txt', 3, None)
+        self.assertEqual(aggregates.get_aggregate(relpath)[:2], (2, 7))
+        self.assertEqual(aggregates.get_aggregate('')[:2], (2, 7))
+        aggregates.forget_tree(relpath)
+        self.assertIsNone(aggregates.get_aggregate(relpath))
+        self.assertEqual(aggregates.get_aggregate('')[:2], (0, 0))
+
+    def test_compact(self):
+        """Compaction keeps the aggregates (stored sizes) in step, the page labels them as such"""
+        self.write(settings.MEDIA_TRASH_PATH, 'a/doc.txt', b'quarterly report\n' * 1000)
+        aggregates.rebuild('', get_storage())
+        call_command('media_trash_compact', stdout=StringIO())
+        stored = os.path.getsize(os.path.join(settings.MEDIA_TRASH_PATH, 'a', 'doc.txt.mtz.gz'))
+        self.assertEqual(aggregates.get_aggregate('a')[:2], (1, stored))
+
+        self.client.force_login(User.objects.create_superuser('admin', 'admin@example.com', 'admin'))
+        self.assertContains(self.client.get('/'), ' stored</span>')
+
+    @override_settings(MEDIA_TRASH_STORAGE='tests.test_aggregates.RemoteStorage')
+    def test_compact_requires_local_paths(self):
+        with self.assertRaises(CommandError):
+            call_command('media_trash_compact', stdout=StringIO())
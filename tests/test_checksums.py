@@ -0,0 +1,85 @@
+# coding: utf-8
+import gzip
+import os
+import shutil
+
+from django.conf import settings
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+
+from media_trash import checksums
+from media_trash.compression import compress_file
+from media_trash.models import TrashChecksum
+
+from .models import TrashedMedia
+
+
+@override_settings(MEDIA_TRASH_CHECKSUM=True, MEDIA_TRASH_CHECKSUM_WORKERS=2)
+class ScrubberTest(TestCase):
+
+    def setUp(self):
+        for path in (settings.MEDIA_ROOT, settings.MEDIA_TRASH_PATH):
+            shutil.rmtree(path, ignore_errors=True)
+            os.makedirs(path)
+
+    def trash(self, relpath, data):
+        path = os.path.join(settings.MEDIA_ROOT, relpath)
+        if not os.path.isdir(os.path.dirname(path)):
+            os.makedirs(os.path.dirname(path))
+        with open(path, 'wb') as f:
+            f.write(data)
+        TrashedMedia.objects.create(relpath=relpath)
+
+    def scrub(self, **kwargs):
+        scrubber = checksums.Scrubber(settings.MEDIA_TRASH_PATH)
+        return sorted((relpath, status) for relpath, status, detail in scrubber.scrub(**kwargs))
+
+    def test_archives_are_hashed_as_stored(self):
+        """Trashed .gz files are not decompressed, valid or not"""
+        path = os.path.join(settings.MEDIA_ROOT, 'backup.sql.gz')
+        archive = gzip.GzipFile(path, 'wb')
+        archive.write(b'select 1;' * 100)
+        archive.close()
+        TrashedMedia.objects.create(relpath='backup.sql.gz')
+        self.trash('broken.gz', b'not a gzip stream')
+        call_command('media_trash_collect')
+        self.assertEqual(sorted(TrashChecksum.objects.values_list('path', 'size')),
+                         [('backup.sql.gz', os.path.getsize(os.path.join(settings.MEDIA_TRASH_PATH, 'backup.sql.gz'))),
+                          ('broken.gz', 17)])
+
+        self.assertEqual(self.scrub(), [('backup.sql.gz', checksums.OK), ('broken.gz', checksums.OK)])
+        self.assertEqual(self.scrub(), [])
+
+    def test_compressed_files_keep_their_checksum(self):
+        self.trash('a/report.txt', b'quarterly report\n' * 1000)
+        call_command('media_trash_collect')
+        compress_file(os.path.join(settings.MEDIA_TRASH_PATH, 'a', 'report.txt'))
+
+        self.assertEqual(self.scrub(), [('a/report.txt', checksums.OK)])
+
+    def test_corrupt_and_missing(self):
+        self.trash('a.txt', b'a' * 100)
+        self.trash('b.txt', b'b' * 100)
+        call_command('media_trash_collect')
+        self.scrub()
+        with open(os.path.join(settings.MEDIA_TRASH_PATH, 'a.txt'), 'r+b') as f:
+            f.write(b'x')
+        os.utime(os.path.join(settings.MEDIA_TRASH_PATH, 'a.txt'), (0, 0))
+        os.remove(os.path.join(settings.MEDIA_TRASH_PATH, 'b.txt'))
+
+        self.assertEqual(self.scrub(prune=True), [('a.txt', checksums.CORRUPT), ('b.txt', checksums.MISSING)])
+        self.assertEqual(self.scrub(), [('a.txt', checksums.CORRUPT)])
+
+    def test_deep_paths(self):
+        """Checksums of paths longer than 255 characters are recorded, verified and pruned"""
+        relpath = '/'.join(['directory-%02d' % i for i in range(30)]) + '/deep.txt'
+        self.assertGreater(len(relpath), 255)
+        self.trash(relpath, b'deep')
+        call_command('media_trash_collect')
+        self.assertEqual(list(TrashChecksum.objects.values_list('path', flat=True)), [relpath])
+        os.utime(os.path.join(settings.MEDIA_TRASH_PATH, relpath), (0, 0))
+
+        self.assertEqual(self.scrub(), [(relpath, checksums.OK)])
+        os.remove(os.path.join(settings.MEDIA_TRASH_PATH, relpath))
+        self.assertEqual(self.scrub(prune=True), [(relpath, checksums.MISSING)])
+        self.assertFalse(TrashChecksum.objects.exists())
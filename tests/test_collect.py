@@ -0,0 +1,100 @@
+# coding: utf-8
+import errno
+import os
+import shutil
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.management import CommandError, call_command
+from django.test import TestCase
+from django.utils.six import StringIO
+
+from media_trash import signals
+from media_trash.management.commands import media_trash_collect
+
+from .models import TrashedMedia
+
+
+@contextmanager
+def failing_listing(directory, code):
+    """Listing directory fails with the errno code"""
+    def wrap(func):
+        def listing(path):
+            if os.path.normpath(path) == directory:
+                raise OSError(code, os.strerror(code), path)
+            return func(path)
+        return listing
+    listdir, scandir = os.listdir, media_trash_collect.scandir
+    os.listdir = wrap(listdir)
+    if scandir is not None:
+        media_trash_collect.scandir = wrap(scandir)
+    try:
+        yield
+    finally:
+        os.listdir = listdir
+        media_trash_collect.scandir = scandir
+
+
+class CollectTest(TestCase):
+
+    def setUp(self):
+        for path in (settings.MEDIA_ROOT, settings.MEDIA_TRASH_PATH):
+            shutil.rmtree(path, ignore_errors=True)
+            os.makedirs(path)
+        self.summaries = []
+        signals.trash_collected.connect(self.receiver)
+        self.addCleanup(signals.trash_collected.disconnect, self.receiver)
+
+    def receiver(self, **kwargs):
+        self.summaries.append(kwargs)
+
+    def trash(self, relpath):
+        path = os.path.join(settings.MEDIA_ROOT, relpath)
+        if not os.path.isdir(os.path.dirname(path)):
+            os.makedirs(os.path.dirname(path))
+        with open(path, 'wb') as f:
+            f.write(relpath.encode('utf-8'))
+        return TrashedMedia.objects.create(relpath=relpath)
+
+    def test_missing_sources(self):
+        self.trash('a/1.txt')
+        TrashedMedia.objects.create(relpath='a/gone.txt')
+        TrashedMedia.objects.create(relpath='nodir/gone.txt')
+        call_command('media_trash_collect')
+        self.assertFalse(TrashedMedia.objects.exists())
+        self.assertEqual((self.summaries[0]['files'], self.summaries[0]['skipped'], self.summaries[0]['deferred']),
+                         (1, 2, 0))
+
+    def test_unreadable_directory(self):
+        """Rows of a directory that cannot be listed are left for the next run"""
+        self.trash('a/1.txt')
+        kept = [self.trash('b/2.txt').pk, TrashedMedia.objects.create(relpath='b/gone.txt').pk]
+        stderr = StringIO()
+        with failing_listing(os.path.join(settings.MEDIA_ROOT, 'b'), errno.EIO):
+            call_command('media_trash_collect', stderr=stderr)
+        self.assertEqual(sorted(TrashedMedia.objects.values_list('pk', flat=True)), kept)
+        self.assertEqual((self.summaries[0]['files'], self.summaries[0]['skipped'], self.summaries[0]['deferred']),
+                         (1, 0, 2))
+        self.assertIn('left for the next run', stderr.getvalue())
+
+        call_command('media_trash_collect')
+        self.assertFalse(TrashedMedia.objects.exists())
+        self.assertTrue(os.path.isfile(os.path.join(settings.MEDIA_TRASH_PATH, 'b', '2.txt')))
+
+    def test_shards(self):
+        """The shards of a count split the rows by pk, together they collect them all"""
+        rows = [self.trash('s/%d.txt' % i) for i in range(5)]
+        call_command('media_trash_collect', shard='1/2')
+        self.assertEqual(sorted(TrashedMedia.objects.values_list('pk', flat=True)),
+                         [row.pk for row in rows if row.pk % 2 == 0])
+        self.assertEqual(sorted(os.listdir(os.path.join(settings.MEDIA_TRASH_PATH, 's'))),
+                         sorted('%d.txt' % i for i, row in enumerate(rows) if row.pk % 2 == 1))
+
+        call_command('media_trash_collect', shard='0/2')
+        self.assertFalse(TrashedMedia.objects.exists())
+        self.assertEqual(len(os.listdir(os.path.join(settings.MEDIA_TRASH_PATH, 's'))), 5)
+
+    def test_invalid_shard(self):
+        for value in ('2/2', '1', 'a/b'):
+            with self.assertRaises(CommandError):
+                call_command('media_trash_collect', shard=value)
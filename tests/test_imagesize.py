@@ -0,0 +1,79 @@
+# coding: utf-8
+from django.test import SimpleTestCase
+from django.utils.six import BytesIO
+from PIL import Image
+
+from media_trash import imagesize
+
+
+def encode(format, size=(37, 21), mode='RGB', **params):
+    f = BytesIO()
+    Image.new(mode, size, 'red').save(f, format, **params)
+    return f.getvalue()
+
+
+class ProbeTest(SimpleTestCase):
+
+    def probe(self, data):
+        return imagesize.probe(BytesIO(data))
+
+    def assertProbedLikePil(self, data):
+        self.assertEqual(self.probe(data), Image.open(BytesIO(data)).size)
+
+    def test_jpeg(self):
+        self.assertProbedLikePil(encode('JPEG'))
+        self.assertEqual(self.probe(encode('JPEG')), (37, 21))
+
+    def test_progressive_jpeg(self):
+        data = encode('JPEG', progressive=True)
+        self.assertIn(b'\xff\xc2', data)  # SOF2
+        self.assertProbedLikePil(data)
+
+    def test_jpeg_with_exif(self):
+        """APPn segments before the frame are skipped, also when longer than a read chunk"""
+        exif = b'Exif\x00\x00' + b'\x00' * (imagesize.CHUNK_SIZE * 2)
+        data = encode('JPEG', size=(640, 480), exif=exif)
+        self.assertIn(b'\xff\xe1', data[:4 + imagesize.HEADER_SIZE])  # APP1 first
+        self.assertProbedLikePil(data)
+
+    def test_jpeg_fill_bytes(self):
+        data = encode('JPEG')
+        data = data[:2] + b'\xff\xff' + data[2:]
+        self.assertEqual(self.probe(data), (37, 21))
+
+    def test_png(self):
+        self.assertProbedLikePil(encode('PNG', size=(300, 7), mode='RGBA'))
+
+    def test_gif(self):
+        self.assertProbedLikePil(encode('GIF', size=(5, 400), mode='P'))
+
+    def test_truncated(self):
+        data = encode('JPEG', exif=b'Exif\x00\x00' + b'\x00' * 1000)
+        self.assertIsNone(self.probe(data[:data.index(b'\xff\xc0')]))  # before the frame header
+        self.assertIsNone(self.probe(data[:data.index(b'\xff\xc0') + 5]))  # inside it
+        self.assertIsNone(self.probe(data[:500]))  # inside a segment
+        self.assertIsNone(self.probe(encode('PNG')[:10]))
+        self.assertIsNone(self.probe(b''))
+
+    def test_other_formats(self):
+        """Other formats are read by PIL"""
+        self.assertProbedLikePil(encode('BMP', size=(12, 34)))
+        self.assertProbedLikePil(encode('TIFF', size=(56, 78)))
+        self.assertIsNone(self.probe(b'not an image at all, just some text'))
+
+
+class GetDimensionsTest(SimpleTestCase):
+
+    def test_cached(self):
+        data = encode('PNG', size=(3, 4))
+        opened = []
+
+        def opener():
+            opened.append(True)
+            return BytesIO(data)
+
+        for i in range(2):
+            self.assertEqual(imagesize.get_dimensions('test-imagesize.png', len(data), 1.0, opener), (3, 4))
+        self.assertEqual(len(opened), 1)
+        self.assertEqual(imagesize.get_dimensions('test-imagesize.png', len(data), 2.0, opener), (3, 4))
+        self.assertEqual(len(opened), 2)
@@ -0,0 +1,28 @@
+# coding: utf-8
+import os
+import subprocess
+import sys
+
+from django.test import SimpleTestCase
+
+SCRIPT = """
+import sys
+import django
+django.setup()
+# django.core.validators imports PIL itself: forget it, any import of it below shows
+for name in [name for name in sys.modules if name == 'PIL' or name.startswith('PIL.')]:
+    del sys.modules[name]
+import media_trash.urls
+import media_trash.management.commands.media_trash_collect
+sys.stdout.write('%s\\n' % sorted(name for name in sys.modules if name == 'PIL' or name.startswith('PIL.')))
+"""
+
+
+class ImportTest(SimpleTestCase):
+
+    def test_no_pil_at_import_time(self):
+        """The URLconf and collect leave PIL to the first use of an image"""
+        env = dict(os.environ, DJANGO_SETTINGS_MODULE='tests.settings',
+                   PYTHONPATH=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+        output = subprocess.check_output([sys.executable, '-c', SCRIPT], env=env)
+        self.assertEqual(output.decode('ascii').strip(), '[]')
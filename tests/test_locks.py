@@ -0,0 +1,123 @@
+# coding: utf-8
+import os
+import shutil
+import subprocess
+import sys
+from unittest import skipIf
+
+from django.conf import settings
+from django.core.management import CommandError, call_command
+from django.test import SimpleTestCase, TestCase
+from django.utils.six import StringIO
+
+from media_trash import aggregates, locks
+
+from .models import TrashedMedia
+
+# Holds the locks of a collect run (shard "i/n" or "" for a full run) until
+# its stdin is closed. fcntl locks are per process: the other run must be one.
+HOLDER = """
+import sys
+from django.conf import settings
+settings.configure(MEDIA_TRASH_PATH=sys.argv[1])
+from media_trash.locks import LockError, collect_locks
+shard = tuple(int(v) for v in sys.argv[2].split('/')) if sys.argv[2] else None
+held = collect_locks(shard)
+try:
+    for lock in held:
+        lock.acquire()
+except LockError:
+    sys.stdout.write('busy\\n')
+else:
+    sys.stdout.write('locked\\n')
+sys.stdout.flush()
+sys.stdin.read()
+"""
+
+
+class LockHolderMixin(object):
+
+    def hold(self, shard=''):
+        """Takes the locks of a run in another process: 'locked' or 'busy'"""
+        env = dict(os.environ, PYTHONPATH=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+        env.pop('DJANGO_SETTINGS_MODULE', None)
+        process = subprocess.Popen([sys.executable, '-c', HOLDER, settings.MEDIA_TRASH_PATH, shard],
+                                   stdin=subprocess.PIPE, stdout=subprocess.PIPE, env=env)
+        self.addCleanup(process.wait)
+        self.addCleanup(process.stdin.close)
+        return process.stdout.readline().decode('ascii').strip()
+
+
+@skipIf(locks.fcntl is None, "requires fcntl")
+class CollectLocksTest(LockHolderMixin, SimpleTestCase):
+
+    def acquire(self, shard=None):
+        """Takes the locks of a run in this process: True, or False if another run holds them"""
+        run_locks = locks.collect_locks(shard)
+        try:
+            for lock in run_locks:
+                lock.acquire()
+        except locks.LockError:
+            for lock in run_locks:
+                lock.release()
+            return False
+        for lock in reversed(run_locks):
+            self.addCleanup(lock.release)
+        return True
+
+    def test_full_run_excludes_everything(self):
+        self.assertEqual(self.hold(), 'locked')
+        self.assertFalse(self.acquire())
+        self.assertFalse(self.acquire((0, 2)))
+
+    def test_shards_of_one_count(self):
+        self.assertEqual(self.hold('0/2'), 'locked')
+        self.assertTrue(self.acquire((1, 2)))
+        self.assertEqual(self.hold('2/3'), 'busy')
+
+    def test_same_shard(self):
+        self.assertEqual(self.hold('0/2'), 'locked')
+        self.assertFalse(self.acquire((0, 2)))
+        self.assertFalse(self.acquire())
+
+    def test_shards_of_another_count(self):
+        """pk % 4 == 0 rows are also pk % 2 == 0 rows: a run of 0/4 must not start along 0/2"""
+        self.assertEqual(self.hold('0/2'), 'locked')
+        self.assertFalse(self.acquire((0, 4)))
+        self.assertEqual(self.hold('1/2'), 'locked')
+
+    def test_count_of_finished_shards(self):
+        """The count recorded by shards that have finished does not hold back other counts"""
+        self.assertTrue(self.acquire((0, 2)))
+        self.doCleanups()
+        self.assertEqual(self.hold('0/4'), 'locked')
+
+
+@skipIf(locks.fcntl is None, "requires fcntl")
+class ShardAggregatesTest(LockHolderMixin, TestCase):
+
+    def setUp(self):
+        for path in (settings.MEDIA_ROOT, settings.MEDIA_TRASH_PATH):
+            shutil.rmtree(path, ignore_errors=True)
+            os.makedirs(path)
+        for relpath in ('1.txt', '2.txt'):
+            with open(os.path.join(settings.MEDIA_ROOT, relpath), 'wb') as f:
+                f.write(b'data')
+            TrashedMedia.objects.create(relpath=relpath)
+
+    def test_last_shard_builds(self):
+        """The aggregates are built under the exclusive lock, by the last shard to finish"""
+        self.assertEqual(self.hold('1/2'), 'locked')
+        call_command('media_trash_collect', shard='0/2')
+        self.assertFalse(aggregates.is_built())
+        self.doCleanups()
+
+        call_command('media_trash_collect', shard='1/2')
+        self.assertTrue(aggregates.is_built())
+        self.assertEqual(aggregates.get_aggregate('')[:2], (2, 8))
+
+    def test_aggregates_command_waits_for_collect(self):
+        self.assertEqual(self.hold('0/2'), 'locked')
+        with self.assertRaises(CommandError):
+            call_command('media_trash_aggregates', stdout=StringIO())
+        self.assertFalse(aggregates.is_built())
@@ -0,0 +1,118 @@
+# coding: utf-8
+import gzip
+import os
+import shutil
+
+from django.conf import settings
+from django.core.management import call_command
+from django.test import TestCase
+
+from media_trash.compression import compress_file
+from media_trash.models import TrashItem
+from media_trash.restore import Restorer
+from media_trash.storage import get_storage
+
+from .models import TrashedMedia
+
+
+class RestorerTest(TestCase):
+
+    def setUp(self):
+        for path in (settings.MEDIA_ROOT, settings.MEDIA_TRASH_PATH, settings.MEDIA_TRASH_RECOVER_DIR):
+            shutil.rmtree(path, ignore_errors=True)
+            os.makedirs(path)
+
+    def trash(self, relpath, data):
+        path = os.path.join(settings.MEDIA_ROOT, relpath)
+        if not os.path.isdir(os.path.dirname(path)):
+            os.makedirs(os.path.dirname(path))
+        with open(path, 'wb') as f:
+            f.write(data)
+        TrashedMedia.objects.create(relpath=relpath)
+        return path
+
+    def read(self, path):
+        with open(path, 'rb') as f:
+            return f.read()
+
+    def test_restore_trashed_archive(self):
+        """A .gz trashed by a user is restored as it is, to its own origin"""
+        path = os.path.join(settings.MEDIA_ROOT, 'a', 'backup.sql.gz')
+        os.makedirs(os.path.dirname(path))
+        archive = gzip.GzipFile(path, 'wb')
+        archive.write(b'select 1;' * 100)
+        archive.close()
+        data = self.read(path)
+        TrashedMedia.objects.create(relpath='a/backup.sql.gz')
+        call_command('media_trash_collect')
+        self.assertEqual(list(TrashItem.objects.values_list('path', flat=True)), ['a/backup.sql.gz'])
+
+        results = Restorer(get_storage()).restore(['a/backup.sql.gz'])
+
+        self.assertEqual(results, [('a/backup.sql.gz', path, None)])
+        self.assertEqual(self.read(path), data)
+        self.assertFalse(os.path.exists(os.path.join(settings.MEDIA_ROOT, 'a', 'backup.sql')))
+        self.assertFalse(TrashItem.objects.exists())
+
+    def test_restore_compressed(self):
+        """A file compressed in the trash is restored decompressed, to its origin"""
+        path = self.trash('a/report.txt', b'quarterly report\n' * 1000)
+        call_command('media_trash_collect')
+        compress_file(os.path.join(settings.MEDIA_TRASH_PATH, 'a', 'report.txt'))
+
+        results = Restorer(get_storage()).restore(['a/report.txt.mtz.gz'])
+
+        self.assertEqual(results, [('a/report.txt.mtz.gz', path, None)])
+        self.assertEqual(self.read(path), b'quarterly report\n' * 1000)
+        self.assertFalse(TrashItem.objects.exists())
+        self.assertEqual(os.listdir(os.path.join(settings.MEDIA_TRASH_PATH, 'a')), [])
+
+    def test_restore_without_origin(self):
+        """A file without an origin record goes under MEDIA_TRASH_RECOVER_DIR"""
+        os.makedirs(os.path.join(settings.MEDIA_TRASH_PATH, 'b'))
+        with open(os.path.join(settings.MEDIA_TRASH_PATH, 'b', 'notes.txt'), 'wb') as f:
+            f.write(b'notes')
+
+        results = Restorer(get_storage()).restore(['b/notes.txt', 'b/missing.txt'])
+
+        dst = os.path.join(settings.MEDIA_TRASH_RECOVER_DIR, 'b', 'notes.txt')
+        self.assertEqual(results[0], ('b/notes.txt', dst, None))
+        self.assertEqual(self.read(dst), b'notes')
+        self.assertIsNone(results[1][1])
+
+    def test_restore_deep_path(self):
+        """Origins of paths longer than 255 characters are recorded and restored"""
+        relpath = '/'.join(['directory-%02d' % i for i in range(30)]) + '/deep.txt'
+        self.assertGreater(len(relpath), 255)
+        path = self.trash(relpath, b'deep')
+        call_command('media_trash_collect')
+        self.assertEqual(list(TrashItem.objects.values_list('path', flat=True)), [relpath])
+
+        results = Restorer(get_storage()).restore([relpath])
+
+        self.assertEqual(results, [(relpath, path, None)])
+        self.assertEqual(self.read(path), b'deep')
+        self.assertFalse(TrashItem.objects.exists())
+
+    def test_restore_onto_existing(self):
+        """A taken origin is left alone, the file is restored beside it with a timestamp suffix"""
+        plain = self.trash('a/notes.txt', b'trashed notes')
+        compressed = self.trash('a/report.txt', b'quarterly report\n' * 1000)
+        call_command('media_trash_collect')
+        compress_file(os.path.join(settings.MEDIA_TRASH_PATH, 'a', 'report.txt'))
+        os.makedirs(os.path.dirname(plain))  # removed by the collect once empty
+        for path in (plain, compressed):
+            with open(path, 'wb') as f:
+                f.write(b'new upload')
+
+        results = Restorer(get_storage()).restore(['a/notes.txt', 'a/report.txt.mtz.gz'])
+
+        for (relpath, dst, exc), path, data in zip(results, (plain, compressed),
+                                                    (b'trashed notes', b'quarterly report\n' * 1000)):
+            self.assertIsNone(exc)
+            self.assertNotEqual(dst, path)
+            self.assertTrue(os.path.basename(dst).startswith(os.path.splitext(os.path.basename(path))[0] + '-'))
+            self.assertEqual(self.read(dst), data)
+            self.assertEqual(self.read(path), b'new upload')
+        self.assertEqual(sorted(f for f in os.listdir(os.path.dirname(plain)) if f.startswith('.')), [])
+        self.assertFalse(TrashItem.objects.exists())
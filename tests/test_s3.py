@@ -0,0 +1,135 @@
+# coding: utf-8
+import os
+import threading
+from unittest import skipIf
+
+from django.conf import settings
+from django.test import SimpleTestCase, override_settings
+
+try:
+    import boto3
+    try:
+        from moto import mock_aws as mock_s3
+    except ImportError:
+        from moto import mock_s3
+    try:
+        from unittest import mock
+    except ImportError:
+        import mock
+    from media_trash import s3
+except ImportError:
+    s3 = None
+
+BUCKET = 'media-trash'
+
+
+@skipIf(s3 is None, "requires boto3, django-storages and moto")
+class S3StorageTest(SimpleTestCase):
+
+    def setUp(self):
+        for name, value in [('AWS_ACCESS_KEY_ID', 'testing'), ('AWS_SECRET_ACCESS_KEY', 'testing'),
+                            ('AWS_DEFAULT_REGION', 'us-east-1')]:
+            patcher = mock.patch.dict(os.environ, {name: value})
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        aws = mock_s3()
+        aws.start()
+        self.addCleanup(aws.stop)
+        boto3.client('s3').create_bucket(Bucket=BUCKET)
+        self.storage = s3.S3Storage(bucket_name=BUCKET, location='trash')
+
+    def name(self, relpath):
+        return os.path.join(settings.MEDIA_TRASH_PATH, relpath)
+
+    def put(self, *relpaths):
+        for relpath in relpaths:
+            self.storage.client.put_object(Bucket=BUCKET, Key='trash/' + relpath, Body=relpath.encode('utf-8'))
+
+    def keys(self):
+        response = self.storage.client.list_objects_v2(Bucket=BUCKET)
+        return sorted(item['Key'] for item in response.get('Contents', []))
+
+    def small_pages(self):
+        """Lists 2 keys per page"""
+        client = self.storage.client
+        get_paginator = client.get_paginator
+
+        def paginator(name):
+            result = get_paginator(name)
+            paginate = result.paginate
+            result.paginate = lambda **kwargs: paginate(PaginationConfig={'PageSize': 2}, **kwargs)
+            return result
+        patcher = mock.patch.object(client, 'get_paginator', paginator)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_delete_many_batches(self):
+        self.put('a/1', 'a/2', 'a/3', 'a/4', 'a/5', 'b/6')
+        calls = []
+        delete_objects = self.storage.client.delete_objects
+
+        def spy(**kwargs):
+            calls.append(len(kwargs['Delete']['Objects']))
+            return delete_objects(**kwargs)
+        with mock.patch.object(s3, 'DELETE_BATCH_SIZE', 2), \
+                mock.patch.object(self.storage.client, 'delete_objects', spy):
+            self.storage.delete_many([self.name('a/%d' % i) for i in range(1, 6)])
+        self.assertEqual(calls, [2, 2, 1])
+        self.assertEqual(self.keys(), ['trash/b/6'])
+
+    def test_rmtree(self):
+        self.put('a/1', 'a/b/2', 'a/b/c/3', 'ab/4')
+        self.small_pages()
+        self.storage.rmtree(self.name('a'))
+        self.assertEqual(self.keys(), ['trash/ab/4'])
+
+    def test_move(self):
+        self.put('a/1', 'b/2')
+        self.storage.move(self.name('a/1'), self.name('c/1'))
+        self.assertEqual(self.keys(), ['trash/b/2', 'trash/c/1'])
+        body = self.storage.client.get_object(Bucket=BUCKET, Key='trash/c/1')['Body'].read()
+        self.assertEqual(body, b'a/1')
+
+    def test_move_overwrite(self):
+        self.put('a/1', 'b/2')
+        with self.assertRaises(IOError):
+            self.storage.move(self.name('a/1'), self.name('b/2'))
+        self.assertEqual(self.keys(), ['trash/a/1', 'trash/b/2'])
+
+        self.storage.move(self.name('a/1'), self.name('b/2'), allow_overwrite=True)
+        self.assertEqual(self.keys(), ['trash/b/2'])
+        body = self.storage.client.get_object(Bucket=BUCKET, Key='trash/b/2')['Body'].read()
+        self.assertEqual(body, b'a/1')
+
+    def test_listdir_pagination(self):
+        self.put('d/x/1', 'd/y/2', 'd/z/3', 'd/1', 'd/2', 'd/3', 'd/4', 'e/5')
+        self.small_pages()
+        dirs, files = self.storage.listdir(self.name('d'))
+        self.assertEqual(sorted(dirs), ['x', 'y', 'z'])
+        self.assertEqual(sorted(files), ['1', '2', '3', '4'])
+        self.assertEqual(sorted(self.storage.listdir(settings.MEDIA_TRASH_PATH)[0]), ['d', 'e'])
+
+    def test_walk(self):
+        self.put('d/x/1', 'd/x/y/2', 'd/3')
+        self.small_pages()
+        self.assertEqual(sorted(self.storage.walk(self.name('d'))), [
+            ('3', False), ('x', True), (os.path.join('x', '1'), False), (os.path.join('x', 'y'), True),
+            (os.path.join('x', 'y', '2'), False)])
+
+    def test_isdir(self):
+        self.put('d/x/1')
+        self.assertTrue(self.storage.isdir(self.name('d')))
+        self.assertTrue(self.storage.isdir(self.name('d/x')))
+        self.assertFalse(self.storage.isdir(self.name('d/x/1')))
+        self.assertFalse(self.storage.isdir(self.name('e')))
+
+    def test_shared_client(self):
+        """One pooled client for every thread, sized for the concurrent walks"""
+        clients = []
+        thread = threading.Thread(target=lambda: clients.append(self.storage.client))
+        thread.start()
+        thread.join()
+        self.assertIs(clients[0], self.storage.client)
+        with override_settings(MEDIA_TRASH_WALK_CONCURRENCY=32):
+            storage = s3.S3Storage(bucket_name=BUCKET, location='trash')
+            self.assertEqual(storage.client.meta.config.max_pool_connections, 32)
@@ -0,0 +1,24 @@
+# coding: utf-8
+import warnings
+
+from django.test import SimpleTestCase, override_settings
+
+from media_trash.settings import trash_settings
+
+
+class SettingsTest(SimpleTestCase):
+
+    def test_lazy(self):
+        with override_settings(MEDIA_TRASH_URL='/bin/'):
+            self.assertEqual(trash_settings.MEDIA_TRASH_URL, '/bin/')
+        self.assertEqual(trash_settings.MEDIA_TRASH_URL, '/media/trash/')
+
+    def test_deprecated_module_names(self):
+        with warnings.catch_warnings(record=True) as caught:
+            warnings.simplefilter('always')
+            from media_trash.settings import MEDIA_TRASH_PATH, VERSIONS_BASEDIR
+        self.assertEqual(MEDIA_TRASH_PATH, trash_settings.MEDIA_TRASH_PATH)
+        self.assertEqual(VERSIONS_BASEDIR, '_versions')
+        self.assertEqual([w.category for w in caught], [DeprecationWarning] * 2)
+        with self.assertRaises(ImportError):
+            from media_trash.settings import UNKNOWN_SETTING  # noqa
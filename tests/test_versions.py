@@ -0,0 +1,100 @@
+# coding: utf-8
+import os
+import shutil
+import time
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils.six import StringIO
+from PIL import Image
+
+from media_trash.base import FileObject
+from media_trash.settings import trash_settings
+from media_trash.storage import get_storage
+
+
+@override_settings(FILEBROWSER_VERSION_NAMER='media_trash.namers.VersionNamer')
+class VersionsGcTest(TestCase):
+
+    def setUp(self):
+        shutil.rmtree(settings.MEDIA_TRASH_PATH, ignore_errors=True)
+        now = time.time()
+        self.write('c/photo.jpg', now)
+        self.write('_versions/c/photo_small.jpg', now + 100)  # fresh
+        self.write('_versions/c/photo_big.jpg', now - 1000)  # stale
+        self.write('_versions/c/gone_small.jpg', now)  # missing original
+        self.write('_versions/c/photo_renamed.jpg', now)  # unknown version suffix
+
+    def write(self, relpath, mtime):
+        path = os.path.join(settings.MEDIA_TRASH_PATH, relpath)
+        if not os.path.isdir(os.path.dirname(path)):
+            os.makedirs(os.path.dirname(path))
+        with open(path, 'wb') as f:
+            f.write(b'version')
+        os.utime(path, (mtime, mtime))
+
+    def versions(self):
+        return sorted(os.listdir(os.path.join(settings.MEDIA_TRASH_PATH, '_versions', 'c')))
+
+    def test_unknown_files_are_kept(self):
+        stdout = StringIO()
+        call_command('media_trash_versions_gc', stdout=stdout)
+        self.assertEqual(self.versions(), ['photo_renamed.jpg', 'photo_small.jpg'])
+        self.assertIn('1 file(s) not mapping to an original kept', stdout.getvalue())
+
+    def test_delete_unknown(self):
+        call_command('media_trash_versions_gc', delete_unknown=True, stdout=StringIO())
+        self.assertEqual(self.versions(), ['photo_small.jpg'])
+
+
+@override_settings(
+    FILEBROWSER_VERSION_NAMER='media_trash.namers.VersionNamer',
+    FILEBROWSER_VERSION_PROCESSORS=['media_trash.utils.scale_and_crop'],
+    FILEBROWSER_VERSION_FORMAT_OPTIONS={'webp': {'method': 4, 'quality': 80}},
+    FILEBROWSER_VERSIONS={
+        'small': {'width': 20, 'height': '', 'opts': '', 'format': 'webp', 'quality': 50},
+        'tuned': {'width': 20, 'height': '', 'opts': '', 'format': 'webp', 'format_options': {'method': 6}},
+        'x_small': {'width': 10, 'height': '', 'opts': '', 'format': 'jpeg'},
+        'thumbnail': {'width': 10, 'height': '', 'opts': '', 'format': 'JPG'},
+        'broken': {'width': 10, 'height': '', 'opts': '', 'format': 'jpeg2000x'},
+    })
+class VersionFormatTest(TestCase):
+
+    def setUp(self):
+        shutil.rmtree(settings.MEDIA_TRASH_PATH, ignore_errors=True)
+        os.makedirs(os.path.join(settings.MEDIA_TRASH_PATH, 'c'))
+        Image.new('RGB', (40, 40)).save(os.path.join(settings.MEDIA_TRASH_PATH, 'c', 'photo.jpeg'))
+        self.saved = []
+        save = Image.Image.save
+
+        def recording_save(im, fp, format=None, **params):
+            self.saved.append((format, params))
+            return save(im, fp, format=format, **params)
+        Image.Image.save = recording_save
+        self.addCleanup(setattr, Image.Image, 'save', save)
+        self.fileobject = FileObject('c/photo.jpeg', storage=get_storage())
+
+    def test_encoder_options(self):
+        """The options of the version win over its quality, which wins over the defaults of the format"""
+        self.fileobject.version_generate('small')
+        self.fileobject.version_generate('tuned')
+        self.assertEqual(self.saved, [('WEBP', {'method': 4, 'quality': 50}), ('WEBP', {'method': 6, 'quality': 80})])
+
+    def test_equivalent_extension(self):
+        """A .jpeg original of a jpeg version gets no format extension"""
+        self.assertEqual(self.fileobject.version_name('x_small'), 'photo_x_small.jpeg')
+        self.assertEqual(self.fileobject.version_name('small'), 'photo_small.jpeg.webp')
+
+    def test_jpg_format(self):
+        """'jpg' is the jpeg format"""
+        self.assertEqual(self.fileobject.version_name('thumbnail'), 'photo_thumbnail.jpeg')
+        self.fileobject.version_generate('thumbnail')
+        self.assertEqual(self.saved, [('JPEG', {'quality': trash_settings.VERSION_QUALITY})])
+
+    def test_unknown_format(self):
+        with self.assertRaises(ImproperlyConfigured):
+            self.fileobject.version_name('broken')
+        with self.assertRaises(ImproperlyConfigured):
+            self.fileobject.version_generate('broken')
@@ -0,0 +1,124 @@
+# coding: utf-8
+import json
+import os
+import shutil
+import zipfile
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase
+from django.utils.six import BytesIO
+
+from media_trash import generation
+from media_trash.views import content_disposition
+
+from .models import TrashedMedia
+
+
+class TrashViewsTest(TestCase):
+
+    def setUp(self):
+        shutil.rmtree(settings.MEDIA_TRASH_PATH, ignore_errors=True)
+        os.makedirs(os.path.join(settings.MEDIA_TRASH_PATH, 'a'))
+        self.path = os.path.join(settings.MEDIA_TRASH_PATH, 'a', 'doc.txt')
+        with open(self.path, 'wb') as f:
+            f.write(b'doc')
+        self.client.force_login(User.objects.create_superuser('admin', 'admin@example.com', 'admin'))
+
+    def test_api_is_read_only(self):
+        response = self.client.get('/api/', {'fields': 'relpath'})
+        self.assertEqual([json.loads(line) for line in b''.join(response.streaming_content).splitlines()],
+                         [{'relpath': 'a'}, {'relpath': 'a/doc.txt'}])
+
+        response = self.client.post('/api/', {'relpath': 'a/doc.txt'})
+        self.assertEqual(response.status_code, 405)
+        self.assertTrue(os.path.isfile(self.path))
+
+    def test_export_is_read_only(self):
+        response = self.client.get('/export/', {'relpath': 'a'})
+        archive = zipfile.ZipFile(BytesIO(b''.join(response.streaming_content)))
+        self.assertEqual(archive.read('a/doc.txt'), b'doc')
+
+        response = self.client.post('/export/', {'relpath': 'a/doc.txt'})
+        self.assertEqual(response.status_code, 405)
+        self.assertTrue(os.path.isfile(self.path))
+
+    def test_export_filename(self):
+        """Quotes and non-ASCII characters of the archive name are escaped"""
+        os.rename(os.path.join(settings.MEDIA_TRASH_PATH, 'a'),
+                  os.path.join(settings.MEDIA_TRASH_PATH, u'r\xe9sum\xe9 "2019"'.encode('utf-8')))
+        response = self.client.get('/export/', {'relpath': u'r\xe9sum\xe9 "2019"'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Disposition'],
+                         'attachment; filename="resume \\"2019\\".zip"; '
+                         'filename*=UTF-8\'\'r%C3%A9sum%C3%A9%20%222019%22.zip')
+
+
+class ContentDispositionTest(SimpleTestCase):
+
+    def test_control_characters(self):
+        self.assertEqual(content_disposition('inline', u'a\r\nb.txt'),
+                         'inline; filename="a__b.txt"; filename*=UTF-8\'\'a%0D%0Ab.txt')
+
+    def test_non_latin(self):
+        self.assertEqual(content_disposition('inline', u'\u6587\u66f8.txt'),
+                         'inline; filename=".txt"; filename*=UTF-8\'\'%E6%96%87%E6%9B%B8.txt')
+
+
+class ConditionalGetTest(TestCase):
+
+    def setUp(self):
+        for path in (settings.MEDIA_ROOT, settings.MEDIA_TRASH_PATH):
+            shutil.rmtree(path, ignore_errors=True)
+            os.makedirs(path)
+        self.write(os.path.join(settings.MEDIA_TRASH_PATH, 'doc.txt'), b'doc')
+        cache.clear()
+        self.client.force_login(User.objects.create_superuser('admin', 'admin@example.com', 'admin'))
+
+    def write(self, path, data):
+        with open(path, 'wb') as f:
+            f.write(data)
+
+    def get(self, etag=None):
+        return self.client.get('/', HTTP_IF_NONE_MATCH=etag) if etag else self.client.get('/')
+
+    def test_not_modified(self):
+        etag = self.get()['ETag']
+        response = self.get(etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b'')
+
+    def test_restore_changes_etag(self):
+        etag = self.get()['ETag']
+        self.client.post('/', {'relpath': 'doc.txt'})
+        response = self.get()  # shows the message of the restore: not cacheable
+        self.assertNotIn('ETag', response)
+        response = self.get(etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_collect_changes_etag(self):
+        etag = self.get()['ETag']
+        self.write(os.path.join(settings.MEDIA_ROOT, 'new.txt'), b'new')
+        TrashedMedia.objects.create(relpath='new.txt')
+        call_command('media_trash_collect')
+        response = self.get(etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'new.txt')
+
+    def test_rotated_csrf_token_changes_etag(self):
+        """A cached page must not hold a CSRF token rotated since (by a login)"""
+        etag = self.get()['ETag']
+        self.client.cookies[settings.CSRF_COOKIE_NAME] = 'x' * 64
+        response = self.get(etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_rows_cached_per_generation(self):
+        self.get()
+        self.write(os.path.join(settings.MEDIA_TRASH_PATH, 'unseen.txt'), b'unseen')
+        self.assertNotContains(self.get(), 'unseen.txt')  # changed behind the back of the app
+        generation.bump()
+        self.assertContains(self.get(), 'unseen.txt')
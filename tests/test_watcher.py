@@ -0,0 +1,135 @@
+# coding: utf-8
+import os
+import shutil
+import threading
+from unittest import skipUnless
+
+from django.conf import settings
+from django.test import TestCase
+
+from media_trash import aggregates
+from media_trash.storage import get_storage
+from media_trash.watcher import TrashWatcher
+
+try:
+    from media_trash.inotify import Inotify
+    Inotify().close()
+except OSError:
+    Inotify = None
+
+
+class Stop(Exception):
+    pass
+
+
+class BurstWatcher(TrashWatcher):
+    """Records the changed paths of every update, stops run() after the first one"""
+
+    def __init__(self, *args, **kwargs):
+        super(BurstWatcher, self).__init__(*args, **kwargs)
+        self.updates = []
+
+    def update(self):
+        self.updates.append(sorted(self.pending))
+        super(BurstWatcher, self).update()
+        raise Stop
+
+
+@skipUnless(Inotify, "requires inotify")
+class TrashWatcherTest(TestCase):
+
+    def setUp(self):
+        shutil.rmtree(settings.MEDIA_TRASH_PATH, ignore_errors=True)
+        os.makedirs(os.path.join(settings.MEDIA_TRASH_PATH, 'a'))
+        self.write('a/1.txt', b'1' * 10)
+        self.root = settings.MEDIA_TRASH_PATH
+        self.watcher = TrashWatcher(self.root, get_storage())
+        self.addCleanup(self.watcher.close)
+        self.watcher.rescan()
+
+    def write(self, relpath, data):
+        with open(os.path.join(settings.MEDIA_TRASH_PATH, relpath), 'wb') as f:
+            f.write(data)
+
+    def drain(self):
+        """Handles the queued events"""
+        while True:
+            events = self.watcher.inotify.read_events(0.05)
+            if not events:
+                break
+            for event in events:
+                self.watcher.handle(event)
+
+    def settle(self):
+        """Handles the queued events and applies them"""
+        self.drain()
+        self.watcher.update()
+
+    def aggregate(self, relpath):
+        aggregate = aggregates.get_aggregate(relpath)
+        return aggregate and aggregate[:2]
+
+    def test_create_rename_delete(self):
+        self.assertEqual(self.aggregate(''), (1, 10))
+
+        os.makedirs(os.path.join(self.root, 'a', 'b'))
+        self.write('a/b/2.txt', b'2' * 20)
+        self.write('a/3.txt', b'3' * 30)
+        self.settle()
+        self.assertEqual(self.aggregate('a/b'), (1, 20))
+        self.assertEqual(self.aggregate('a'), (3, 60))
+
+        # a rename within the trash, a directory moved (with its watch), a file moved out
+        os.rename(os.path.join(self.root, 'a', '3.txt'), os.path.join(self.root, 'a', 'b', '3.txt'))
+        os.rename(os.path.join(self.root, 'a', 'b'), os.path.join(self.root, 'c'))
+        outside = self.root + '-1.txt'
+        os.rename(os.path.join(self.root, 'a', '1.txt'), outside)
+        self.addCleanup(os.remove, outside)
+        self.settle()
+        self.assertIsNone(self.aggregate('a/b'))
+        self.assertEqual(self.aggregate('a'), (0, 0))
+        self.assertEqual(self.aggregate('c'), (2, 50))
+        self.assertEqual(self.aggregate(''), (2, 50))
+
+        # the moved directory is still watched
+        self.write('c/4.txt', b'4' * 40)
+        os.remove(os.path.join(self.root, 'c', '2.txt'))
+        self.settle()
+        self.assertEqual(self.aggregate('c'), (2, 70))
+
+        shutil.rmtree(os.path.join(self.root, 'c'))
+        self.settle()
+        self.assertIsNone(self.aggregate('c'))
+        self.assertEqual(self.aggregate(''), (0, 0))
+
+    def test_overflow_rescans(self):
+        """Events lost in a queue overflow trigger a rescan"""
+        a, b = os.path.join(self.root, 'a', '1.txt'), os.path.join(self.root, 'a', '2.txt')
+        self.write('a/2.txt', b'2' * 20)
+        for i in range(10000):  # alternated: the kernel merges repeated events
+            os.utime(a, None)
+            os.utime(b, None)
+        self.write('a/3.txt', b'3' * 30)
+        self.drain()
+        self.assertTrue(self.watcher.overflowed)
+        inotify = self.watcher.inotify
+
+        self.watcher.update()
+        self.assertIsNot(self.watcher.inotify, inotify)
+        self.assertFalse(self.watcher.overflowed)
+        self.assertEqual(self.aggregate('a'), (3, 60))
+
+    def test_debounce(self):
+        """The events of a burst are applied together, once they stop for the debounce time"""
+        watcher = BurstWatcher(self.root, get_storage(), debounce=0.5, max_delay=30, rescan_interval=0)
+        self.addCleanup(watcher.close)
+        timers = [threading.Timer(0.2, self.write, ['a/2.txt', b'2' * 20]),
+                  threading.Timer(0.4, self.write, ['a/3.txt', b'3' * 30])]
+        for timer in timers:
+            timer.start()
+        with self.assertRaises(Stop):
+            watcher.run()
+        for timer in timers:
+            timer.join()
+        self.assertEqual(watcher.updates, [['a/2.txt', 'a/3.txt']])
+        self.assertEqual(self.aggregate('a'), (3, 60))